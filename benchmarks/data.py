@@ -0,0 +1,20 @@
+from decimal import Decimal
+
+
+def seed(rows):
+    """Creates the tables and fills ``tests.model.Book`` with ``rows`` rows,
+    unless it already holds that many."""
+    from django.core.management import call_command
+
+    from tests.model import Book
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    if Book.objects.count() != rows:
+        Book.objects.all().delete()
+        Book.objects.bulk_create(
+            (
+                Book(title=f"Book {index}", price=Decimal(index % 10000) / 100, average_rating=index % 5)
+                for index in range(rows)
+            ),
+            batch_size=10000,
+        )
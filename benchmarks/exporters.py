@@ -0,0 +1,201 @@
+# Measures the throughput and memory of the export views.
+#
+# Run it from the repository root::
+#
+#     python -m benchmarks.exporters --rows 10000 100000 1000000 --output results.json
+#
+# Each case exports ``tests.model.Book`` seeded with the given numbers of rows,
+# and reports rows per second, time to first byte and the peak memory traced by
+# :mod:`tracemalloc`. Memory is measured in a second run, since tracing slows
+# down the export. Pass ``--compare`` with the output of a previous run to add
+# the ratios between the two, e.g. across releases.
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+from benchmarks.data import seed
+
+XLSX_VIEW = "fundor_utilities.views.xlsx_view"
+TSV_VIEW = "fundor_utilities.views.tcs_view"
+CSV_VIEW = "fundor_utilities.views.csv_view"
+
+CASES = {
+    "xlsx-openpyxl": (XLSX_VIEW, "XlsxExporterView", {"xlsx_engine": "openpyxl"}),
+    "xlsx-direct": (XLSX_VIEW, "XlsxExporterView", {"xlsx_engine": "direct"}),
+    "xlsx-streaming": (XLSX_VIEW, "XlsxExporterView", {"streaming": True}),
+    "xlsx-streaming-keyset": (XLSX_VIEW, "XlsxExporterView", {"streaming": True, "queryset_iteration": "keyset"}),
+    "xlsx-async": (XLSX_VIEW, "AsyncXlsxExporterView", {}),
+    "tsv": (TSV_VIEW, "ExportTSV", {}),
+    "tsv-async": (TSV_VIEW, "AsyncExportTSV", {}),
+    "tsv-native": (CSV_VIEW, "TsvExporterView", {}),
+    "tsv-native-gzip": (CSV_VIEW, "TsvExporterView", {"gzip": "attachment"}),
+}
+"""Views measured, by name: module, class and attributes of the view."""
+
+
+def get_view_class(case):
+    from tests.model import Book
+
+    module, name, attrs = CASES[case]
+    base = getattr(importlib.import_module(module), name)
+    return type(f"Benchmark{name}", (base,), {"model": Book, **attrs})
+
+
+def _get_handler(view_class, request):
+    # XlsxExporterView only renders, the get() comes from a mixed in view
+    view = view_class()
+    view.setup(request)
+    if hasattr(view, "get"):
+        return view.get
+    return lambda request: view.render_to_response({})
+
+
+def _check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"The view returned a {response.status_code} response.")
+
+
+async def _aexport(handler, request, start):
+    response = await handler(request)
+    _check(response)
+    first_byte, size = None, 0
+    if response.streaming:
+        async for chunk in response.streaming_content:
+            first_byte = first_byte or time.perf_counter()
+            size += len(chunk)
+    else:
+        first_byte, size = time.perf_counter(), len(response.content)
+    return first_byte - start, time.perf_counter() - start, size
+
+
+def export(view_class):
+    """Runs the view and reads the whole response.
+
+    :returns: tuple of the time to first byte, the total time and the size
+    """
+    from django.test import RequestFactory
+
+    request = RequestFactory().get("/")
+    handler = _get_handler(view_class, request)
+    start = time.perf_counter()
+    if view_class.view_is_async:
+        return asyncio.run(_aexport(handler, request, start))
+    response = handler(request)
+    _check(response)
+    first_byte, size = None, 0
+    if response.streaming:
+        for chunk in response.streaming_content:
+            first_byte = first_byte or time.perf_counter()
+            size += len(chunk)
+    else:
+        first_byte, size = time.perf_counter(), len(response.content)
+    return first_byte - start, time.perf_counter() - start, size
+
+
+def measure(case, rows, memory=True):
+    """Returns the measures of ``case`` on ``rows`` rows.
+
+    :returns: dict
+    """
+    result = {"case": case, "rows": rows, "options": CASES[case][2]}
+    try:
+        view_class = get_view_class(case)
+    except ImportError as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+        return result
+    ttfb, seconds, size = export(view_class)
+    result.update(
+        seconds=seconds,
+        ttfb_seconds=ttfb,
+        rows_per_second=rows / seconds,
+        bytes=size,
+        peak_memory_bytes=None,
+    )
+    if memory:
+        tracemalloc.start()
+        try:
+            export(view_class)
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def compare(previous, results):
+    """Returns the ratios between ``results`` and the ones of a previous run.
+
+    Ratios above 1 mean faster exports, or more memory.
+
+    :returns: list
+    """
+    before = {(result["case"], result["rows"]): result for result in previous["results"] if "error" not in result}
+    comparison = []
+    for result in results:
+        old = before.get((result["case"], result["rows"]))
+        if old is None or "error" in result:
+            continue
+        entry = {"case": result["case"], "rows": result["rows"]}
+        entry["rows_per_second_ratio"] = result["rows_per_second"] / old["rows_per_second"]
+        if result["peak_memory_bytes"] and old.get("peak_memory_bytes"):
+            entry["peak_memory_ratio"] = result["peak_memory_bytes"] / old["peak_memory_bytes"]
+        comparison.append(entry)
+    return comparison
+
+
+def environment():
+    import django
+    import openpyxl
+
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "openpyxl": openpyxl.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the throughput and memory of the export views.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--output", help="file written with the results, instead of the standard output")
+    parser.add_argument("--compare", help="results of a previous run")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    results = []
+    for rows in args.rows:
+        seed(rows)
+        for case in args.cases:
+            result = measure(case, rows, memory=not args.no_memory)
+            results.append(result)
+            summary = result.get("error") or f"{result['rows_per_second']:.0f} rows/s"
+            print(f"{case} {rows}: {summary}", file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    if args.compare:
+        with open(args.compare) as fileobj:
+            report["comparison"] = compare(json.load(fileobj), results)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            json.dump(report, fileobj, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
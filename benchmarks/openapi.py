@@ -0,0 +1,272 @@
+# Measures the OpenAPI schema generation of a large synthetic API.
+#
+# Run it from the repository root::
+#
+#     python -m benchmarks.openapi --viewsets 100 1000 5000 --output results.json
+#
+# Each case routes the given number of model viewsets over ``tests.model.Book``,
+# with nested serializers, search and ordering filters and a paginator, and
+# times ``SortedPathSchemaGenerator.get_schema`` for a superuser, a user only
+# allowed to read and the public schema:
+#
+# - ``cold_seconds``: first build, with the endpoint index built;
+# - ``warm_seconds``: next build, reusing the endpoint index;
+# - ``cached_seconds``: build served by a ``SchemaCache``.
+#
+# Peak memory traced by :mod:`tracemalloc` is measured in another cold build,
+# since tracing slows it down. Pass ``--compare`` with the output of a previous
+# run to add the ratios between the two, e.g. across releases.
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+AUDIENCES = ("superuser", "restricted", "public")
+"""Users the schema is built for."""
+
+GROUP_SIZE = 50
+"""Number of viewsets sharing a tag."""
+
+
+def get_router(viewsets):
+    """Returns a router of ``viewsets`` model viewsets over
+    ``tests.model.Book``.
+
+    Each viewset has its own serializer, nesting a serializer of its own and
+    a summary serializer shared by every viewset.
+
+    :returns: :class:`rest_framework.routers.SimpleRouter`
+    """
+    from rest_framework import filters
+    from rest_framework import pagination
+    from rest_framework import routers
+    from rest_framework import serializers
+    from rest_framework import viewsets as drf_viewsets
+
+    from fundor_utilities.permissions import CheckSafeMethodsDjangoModelPermissions
+    from fundor_utilities.views.swagger.swagger_openapi import CustomAutoSchema
+    from tests.model import Book
+
+    class BookSummarySerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Book
+            fields = ["id", "title"]
+
+    class BenchmarkPagination(pagination.PageNumberPagination):
+        page_size = 50
+
+    router = routers.SimpleRouter()
+    for index in range(viewsets):
+        name = f"Resource{index:05d}"
+        detail_serializer = type(
+            f"{name}DetailSerializer",
+            (serializers.ModelSerializer,),
+            {
+                "summary": BookSummarySerializer(source="*", read_only=True),
+                "Meta": type("Meta", (), {"model": Book, "fields": ["price", "average_rating", "summary"]}),
+            },
+        )
+        serializer = type(
+            f"{name}Serializer",
+            (serializers.ModelSerializer,),
+            {
+                "detail": detail_serializer(source="*", read_only=True),
+                "related": BookSummarySerializer(many=True, read_only=True, source="*"),
+                "Meta": type("Meta", (), {"model": Book, "fields": ["id", "title", "price", "detail", "related"]}),
+            },
+        )
+        viewset = type(
+            f"{name}ViewSet",
+            (drf_viewsets.ModelViewSet,),
+            {
+                "queryset": Book.objects.all(),
+                "serializer_class": serializer,
+                "permission_classes": [CheckSafeMethodsDjangoModelPermissions],
+                "filter_backends": [filters.SearchFilter, filters.OrderingFilter],
+                "search_fields": ["title"],
+                "ordering_fields": ["price", "average_rating"],
+                "pagination_class": BenchmarkPagination,
+                "tags": [f"group{index // GROUP_SIZE}"],
+                "schema": CustomAutoSchema(),
+            },
+        )
+        router.register(name.lower(), viewset, basename=name.lower())
+    return router
+
+
+def create_users():
+    """Creates the tables, a superuser and a user only allowed to read books.
+
+    :returns: dict of the primary key of each user, by audience
+    """
+    from django.contrib.auth.models import Permission
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    User.objects.filter(username__startswith="benchmark-").delete()
+    superuser = User.objects.create_superuser("benchmark-superuser")
+    restricted = User.objects.create_user("benchmark-restricted")
+    restricted.user_permissions.add(Permission.objects.get(content_type__app_label="tests", codename="view_book"))
+    return {"superuser": superuser.pk, "restricted": restricted.pk}
+
+
+def get_request(users, audience):
+    """Returns the request of ``audience``, or ``None`` for the public schema.
+
+    Users are read again for each build, so that their permissions are not
+    already cached.
+    """
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+
+    if audience == "public":
+        return None
+    request = Request(RequestFactory().get("/"))
+    request.user = User.objects.get(pk=users[audience])
+    return request
+
+
+def build(generator, users, audience):
+    """Builds the schema of ``audience``.
+
+    :returns: tuple of the time spent and the schema
+    """
+    request = get_request(users, audience)
+    start = time.perf_counter()
+    schema = generator.get_schema(request, public=audience == "public")
+    return time.perf_counter() - start, schema
+
+
+def measure(router, viewsets, audience, users, memory=True, parallel_workers=None):
+    """Returns the measures of the schema of ``audience``.
+
+    :returns: dict
+    """
+    from fundor_utilities.views.swagger.schema_cache import SchemaCache
+    from fundor_utilities.views.swagger.schema_cache import invalidate_schemas
+    from fundor_utilities.views.swagger.swagger_openapi import SortedPathSchemaGenerator
+
+    generator_class = type(
+        "BenchmarkSchemaGenerator",
+        (SortedPathSchemaGenerator,),
+        {"schema_cache": SchemaCache(maxsize=len(AUDIENCES)), "parallel_workers": parallel_workers},
+    )
+    patterns = router.urls
+
+    def get_generator(cached=False):
+        generator = generator_class(title="Benchmark", patterns=patterns)
+        if not cached:
+            generator.schema_cache = None
+        return generator
+
+    invalidate_schemas()
+    cold, schema = build(get_generator(), users, audience)
+    warm, _ = build(get_generator(), users, audience)
+    build(get_generator(cached=True), users, audience)
+    cached, _ = build(get_generator(cached=True), users, audience)
+    result = {
+        "viewsets": viewsets,
+        "audience": audience,
+        "parallel_workers": parallel_workers,
+        "paths": len(schema["paths"]),
+        "operations": sum(len(operations) for operations in schema["paths"].values()),
+        "components": len(schema.get("components", {}).get("schemas", {})),
+        "bytes": len(json.dumps(schema)),
+        "cold_seconds": cold,
+        "warm_seconds": warm,
+        "cached_seconds": cached,
+        "peak_memory_bytes": None,
+    }
+    if memory:
+        invalidate_schemas()
+        tracemalloc.start()
+        try:
+            build(get_generator(), users, audience)
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def compare(previous, results):
+    """Returns the ratios between ``results`` and the ones of a previous run.
+
+    Ratios above 1 mean slower builds, or more memory.
+
+    :returns: list
+    """
+    before = {(result["viewsets"], result["audience"]): result for result in previous["results"]}
+    comparison = []
+    for result in results:
+        old = before.get((result["viewsets"], result["audience"]))
+        if old is None:
+            continue
+        entry = {"viewsets": result["viewsets"], "audience": result["audience"]}
+        for key in ("cold_seconds", "warm_seconds", "cached_seconds", "peak_memory_bytes"):
+            if result[key] and old.get(key):
+                entry[key.rsplit("_", 1)[0] + "_ratio"] = result[key] / old[key]
+        comparison.append(entry)
+    return comparison
+
+
+def environment():
+    import django
+    import rest_framework
+
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "djangorestframework": rest_framework.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the OpenAPI schema generation of a large synthetic API.")
+    parser.add_argument("--viewsets", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--audiences", nargs="+", choices=AUDIENCES, default=list(AUDIENCES))
+    parser.add_argument("--parallel-workers", type=int, help="number of threads describing the operations")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--output", help="file written with the results, instead of the standard output")
+    parser.add_argument("--compare", help="results of a previous run")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    users = create_users()
+    results = []
+    for viewsets in args.viewsets:
+        router = get_router(viewsets)
+        for audience in args.audiences:
+            result = measure(
+                router, viewsets, audience, users, memory=not args.no_memory, parallel_workers=args.parallel_workers
+            )
+            results.append(result)
+            print(
+                f"{viewsets} viewsets, {audience}: {result['cold_seconds']:.2f}s cold, "
+                f"{result['warm_seconds']:.2f}s warm, {result['cached_seconds'] * 1000:.3f}ms cached",
+                file=sys.stderr,
+            )
+
+    report = {"environment": environment(), "results": results}
+    if args.compare:
+        with open(args.compare) as fileobj:
+            report["comparison"] = compare(json.load(fileobj), results)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            json.dump(report, fileobj, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
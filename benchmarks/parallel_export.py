@@ -0,0 +1,53 @@
+# Compares serial and parallel XlsxExporterView exports.
+#
+# Run it from the repository root::
+#
+#     python -m benchmarks.parallel_export --rows 200000 --workers 1 2 4
+#
+# Results are printed as JSON, one entry for each number of workers.
+import argparse
+import json
+import os
+import time
+
+from benchmarks.data import seed
+
+
+def run(rows, workers):
+    from django.test import RequestFactory
+
+    from fundor_utilities.views.xlsx_view import XlsxExporterView
+    from tests.model import Book
+
+    results = []
+    for count in [0] + workers:
+        view_class = type(
+            "BookExportView", (XlsxExporterView,), {"model": Book, "xlsx_engine": "direct", "parallel_workers": count}
+        )
+        view = view_class()
+        view.setup(RequestFactory().get("/"))
+        start = time.perf_counter()
+        size = len(view.render_to_response({}).content)
+        elapsed = time.perf_counter() - start
+        results.append(
+            {"workers": count, "rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed, "bytes": size}
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares serial and parallel XlsxExporterView exports.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    seed(args.rows)
+    print(json.dumps(run(args.rows, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+from tests.settings import *  # noqa: F401, F403
+
+# Benchmarks run against a file database, which process pools can share.
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("BENCHMARK_DATABASE", os.path.join(tempfile.gettempdir(), "fundor_benchmark.sqlite3")),
+    },
+}
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.apps import apps
+from django.conf import settings
 
 
 class FundorUtilitiesConfig(AppConfig):
+    # tables created before the app had migrations have an AutoField key
+    default_auto_field = "django.db.models.AutoField"
     name = "fundor_utilities"
+
+    def ready(self):
+        from fundor_utilities.export.cache import track_model_versions
+        from fundor_utilities.export.metrics import connect_logging
+
+        connect_logging()
+        versioned_models = getattr(settings, "FUNDOR_EXPORT_VERSIONED_MODELS", ())
+        if versioned_models:
+            track_model_versions(*(apps.get_model(label) for label in versioned_models))
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import EmptyResultSet
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+MODEL_VERSION = "model_version"
+"""Freshness of an export given by a counter bumped each time an instance of
+the model is saved or deleted, see :func:`track_model_versions`."""
+
+DEFAULT_VERSION_CACHE_ALIAS = "default"
+VERSION_KEY = "fundor_utilities:export_version:{label}"
+
+_tracked_models = set()
+
+
+def fingerprint(queryset, *parts):
+    """Returns a digest of the SQL of ``queryset`` and of ``parts``.
+
+    Two exports with the same fingerprint produce the same file, as long as
+    the data did not change. ``queryset`` may be ``None``.
+
+    :returns: str
+    """
+    db, sql, params = None, "", ()
+    if queryset is not None:
+        db = queryset.db
+        try:
+            sql, params = queryset.query.get_compiler(db).as_sql()
+        except EmptyResultSet:
+            pass
+    digest = hashlib.sha256(repr((db, sql, tuple(params), parts)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _get_version_cache_alias():
+    return getattr(settings, "FUNDOR_EXPORT_VERSION_CACHE", DEFAULT_VERSION_CACHE_ALIAS)
+
+
+def get_version_cache():
+    """Returns the cache holding the model versions, the one named by the
+    ``FUNDOR_EXPORT_VERSION_CACHE`` setting, ``"default"`` by default.
+
+    Versions must be shared by every process serving exports, so local
+    memory and dummy caches are refused.
+
+    :raises: ImproperlyConfigured
+
+    :returns: cache
+    """
+    alias = _get_version_cache_alias()
+    version_cache = caches[alias]
+    if isinstance(version_cache, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"The {alias!r} cache holds the model versions of exports, it must be shared by every process: "
+            f"use a backend like Redis, Memcached, the database or files instead of {type(version_cache).__name__}."
+        )
+    return version_cache
+
+
+def get_model_version(model):
+    """Returns the version of ``model``, see :func:`track_model_versions`.
+
+    :raises: ImproperlyConfigured
+    """
+    label = model._meta.label_lower
+    if label not in _tracked_models:
+        raise ImproperlyConfigured(
+            f"The versions of {model._meta.label} are not tracked: add it to FUNDOR_EXPORT_VERSIONED_MODELS."
+        )
+    return get_version_cache().get(VERSION_KEY.format(label=label), 0)
+
+
+def bump_model_version(sender, **kwargs):
+    """Signal receiver increasing the version of ``sender``."""
+    cache = caches[_get_version_cache_alias()]
+    key = VERSION_KEY.format(label=sender._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def track_model_versions(*models):
+    """Bumps the version of ``models`` on ``post_save`` and ``post_delete``.
+
+    It is called once at startup for the models of the
+    ``FUNDOR_EXPORT_VERSIONED_MODELS`` setting, so that every change is
+    tracked, including the ones made before the first export.
+
+    :raises: ImproperlyConfigured
+    """
+    get_version_cache()
+    for model in models:
+        label = model._meta.label_lower
+        dispatch_uid = f"fundor_utilities.export_version.{label}"
+        post_save.connect(bump_model_version, sender=model, dispatch_uid=dispatch_uid, weak=False)
+        post_delete.connect(bump_model_version, sender=model, dispatch_uid=dispatch_uid, weak=False)
+        _tracked_models.add(label)
+
+
+class DjangoCacheBackend:
+    """Stores exports in a Django cache.
+
+    Files bigger than ``max_entry_size`` bytes are not stored, to respect the
+    limits of backends like memcached.
+    """
+
+    def __init__(self, alias="default", timeout=DEFAULT_TIMEOUT, max_entry_size=None, key_prefix="fundor_export"):
+        self.alias = alias
+        self.timeout = timeout
+        self.max_entry_size = max_entry_size
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        return caches[self.alias].get(f"{self.key_prefix}:{key}")
+
+    def set(self, key, data):
+        if self.max_entry_size is not None and len(data) > self.max_entry_size:
+            return
+        caches[self.alias].set(f"{self.key_prefix}:{key}", data, timeout=self.timeout)
+
+
+class FileCacheBackend:
+    """Stores exports as files in ``directory``.
+
+    Reading a file touches it, and when the files exceed ``max_size`` bytes
+    the least recently used ones are deleted. Files older than ``timeout``
+    seconds are ignored.
+    """
+
+    def __init__(self, directory, max_size=1024**3, timeout=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.timeout = timeout
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.timeout is not None and os.path.getmtime(path) < time.time() - self.timeout:
+                return None
+            with open(path, "rb") as fileobj:
+                data = fileobj.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_size:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=".", delete=False) as fileobj:
+            fileobj.write(data)
+        os.replace(fileobj.name, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used files above ``max_size``."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,30 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import FieldError
+from django.db.models.constants import LOOKUP_SEP
+
+
+def resolve_field(model, lookup):
+    """Returns the model field holding the values of ``lookup``.
+
+    ``lookup`` is a field name as accepted by :func:`QuerySet.values_list`,
+    following relations with ``__``. Relations themselves resolve to the field
+    they point to, since their value is the related key.
+
+    :returns: :class:`Field` or ``None`` if ``lookup`` is not a model field,
+        e.g. an annotation
+    """
+    field = None
+    for name in lookup.split(LOOKUP_SEP):
+        if model is None:
+            return None
+        try:
+            field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    while field.is_relation:
+        try:
+            field = field.target_field
+        except (AttributeError, FieldError):
+            return None
+    return field
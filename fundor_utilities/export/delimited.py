@@ -0,0 +1,94 @@
+import csv
+import zlib
+from itertools import chain
+
+GZIP_WBITS = 31
+"""``wbits`` of :func:`zlib.compressobj` writing a gzip stream."""
+
+
+class _Echo:
+    """File-like object returning what is written, for :func:`csv.writer`."""
+
+    def write(self, value):
+        return value
+
+
+class DelimitedEncoder:
+    """Turns rows into encoded CSV or TSV data, optionally gzipped.
+
+    :param dialect: dialect of :func:`csv.writer`
+    :param encoding: encoding of the text
+    :param compress: gzip the data
+    :param compresslevel: gzip compression level
+    :param writer_kwargs: other arguments of :func:`csv.writer`
+    """
+
+    def __init__(self, dialect="excel", encoding="utf-8", compress=False, compresslevel=6, **writer_kwargs):
+        self.writer = csv.writer(_Echo(), dialect=dialect, **writer_kwargs)
+        self.encoding = encoding
+        self.compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, GZIP_WBITS) if compress else None
+
+    def format(self, rows):
+        """Returns the lines of ``rows``.
+
+        :returns: str
+        """
+        return "".join([self.writer.writerow(row) for row in rows])
+
+    def encode(self, rows):
+        """Returns the data of ``rows``, or of lines returned by
+        :func:`format`; it may be empty when compressing.
+
+        :returns: bytes
+        """
+        text = rows if isinstance(rows, str) else self.format(rows)
+        data = text.encode(self.encoding)
+        if self.compressor is not None:
+            return self.compressor.compress(data)
+        return data
+
+    def close(self):
+        """Returns the data left in the compressor.
+
+        :returns: bytes
+        """
+        if self.compressor is not None:
+            return self.compressor.flush()
+        return b""
+
+
+def stream_delimited(header, chunks, **kwargs):
+    """Yields the CSV or TSV data of ``header`` and the rows of ``chunks``.
+
+    ``header`` can be ``None``. ``chunks`` are lists of rows, like the ones of
+    :func:`fundor_utilities.export.iteration.iter_chunks`, or lines returned by
+    :func:`DelimitedEncoder.format`, and each one is written at once. Other arguments are the ones of
+    :class:`DelimitedEncoder`.
+    """
+    encoder = DelimitedEncoder(**kwargs)
+    if header is not None:
+        chunks = chain([[header]], chunks)
+    for chunk in chunks:
+        data = encoder.encode(chunk)
+        if data:
+            yield data
+    data = encoder.close()
+    if data:
+        yield data
+
+
+async def astream_delimited(header, chunks, **kwargs):
+    """Asynchronous version of :func:`stream_delimited`, taking an
+    asynchronous iterable of chunks."""
+    encoder = DelimitedEncoder(**kwargs)
+    if header is not None:
+        data = encoder.encode([header])
+        if data:
+            yield data
+    async for chunk in chunks:
+        data = encoder.encode(chunk)
+        if data:
+            yield data
+    data = encoder.close()
+    if data:
+        yield data
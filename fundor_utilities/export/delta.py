@@ -0,0 +1,97 @@
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from fundor_utilities.export.columns import resolve_field
+
+WATERMARK_HEADER = "X-Export-Watermark"
+
+
+def parse_watermark(model, field_name, value):
+    """Returns the watermark ``value`` sent by a client as a value of the
+    field ``field_name`` of ``model``.
+
+    Timestamps are read in ISO 8601 format, in the current time zone when
+    they are naive.
+
+    :raises: BadRequest, ImproperlyConfigured
+
+    :returns: value of the field
+    """
+    field = resolve_field(model, field_name)
+    if field is None:
+        raise ImproperlyConfigured(f"watermark_field {field_name!r} is not a field of {model.__name__}.")
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        raise BadRequest(f"Invalid watermark {value!r}.") from None
+    if isinstance(value, datetime.datetime) and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def format_watermark(value):
+    """Returns ``value`` as sent in the :data:`WATERMARK_HEADER` header.
+
+    :returns: str
+    """
+    if isinstance(value, datetime.datetime | datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+def get_watermark(queryset, field_name):
+    """Returns the highest value of ``field_name`` in ``queryset``, or
+    ``None`` if it is empty."""
+    return queryset.order_by().aggregate(watermark=Max(field_name))["watermark"]
+
+
+def delta_queryset(queryset, field_name, since, until):
+    """Returns the rows of ``queryset`` whose ``field_name`` is greater than
+    ``since`` and not greater than ``until``. Both bounds can be ``None``.
+
+    :returns: :class:`QuerySet`
+    """
+    if since is not None:
+        queryset = queryset.filter(**{f"{field_name}__gt": since})
+    if until is not None:
+        queryset = queryset.filter(**{f"{field_name}__lte": until})
+    return queryset
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Signal receiver storing the primary key of a deleted instance."""
+    from fundor_utilities.models import ExportTombstone
+
+    ExportTombstone.objects.using(kwargs.get("using")).create(
+        model_label=sender._meta.label_lower, object_pk=str(instance.pk)
+    )
+
+
+def track_deletions(*models):
+    """Stores a :class:`fundor_utilities.models.ExportTombstone` each time an
+    instance of ``models`` is deleted.
+
+    Call it when the application is ready, so that every deletion is tracked.
+    """
+    for model in models:
+        dispatch_uid = f"fundor_utilities.export_tombstone.{model._meta.label_lower}"
+        post_delete.connect(record_tombstone, sender=model, dispatch_uid=dispatch_uid, weak=False)
+
+
+def tombstones(model, since, until):
+    """Returns the tombstones of ``model`` deleted after ``since`` and not
+    after ``until``.
+
+    :returns: :class:`QuerySet`
+    """
+    from fundor_utilities.models import ExportTombstone
+
+    queryset = ExportTombstone.objects.filter(model_label=model._meta.label_lower)
+    return delta_queryset(queryset, "deleted_at", since, until).order_by("deleted_at", "pk")
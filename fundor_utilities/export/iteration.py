@@ -0,0 +1,140 @@
+from itertools import chain
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+
+CURSOR = "cursor"
+"""Read the rows with :func:`QuerySet.iterator`, which uses a server-side
+cursor on the databases supporting it."""
+
+KEYSET = "keyset"
+"""Read the rows in batches ordered by primary key, each batch starting after
+the last key of the previous one."""
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_cursor_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields lists of at most ``chunk_size`` rows read with a single cursor.
+
+    :param queryset: queryset to export
+    :param fields: field names passed to :func:`QuerySet.values_list`
+    :param chunk_size: number of rows fetched from the database at a time
+    """
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_keyset_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields lists of at most ``chunk_size`` rows, one query for each list.
+
+    Rows are read in primary key order, whatever the ordering of
+    ``queryset`` is, and each query filters on the last key already read, so
+    no query ever scans past the rows it returns. Sliced querysets cannot be
+    filtered and are read with :func:`iter_cursor_chunks`.
+
+    :param queryset: queryset to export
+    :param fields: field names passed to :func:`QuerySet.values_list`
+    :param chunk_size: number of rows fetched by each query
+    """
+    if queryset.query.is_sliced:
+        yield from iter_cursor_chunks(queryset, fields, chunk_size)
+        return
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.values_list("pk", *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+        if len(rows) < chunk_size:
+            return
+
+
+ITERATIONS = {
+    CURSOR: iter_cursor_chunks,
+    KEYSET: iter_keyset_chunks,
+}
+
+
+def iter_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE, iteration=CURSOR):
+    """Yields the rows of ``queryset`` in lists of at most ``chunk_size``.
+
+    :param iteration: one of :data:`CURSOR` or :data:`KEYSET`
+
+    :raises: ImproperlyConfigured
+    """
+    try:
+        iterate = ITERATIONS[iteration]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown queryset iteration {iteration!r}, use one of {sorted(ITERATIONS)}."
+        ) from None
+    return iterate(queryset, fields, chunk_size)
+
+
+def iter_rows(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE, iteration=CURSOR):
+    """Yields the rows of ``queryset`` one at a time, see :func:`iter_chunks`."""
+    return chain.from_iterable(iter_chunks(queryset, fields, chunk_size, iteration))
+
+
+async def aiter_cursor_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Asynchronous version of :func:`iter_cursor_chunks`.
+
+    Each chunk is read in the thread of the synchronous ORM, like
+    :func:`QuerySet.aiterator` does; it is not used because it runs the query
+    of ``values_list()`` querysets in the event loop.
+    """
+    chunks = iter_cursor_chunks(queryset, fields, chunk_size)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def aiter_keyset_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Asynchronous version of :func:`iter_keyset_chunks`."""
+    if queryset.query.is_sliced:
+        async for chunk in aiter_cursor_chunks(queryset, fields, chunk_size):
+            yield chunk
+        return
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = [row async for row in batch.values_list("pk", *fields)[:chunk_size]]
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+        if len(rows) < chunk_size:
+            return
+
+
+ASYNC_ITERATIONS = {
+    CURSOR: aiter_cursor_chunks,
+    KEYSET: aiter_keyset_chunks,
+}
+
+
+def aiter_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE, iteration=CURSOR):
+    """Asynchronous version of :func:`iter_chunks`, for the async ORM.
+
+    :raises: ImproperlyConfigured
+    """
+    try:
+        iterate = ASYNC_ITERATIONS[iteration]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown queryset iteration {iteration!r}, use one of {sorted(ASYNC_ITERATIONS)}."
+        ) from None
+    return iterate(queryset, fields, chunk_size)
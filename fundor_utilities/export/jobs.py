@@ -0,0 +1,165 @@
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ExportJob:
+    """State of an export running in background."""
+
+    def __init__(self, token, path, filename, content_type):
+        self.token = token
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.status = PENDING
+        self.bytes_written = 0
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+
+    @property
+    def is_done(self):
+        return self.status == DONE
+
+    def as_dict(self):
+        return {
+            "token": self.token,
+            "status": self.status,
+            "filename": self.filename,
+            "bytes_written": self.bytes_written,
+            "error": self.error,
+        }
+
+
+class _ProgressFile:
+    """File wrapper counting the bytes written in the job."""
+
+    def __init__(self, fileobj, job):
+        self._fileobj = fileobj
+        self._job = job
+
+    def write(self, data):
+        self._fileobj.write(data)
+        self._job.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+class ExportJobManager:
+    """Runs exports in a local thread pool, spooling them to ``directory``.
+
+    Jobs are kept in memory, so they can only be looked up in the process
+    that created them. Files of jobs older than ``ttl`` seconds, including the
+    ones left by previous processes, are deleted when jobs are submitted or
+    looked up.
+    """
+
+    def __init__(self, directory, ttl=3600, max_workers=2):
+        self.directory = directory
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fundor-export")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, write, filename, content_type):
+        """Enqueues an export.
+
+        :param write: callable writing the export to the file object it is
+            given
+        :param filename: name of the file served to the client
+        :param content_type: content type of the file served to the client
+        :returns: :class:`ExportJob`
+        """
+        self.purge_expired()
+        os.makedirs(self.directory, exist_ok=True)
+        token = secrets.token_urlsafe(24)
+        job = ExportJob(token, os.path.join(self.directory, token), filename, content_type)
+        with self._lock:
+            self._jobs[token] = job
+        job.future = self._executor.submit(self._run, job, write)
+        return job
+
+    def get(self, token):
+        """Returns the job identified by ``token``, or ``None``."""
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(token)
+
+    def purge_expired(self):
+        """Forgets expired jobs and deletes expired files."""
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [token for token, job in self._jobs.items() if job.finished is not None and job.finished < limit]
+            for token in expired:
+                del self._jobs[token]
+            running = {job.path for job in self._jobs.values()}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            path = entry.path.removesuffix(".part")
+            if path in running:
+                continue
+            try:
+                if entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _run(self, job, write):
+        job.status = RUNNING
+        partial_path = job.path + ".part"
+        try:
+            with open(partial_path, "wb") as fileobj:
+                write(_ProgressFile(fileobj, job))
+            os.replace(partial_path, job.path)
+        except Exception as e:  # noqa: B902
+            logger.exception("Export job %s failed", job.token)
+            job.status = FAILED
+            job.error = str(e)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        else:
+            job.status = DONE
+        finally:
+            job.finished = time.time()
+            connections.close_all()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Returns the process-wide :class:`ExportJobManager`.
+
+    It is configured by the ``FUNDOR_EXPORT_JOBS_DIR``,
+    ``FUNDOR_EXPORT_JOBS_TTL`` and ``FUNDOR_EXPORT_JOBS_WORKERS`` settings.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ExportJobManager(
+                getattr(settings, "FUNDOR_EXPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "fundor_exports")),
+                ttl=getattr(settings, "FUNDOR_EXPORT_JOBS_TTL", 3600),
+                max_workers=getattr(settings, "FUNDOR_EXPORT_JOBS_WORKERS", 2),
+            )
+        return _manager
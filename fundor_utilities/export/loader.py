@@ -0,0 +1,249 @@
+import datetime
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db import router
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from fundor_utilities.export.plans import default_field_names
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _decimal_cell(value):
+    # a float keeps its shortest representation, not its binary expansion
+    return repr(value) if isinstance(value, float) else value
+
+
+def _datetime_cell(value):
+    if isinstance(value, datetime.datetime) and settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+CELL_CONVERTERS = {
+    "DateTimeField": _datetime_cell,
+    "DecimalField": _decimal_cell,
+}
+"""Converters of the values read by openpyxl before they are cleaned by the
+model field, by field internal type."""
+
+
+class RowError:
+    """Errors of the row ``row`` of the sheet, by field name."""
+
+    def __init__(self, row, errors):
+        self.row = row
+        self.errors = errors
+
+    def as_dict(self):
+        return {"row": self.row, "errors": self.errors}
+
+    def __repr__(self):
+        return f"<RowError {self.row} {self.errors!r}>"
+
+
+class ImportResult:
+    """Outcome of :func:`XlsxLoader.load`."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "errors": [error.as_dict() for error in self.errors],
+        }
+
+
+class _Column:
+    __slots__ = ("name", "attname", "clean")
+
+    def __init__(self, field):
+        self.name = field.name
+        self.attname = field.attname
+        if field.is_relation:
+            # only the related key is read, so the object is never fetched
+            target = field.target_field
+            self.clean = lambda value: None if value in field.empty_values else target.to_python(value)
+        else:
+            convert = CELL_CONVERTERS.get(field.get_internal_type())
+            if convert is None:
+                self.clean = lambda value: field.clean(value, None)
+            else:
+                self.clean = lambda value: field.clean(convert(value), None)
+
+
+class XlsxLoader:
+    """Loads the rows of the first sheet of a workbook into ``model``.
+
+    Cells are read in order as the values of ``field_names``, like
+    :class:`fundor_utilities.views.xlsx_view.XlsxExporterView` writes them.
+    Each value is converted and validated by its model field, without
+    :func:`Model.full_clean`, so unique constraints are left to the database:
+    when it rejects a batch, its rows are saved one at a time and the ones
+    it rejects are reported as errors of the row.
+
+    The workbook is read in streaming mode and the instances are saved with
+    :func:`QuerySet.bulk_create` every ``batch_size`` rows, inside a single
+    transaction. If ``key_field`` is provided, rows whose key already exists
+    update the existing instance with :func:`QuerySet.bulk_update` instead,
+    including the rows repeating the key of a previous row.
+
+    :param model: model of the instances
+    :param field_names: fields of the columns; if omitted, all the fields of
+        the model which are not auto created
+    :param header: skip the first row of the sheet
+    :param key_field: field identifying the instances to update
+    :param batch_size: number of rows saved at a time
+    :param abort_on_error: save nothing if a row has an error
+    """
+
+    def __init__(
+        self,
+        model,
+        field_names=None,
+        header=False,
+        key_field=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        abort_on_error=False,
+    ):
+        self.model = model
+        self.field_names = list(field_names or default_field_names(model))
+        self.header = header
+        self.key_field = key_field
+        self.batch_size = batch_size
+        self.abort_on_error = abort_on_error
+        try:
+            self.columns = [_Column(model._meta.get_field(name)) for name in self.field_names]
+        except FieldDoesNotExist as error:
+            raise ImproperlyConfigured(f"Cannot import {model.__name__}: {error}") from None
+        if key_field is not None and key_field not in self.field_names:
+            raise ImproperlyConfigured(f"key_field {key_field!r} must be one of the imported fields.")
+        self.update_fields = [column.attname for column in self.columns if column.name != key_field]
+
+    def build(self, row):
+        """Returns the instance of ``row`` and the errors of its cells.
+
+        :returns: tuple
+        """
+        values, errors = {}, {}
+        row = (tuple(row) + (None,) * (len(self.columns) - len(row)))[: len(self.columns)]
+        for column, value in zip(self.columns, row, strict=True):
+            if isinstance(value, str):
+                value = value.strip()
+            try:
+                values[column.attname] = column.clean(value)
+            except ValidationError as error:
+                errors[column.name] = error.messages
+        if errors:
+            return None, errors
+        return self.model(**values), None
+
+    def _save(self, instances, result, using):
+        if self.key_field is None:
+            self.model._default_manager.using(using).bulk_create(instances)
+            result.created += len(instances)
+            return
+        key_attname = self.model._meta.get_field(self.key_field).attname
+        keys = {getattr(instance, key_attname) for instance in instances}
+        existing = dict(
+            self.model._default_manager.using(using)
+            .filter(**{f"{key_attname}__in": keys})
+            .values_list(key_attname, "pk")
+        )
+        created, updated = [], []
+        for instance in instances:
+            pk = existing.get(getattr(instance, key_attname))
+            if pk is None:
+                created.append(instance)
+            else:
+                instance.pk = pk
+                instance._state.adding = False
+                updated.append(instance)
+        if created:
+            self.model._default_manager.using(using).bulk_create(created)
+        if updated and self.update_fields:
+            self.model._default_manager.using(using).bulk_update(updated, self.update_fields)
+        result.created += len(created)
+        result.updated += len(updated)
+
+    def _split_keys(self, rows):
+        """Yields ``rows`` in lists without the same key twice, so the rows
+        repeating a key update the instance created by the previous ones."""
+        if self.key_field is None:
+            yield rows
+            return
+        key_attname = self.model._meta.get_field(self.key_field).attname
+        batch, keys = [], set()
+        for number, instance in rows:
+            key = getattr(instance, key_attname)
+            if key is not None and key in keys:
+                yield batch
+                batch, keys = [], set()
+            batch.append((number, instance))
+            keys.add(key)
+        yield batch
+
+    def _save_rows(self, rows, result, using):
+        """Saves ``rows``, a list of row numbers and instances, reporting the
+        rows rejected by the database as errors."""
+        try:
+            with transaction.atomic(using=using):
+                self._save([instance for _, instance in rows], result, using)
+        except IntegrityError as error:
+            if len(rows) == 1:
+                result.errors.append(RowError(rows[0][0], {NON_FIELD_ERRORS: [str(error)]}))
+                return
+            # find the rows rejected
+            for row in rows:
+                self._save_rows([row], result, using)
+
+    def load(self, fileobj):
+        """Loads the workbook ``fileobj``.
+
+        :returns: :class:`ImportResult`
+        """
+        result = ImportResult()
+        using = router.db_for_write(self.model)
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = enumerate(workbook.worksheets[0].iter_rows(values_only=True), start=1)
+            if self.header:
+                next(rows, None)
+            with transaction.atomic(using=using):
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    instances = []
+                    for number, row in batch:
+                        if all(value is None or value == "" for value in row):
+                            continue
+                        instance, errors = self.build(row)
+                        if errors:
+                            result.errors.append(RowError(number, errors))
+                        elif not (self.abort_on_error and result.errors):
+                            instances.append((number, instance))
+                    for unique_rows in self._split_keys(instances):
+                        if unique_rows and not (self.abort_on_error and result.errors):
+                            self._save_rows(unique_rows, result, using)
+                # rows rejected by the database are reported after the others
+                result.errors.sort(key=attrgetter("row"))
+                if self.abort_on_error and result.errors:
+                    transaction.set_rollback(True, using=using)
+                    result.created = result.updated = 0
+        finally:
+            workbook.close()
+        return result
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+QUERY = "query"
+"""Time spent reading rows from the database."""
+
+CONVERT = "convert"
+"""Time spent turning rows into cells or lines."""
+
+WRITE = "write"
+"""Time spent writing and compressing the file."""
+
+export_started = Signal()
+"""Sent when an export starts, with the ``metrics`` of the export."""
+
+export_progress = Signal()
+"""Sent after each chunk of rows is written, with the ``metrics`` of the
+export, and the ``rows``, ``bytes`` and ``elapsed`` seconds so far."""
+
+export_finished = Signal()
+"""Sent when an export ends, with the ``metrics`` of the export, its
+``rows``, ``bytes``, ``elapsed`` seconds, the ``timings`` of each phase,
+the ``error`` which stopped it, if any, and ``aborted``, ``True`` when the
+client went away before the end of a streamed file."""
+
+ABORTS = (GeneratorExit, asyncio.CancelledError)
+"""Exceptions stopping the output of an export which are not failures: the
+response was closed, or its task cancelled, e.g. when the client disconnects."""
+
+
+class ExportMetrics:
+    """Measures an export and reports it with the export signals.
+
+    Rows are counted, and the time spent reading them, timed, as the export
+    pulls them through :func:`iter_chunks`. Conversions are timed with
+    :func:`timed`. The data of the file is counted through
+    :func:`iter_output`, and the time spent producing it which is neither
+    query nor conversion is the write time.
+
+    :param sender: sender of the signals, usually the view class
+    :param info: other arguments sent with the signals, e.g. the view
+    """
+
+    def __init__(self, sender, **info):
+        self.sender = sender
+        self.info = info
+        self.rows = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.timings = {QUERY: 0.0, CONVERT: 0.0, WRITE: 0.0}
+        self.error = None
+        self.aborted = False
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def start(self):
+        """Sends :data:`export_started`, once."""
+        if self.started is None:
+            self.started = time.perf_counter()
+            export_started.send(self.sender, metrics=self, **self.info)
+
+    def finish(self, error=None, aborted=False):
+        """Sends :data:`export_finished`, once."""
+        if self.finished is None:
+            self.start()
+            self.finished = time.perf_counter()
+            self.error = error
+            self.aborted = aborted
+            export_finished.send(
+                self.sender,
+                metrics=self,
+                rows=self.rows,
+                bytes=self.bytes,
+                elapsed=self.elapsed,
+                timings=dict(self.timings),
+                error=error,
+                aborted=aborted,
+                **self.info,
+            )
+
+    def progress(self):
+        """Sends :data:`export_progress`."""
+        export_progress.send(
+            self.sender, metrics=self, rows=self.rows, bytes=self.bytes, elapsed=self.elapsed, **self.info
+        )
+
+    @contextmanager
+    def timed(self, phase):
+        """Adds the time spent in the block to ``phase``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] += time.perf_counter() - start
+
+    def iter_chunks(self, chunks, count=len):
+        """Yields ``chunks``, timing the reads as :data:`QUERY`.
+
+        :param count: function returning the number of rows of a chunk
+        """
+        self.start()
+        chunks = iter(chunks)
+        while True:
+            with self.timed(QUERY):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self.rows += count(chunk)
+            self.chunks += 1
+            yield chunk
+            self.progress()
+
+    async def aiter_chunks(self, chunks, count=len):
+        """Asynchronous version of :func:`iter_chunks`."""
+        self.start()
+        chunks = aiter(chunks)
+        while True:
+            with self.timed(QUERY):
+                chunk = await anext(chunks, None)
+            if chunk is None:
+                return
+            self.rows += count(chunk)
+            self.chunks += 1
+            yield chunk
+            self.progress()
+
+    def _written(self, data, spent, nested):
+        # query and conversions happen while the data is produced
+        self.timings[WRITE] += spent - (self.timings[QUERY] + self.timings[CONVERT] - nested)
+        self.bytes += len(data)
+
+    def iter_output(self, data):
+        """Yields the bytes of ``data``, counting them, and sends
+        :data:`export_finished` when they are exhausted, fail or are
+        aborted."""
+        self.start()
+        data = iter(data)
+        try:
+            while True:
+                nested, start = self.timings[QUERY] + self.timings[CONVERT], time.perf_counter()
+                chunk = next(data, None)
+                if chunk is None:
+                    break
+                self._written(chunk, time.perf_counter() - start, nested)
+                yield chunk
+        except ABORTS:
+            self.finish(aborted=True)
+            raise
+        except BaseException as error:  # noqa: B902
+            # any failure is reported, then re-raised
+            self.finish(error)
+            raise
+        self.finish()
+
+    async def aiter_output(self, data):
+        """Asynchronous version of :func:`iter_output`."""
+        self.start()
+        data = aiter(data)
+        try:
+            while True:
+                nested, start = self.timings[QUERY] + self.timings[CONVERT], time.perf_counter()
+                chunk = await anext(data, None)
+                if chunk is None:
+                    break
+                self._written(chunk, time.perf_counter() - start, nested)
+                yield chunk
+        except ABORTS:
+            self.finish(aborted=True)
+            raise
+        except BaseException as error:  # noqa: B902
+            # any failure is reported, then re-raised
+            self.finish(error)
+            raise
+        self.finish()
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "chunks": self.chunks,
+            "elapsed": self.elapsed,
+            "timings": dict(self.timings),
+        }
+
+
+def log_export_progress(sender, metrics, rows, bytes, elapsed, **kwargs):
+    """Receiver of :data:`export_progress` logging at debug level."""
+    logger.debug("%s export: %d rows, %d bytes in %.3fs", sender.__name__, rows, bytes, elapsed)
+
+
+def log_export_finished(sender, metrics, rows, bytes, elapsed, timings, error, aborted=False, **kwargs):
+    """Receiver of :data:`export_finished` logging at info level, or at
+    error level if the export failed."""
+    if error is not None:
+        logger.error("%s export failed after %d rows in %.3fs: %r", sender.__name__, rows, elapsed, error)
+        return
+    if aborted:
+        logger.info("%s export aborted after %d rows, %d bytes in %.3fs", sender.__name__, rows, bytes, elapsed)
+        return
+    logger.info(
+        "%s export: %d rows, %d bytes in %.3fs (query %.3fs, convert %.3fs, write %.3fs)",
+        sender.__name__,
+        rows,
+        bytes,
+        elapsed,
+        timings[QUERY],
+        timings[CONVERT],
+        timings[WRITE],
+    )
+
+
+def connect_logging():
+    """Connects the logging receivers to the export signals."""
+    export_progress.connect(log_export_progress, dispatch_uid="fundor_utilities.log_export_progress")
+    export_finished.connect(log_export_finished, dispatch_uid="fundor_utilities.log_export_finished")
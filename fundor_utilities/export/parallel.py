@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+
+from fundor_utilities.export import iteration
+from fundor_utilities.export.plans import get_plan
+from fundor_utilities.export.xlsx_writer import rows_xml
+
+
+def pk_ranges(queryset, size):
+    """Yields the primary key ranges of ``queryset`` holding ``size`` rows.
+
+    Ranges are ``(low, high)`` tuples including ``low`` and excluding
+    ``high``, in increasing order; ``high`` is ``None`` for the last one,
+    which may hold fewer rows. Each range is found with one query skipping
+    ``size`` keys, so ranges are only computed as they are consumed.
+
+    :raises: ImproperlyConfigured
+    """
+    if queryset.query.is_sliced:
+        raise ImproperlyConfigured("Parallel exports cannot split a sliced queryset.")
+    keys = queryset.order_by("pk").values_list("pk", flat=True)
+    low = keys.first()
+    while low is not None:
+        high = keys.filter(pk__gte=low)[size : size + 1].first()
+        yield low, high
+        low = high
+
+
+def render_partition(model_label, db, query, fields, low, high, chunk_size=iteration.DEFAULT_CHUNK_SIZE):
+    """Returns the sheet XML of the rows of ``query`` with a key in a range.
+
+    It runs in the workers of :func:`iter_partitions`, with their own
+    database connection, so it only takes picklable arguments. Rows are read
+    from the ``db`` database, the one of the exported queryset.
+    """
+    model = apps.get_model(model_label)
+    queryset = model._default_manager.using(db).all()
+    queryset.query = query
+    queryset = queryset.filter(pk__gte=low)
+    if high is not None:
+        queryset = queryset.filter(pk__lt=high)
+    cells = get_plan(model, fields).cells
+    chunks = iteration.iter_keyset_chunks(queryset, fields, chunk_size=chunk_size)
+    return "".join([rows_xml(chunk, cells) for chunk in chunks])
+
+
+def _setup_worker(settings_module):
+    if settings_module:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def get_process_executor(max_workers):
+    """Returns a process pool whose workers set up Django on start.
+
+    Workers are spawned, not forked, so they never share the database
+    connections of the parent process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_setup_worker,
+        initargs=(os.environ.get("DJANGO_SETTINGS_MODULE"),),
+    )
+
+
+def iter_partitions(queryset, fields, executor, max_workers, chunk_size=iteration.DEFAULT_CHUNK_SIZE):
+    """Yields the sheet XML of ``queryset`` rendered in ``executor``.
+
+    The queryset is split in primary key ranges of ``chunk_size`` rows, each
+    rendered by :func:`render_partition`. XML is yielded in key order, and
+    at most ``2 * max_workers`` ranges are rendered ahead of the one being
+    written, so memory depends on ``chunk_size``, not on the number of rows.
+    """
+    ranges = pk_ranges(queryset, chunk_size)
+    label = queryset.model._meta.label
+    fields = list(fields)
+    pending = deque()
+
+    def submit_next():
+        bounds = next(ranges, None)
+        if bounds is not None:
+            pending.append(
+                executor.submit(render_partition, label, queryset.db, queryset.query, fields, *bounds, chunk_size)
+            )
+
+    for _ in range(2 * max_workers):
+        submit_next()
+    while pending:
+        xml = pending.popleft().result()
+        submit_next()
+        yield xml
@@ -0,0 +1,194 @@
+import json
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+from fundor_utilities.export.columns import resolve_field
+from fundor_utilities.export.xlsx_writer import field_cell
+
+PLAN_CACHE_SIZE = 1024
+
+
+def _naive_datetime(value):
+    if value is not None and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def _string(value):
+    return None if value is None else str(value)
+
+
+def _json(value):
+    return None if value is None else json.dumps(value, default=str)
+
+
+FIELD_CONVERTERS = {
+    "DateTimeField": _naive_datetime,
+    "DurationField": _string,
+    "GenericIPAddressField": _string,
+    "JSONField": _json,
+    "UUIDField": _string,
+}
+"""Converters of the values openpyxl cannot write, by field internal type."""
+
+
+class ExportColumn:
+    """A column of an :class:`ExportPlan`.
+
+    :param name: lookup passed to :func:`QuerySet.values_list`
+    :param field: model field holding the values, ``None`` for annotations
+    :param header: verbose name of ``field``, or ``name``
+    :param cell: function returning the cell XML of a value
+    :param convert: function converting a value for openpyxl, or ``None``
+    """
+
+    __slots__ = ("name", "field", "header", "cell", "convert")
+
+    def __init__(self, name, field, header, cell, convert):
+        self.name = name
+        self.field = field
+        self.header = header
+        self.cell = cell
+        self.convert = convert
+
+    def __repr__(self):
+        return f"<ExportColumn {self.name!r}>"
+
+
+class ExportPlan:
+    """Everything needed to export ``field_names`` of ``model``, resolved once.
+
+    Plans are built by :func:`get_plan` and shared by every request, so they
+    must not be modified.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = tuple(columns)
+        self.field_names = tuple(column.name for column in self.columns)
+        self.headers = tuple(column.header for column in self.columns)
+        self.cells = tuple(column.cell for column in self.columns)
+        self.converters = tuple(column.convert for column in self.columns)
+        self.select_related = _select_related_paths(model, self.field_names)
+
+    def convert_row(self, row):
+        """Returns ``row`` with the values converted for openpyxl.
+
+        :returns: tuple or list
+        """
+        if not any(self.converters):
+            return row
+        return [convert(value) if convert else value for convert, value in zip(self.converters, row, strict=True)]
+
+    def describe(self):
+        """Returns the plan as a dict, for debugging.
+
+        :returns: dict
+        """
+        return {
+            "model": self.model._meta.label if self.model is not None else None,
+            "columns": [
+                {
+                    "name": column.name,
+                    "field": str(column.field) if column.field is not None else None,
+                    "header": str(column.header),
+                    "cell": column.cell.__name__,
+                    "convert": column.convert.__name__ if column.convert else None,
+                }
+                for column in self.columns
+            ],
+            "select_related": list(self.select_related),
+        }
+
+    def __repr__(self):
+        label = self.model._meta.label if self.model is not None else None
+        return f"<ExportPlan {label} {list(self.field_names)!r}>"
+
+
+def _lookup_fields(model, lookup):
+    """Returns the fields followed by ``lookup``, stopping at the first name
+    which is not a model field.
+
+    :returns: list
+    """
+    fields = []
+    for name in lookup.split(LOOKUP_SEP):
+        if model is None:
+            break
+        try:
+            field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        fields.append(field)
+        model = field.related_model
+    return fields
+
+
+def _select_related_paths(model, field_names):
+    """Returns the relations followed by ``field_names`` which can be joined.
+
+    :func:`QuerySet.values_list` already joins them; the paths are meant for
+    code reading model instances instead.
+    """
+    paths = set()
+    for name in field_names:
+        path = []
+        for field in _lookup_fields(model, name)[: name.count(LOOKUP_SEP)]:
+            if not field.many_to_one and not field.one_to_one:
+                break
+            path.append(field.name)
+        if path:
+            paths.add(LOOKUP_SEP.join(path))
+    return tuple(sorted(paths))
+
+
+@lru_cache(maxsize=None)
+def default_field_names(model):
+    """Returns the names of the fields of ``model`` which are not auto created.
+
+    :returns: tuple
+    """
+    return tuple(f.name for f in model._meta.fields if not f.auto_created)
+
+
+def build_plan(model, field_names):
+    """Returns the :class:`ExportPlan` of ``field_names`` of ``model``.
+
+    :returns: :class:`ExportPlan`
+    """
+    columns = []
+    for name in field_names:
+        field = resolve_field(model, name)
+        # relations are named after themselves, not after the key they hold
+        named = _lookup_fields(model, name)
+        header = getattr(named[-1], "verbose_name", name) if len(named) == name.count(LOOKUP_SEP) + 1 else name
+        convert = FIELD_CONVERTERS.get(field.get_internal_type()) if field is not None else None
+        columns.append(ExportColumn(name, field, header, field_cell(field), convert))
+    return ExportPlan(model, columns)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _get_plan(model, field_names):
+    return build_plan(model, field_names)
+
+
+def get_plan(model, field_names=None):
+    """Returns the :class:`ExportPlan` of ``field_names`` of ``model``.
+
+    Plans are cached for the life of the process. ``field_names`` defaults to
+    :func:`default_field_names`.
+
+    :returns: :class:`ExportPlan`
+    """
+    if field_names is None:
+        field_names = default_field_names(model)
+    return _get_plan(model, tuple(field_names))
+
+
+def clear_plans():
+    """Empties the cache of :func:`get_plan`, e.g. after changing models."""
+    _get_plan.cache_clear()
+    default_field_names.cache_clear()
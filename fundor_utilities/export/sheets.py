@@ -0,0 +1,110 @@
+from django.db.models import IntegerField
+from django.db.models import Value
+
+from fundor_utilities.export.iteration import CURSOR
+from fundor_utilities.export.plans import get_plan
+
+SUMMARY_TOTAL = "_summary_total"
+
+
+class ExportSheet:
+    """A sheet of the workbook written by
+    :class:`fundor_utilities.views.xlsx_view.XlsxExporterView`.
+
+    :param title: title of the sheet; sheets overflowing the Excel row limit
+        continue in ``<title>_2``, ``<title>_3``...
+    :param queryset: queryset of the rows, or ``None`` for an empty sheet
+    :param field_names: fields exported from ``queryset``; if omitted, all the
+        fields of the model which are not auto created
+    :param col_names: header row; if omitted, no header is written
+    :param model: model of the rows, if ``queryset`` is ``None``
+    :param plan: :class:`fundor_utilities.export.plans.ExportPlan` of the
+        columns; if omitted, the one of ``model`` and ``field_names``
+    :param iteration: how the rows are read, see
+        :mod:`fundor_utilities.export.iteration`; if omitted, the one of the
+        view
+    :param partitioned: whether the rows can be split in primary key ranges
+        by parallel exports
+    """
+
+    def __init__(
+        self, title, queryset, field_names=None, col_names=None, model=None, plan=None, iteration=None, partitioned=True
+    ):
+        self.title = title
+        self.queryset = queryset
+        self.model = queryset.model if queryset is not None else model
+        self.plan = plan if plan is not None else get_plan(self.model, field_names)
+        self.field_names = list(self.plan.field_names)
+        self.col_names = col_names
+        self.iteration = iteration
+        self.partitioned = partitioned
+
+    def get_queryset(self):
+        """Returns a fresh copy of ``queryset``."""
+        if self.queryset is None:
+            return None
+        return self.queryset.all()
+
+    def __repr__(self):
+        return f"<ExportSheet {self.title!r}>"
+
+
+class SummarySheet:
+    """A sheet of aggregates of the exported rows, computed by the database.
+
+    The rows of the export are grouped by ``group_by`` with
+    :func:`QuerySet.values` and ``aggregates`` are computed for each group
+    with :func:`QuerySet.annotate`, in a single query. Without ``group_by``,
+    the sheet has a single row of totals.
+
+    :param title: title of the sheet
+    :param group_by: field names the rows are grouped by
+    :param aggregates: dict of aggregate expressions, e.g.
+        ``{"books": Count("pk"), "total": Sum("price")}``
+    :param col_names: header row; if omitted, the verbose names of
+        ``group_by`` followed by the keys of ``aggregates``
+    :param order_by: ordering of the groups; if omitted, ``group_by``
+    """
+
+    def __init__(self, title, group_by=(), aggregates=None, col_names=None, order_by=None):
+        self.title = title
+        self.group_by = list(group_by)
+        self.aggregates = dict(aggregates or {})
+        self.col_names = col_names
+        self.order_by = list(order_by) if order_by is not None else self.group_by
+
+    def get_queryset(self, queryset):
+        """Returns the aggregates of ``queryset``.
+
+        :returns: :class:`QuerySet`
+        """
+        queryset = queryset.order_by()
+        if self.group_by:
+            queryset = queryset.values(*self.group_by)
+        else:
+            # constants are left out of the GROUP BY clause, so all the rows
+            # make a single group
+            queryset = queryset.values(**{SUMMARY_TOTAL: Value(1, output_field=IntegerField())})
+        return queryset.annotate(**self.aggregates).order_by(*self.order_by)
+
+    def get_sheet(self, queryset, add_col_names=True):
+        """Returns the :class:`ExportSheet` of the aggregates of ``queryset``.
+
+        :returns: :class:`ExportSheet`
+        """
+        field_names = self.group_by + list(self.aggregates)
+        plan = get_plan(queryset.model, field_names)
+        col_names = None
+        if add_col_names:
+            col_names = self.col_names or [str(header) for header in plan.headers]
+        return ExportSheet(
+            self.title,
+            self.get_queryset(queryset),
+            col_names=col_names,
+            plan=plan,
+            iteration=CURSOR,
+            partitioned=False,
+        )
+
+    def __repr__(self):
+        return f"<SummarySheet {self.title!r}>"
@@ -0,0 +1,494 @@
+import datetime
+import math
+import re
+import zipfile
+from collections.abc import Iterable
+from decimal import Decimal
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+from django.utils import timezone
+
+SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+DOCUMENT_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Index of the ``cellXfs`` entries declared in ``STYLES_XML``
+STYLE_DATE = 1
+STYLE_DATETIME = 2
+STYLE_TIME = 3
+
+MAX_ROWS = 1048576
+"""Maximum number of rows of an Excel worksheet."""
+
+FLUSH_SIZE = 64 * 1024
+"""Amount of sheet XML (in characters) buffered before it is compressed."""
+
+INVALID_SHEET_TITLE = re.compile(r"[\\*?:/\[\]]")
+ILLEGAL_XML_CHARS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "{sheets}"
+    "</Types>"
+)
+
+SHEET_CONTENT_TYPE_XML = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{RELATIONSHIPS_NS}">'
+    f'<Relationship Id="rId1" Type="{DOCUMENT_RELATIONSHIPS_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{SPREADSHEET_NS}">'
+    '<numFmts count="2">'
+    '<numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd h:mm:ss"/>'
+    "</numFmts>"
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    "</cellXfs>"
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+SHEET_HEADER_XML = XML_DECLARATION + f'<worksheet xmlns="{SPREADSHEET_NS}"><sheetData>'
+SHEET_FOOTER_XML = "</sheetData></worksheet>"
+
+
+def sheet_title(title):
+    """Returns ``title`` as a valid worksheet name.
+
+    Excel limits sheet names to 31 characters and forbids some of them.
+
+    :raises: ValueError
+
+    :returns: str
+    """
+    title = str(title)
+    if INVALID_SHEET_TITLE.search(title):
+        raise ValueError(f"Invalid character found in sheet title {title!r}")
+    return title[:31]
+
+
+def overflow_title(title, part):
+    """Returns the title of the ``part``-th sheet holding the rows of ``title``.
+
+    :returns: str
+    """
+    suffix = f"_{part}"
+    return sheet_title(str(title)[: 31 - len(suffix)] + suffix)
+
+
+def inline_string_cell(value):
+    """Returns the XML of a cell holding ``value`` as an inline string."""
+    text = ILLEGAL_XML_CHARS.sub("", str(value))
+    if text != text.strip():
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+    return f'<c t="inlineStr"><is><t>{escape(text)}</t></is></c>'
+
+
+def number_cell(value):
+    """Returns the XML of a cell holding a numeric ``value``.
+
+    NaN and infinities have no XLSX representation and are written as text.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return inline_string_cell(value)
+    if isinstance(value, Decimal) and not value.is_finite():
+        return inline_string_cell(value)
+    return f"<c><v>{value}</v></c>"
+
+
+def datetime_cell(value):
+    """Returns the XML of a cell holding a datetime as an Excel serial number."""
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value)
+    delta = value - EXCEL_EPOCH
+    serial = delta.days + (delta.seconds + delta.microseconds / 1000000) / 86400
+    return f'<c s="{STYLE_DATETIME}"><v>{serial}</v></c>'
+
+
+def date_cell(value):
+    """Returns the XML of a cell holding a date as an Excel serial number."""
+    return f'<c s="{STYLE_DATE}"><v>{(value - EXCEL_EPOCH.date()).days}</v></c>'
+
+
+def time_cell(value):
+    """Returns the XML of a cell holding a time as a fraction of a day."""
+    seconds = value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1000000
+    return f'<c s="{STYLE_TIME}"><v>{seconds / 86400}</v></c>'
+
+
+def boolean_cell(value):
+    """Returns the XML of a cell holding a boolean."""
+    return f'<c t="b"><v>{int(value)}</v></c>'
+
+
+def integer_cell(value):
+    """Returns the XML of a cell holding an integer."""
+    return f"<c><v>{value}</v></c>"
+
+
+def cell(value):
+    """Returns the XML of a cell holding ``value``, inferring its type."""
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return boolean_cell(value)
+    if isinstance(value, (int, float, Decimal)):
+        return number_cell(value)
+    if isinstance(value, datetime.datetime):
+        return datetime_cell(value)
+    if isinstance(value, datetime.date):
+        return date_cell(value)
+    if isinstance(value, datetime.time):
+        return time_cell(value)
+    return inline_string_cell(value)
+
+
+FIELD_CELLS = {
+    "AutoField": integer_cell,
+    "BigAutoField": integer_cell,
+    "SmallAutoField": integer_cell,
+    "IntegerField": integer_cell,
+    "BigIntegerField": integer_cell,
+    "SmallIntegerField": integer_cell,
+    "PositiveIntegerField": integer_cell,
+    "PositiveBigIntegerField": integer_cell,
+    "PositiveSmallIntegerField": integer_cell,
+    "DecimalField": number_cell,
+    "FloatField": number_cell,
+    "BooleanField": boolean_cell,
+    "DateField": date_cell,
+    "DateTimeField": datetime_cell,
+    "TimeField": time_cell,
+    "CharField": inline_string_cell,
+    "TextField": inline_string_cell,
+    "SlugField": inline_string_cell,
+    "EmailField": inline_string_cell,
+    "URLField": inline_string_cell,
+}
+"""Cell functions for the values of model fields, by internal type."""
+
+
+def _nullable(cell_function):
+    def nullable_cell(value):
+        if value is None:
+            return "<c/>"
+        return cell_function(value)
+
+    return nullable_cell
+
+
+def field_cell(field):
+    """Returns the cell function for the values of model ``field``.
+
+    The function is picked once for each column, so rows are serialized
+    without checking the type of every value. Fields whose type is unknown,
+    or ``None``, use :func:`cell`.
+
+    :returns: callable
+    """
+    if field is None:
+        return cell
+    cell_function = FIELD_CELLS.get(field.get_internal_type())
+    if cell_function is None:
+        return cell
+    return _nullable(cell_function)
+
+
+def row_xml(row, cells=None):
+    """Returns the XML of ``row``.
+
+    :param cells: cell functions for each column, see :func:`field_cell`.
+        If omitted, the type of every value is inferred.
+    """
+    if cells is None:
+        return "<row>" + "".join([cell(value) for value in row]) + "</row>"
+    return "<row>" + "".join([to_cell(value) for to_cell, value in zip(cells, row, strict=True)]) + "</row>"
+
+
+def rows_xml(rows, cells=None):
+    """Returns the XML of all the ``rows``, see :func:`row_xml`."""
+    return "".join([row_xml(row, cells) for row in rows])
+
+
+class RenderedRows(NamedTuple):
+    """Rows of a sheet already serialized to XML, e.g. by :func:`rows_xml`.
+
+    Rows carry no reference to their position, so fragments rendered
+    separately can be written one after the other.
+    """
+
+    fragments: Iterable[str]
+
+
+class _ChunkBuffer:
+    """Write-only file object collecting the bytes produced by the zip file.
+
+    It is not seekable, so :class:`zipfile.ZipFile` writes every member with a
+    data descriptor and never goes back over what was already emitted.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class XlsxStreamWriter:
+    """Incremental XLSX writer.
+
+    Rows are serialized straight to SpreadsheetML and compressed as they come,
+    so the memory used does not depend on the number of rows. The bytes of the
+    file are collected with :func:`read` while the workbook is being written.
+
+    When a worksheet reaches ``max_rows`` rows, the following ones are written
+    in a new worksheet named after the first one: ``<title>_2``,
+    ``<title>_3``...
+
+    Worksheets are written with ZIP64 sizes unless ``zip64`` is ``False``:
+    their size is unknown when they are opened, and without them a worksheet
+    reaching 2 GiB uncompressed fails once the response has started.
+    """
+
+    def __init__(self, compresslevel=None, zip64=True, max_rows=MAX_ROWS):
+        self._buffer = _ChunkBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._zip64 = zip64
+        self.max_rows = max_rows
+        self._sheets = []
+        self._entry = None
+        self._pending = []
+        self._pending_size = 0
+        self._title = None
+        self._header = None
+        self._part = 0
+        self._row_count = 0
+
+    def open_sheet(self, title, header=None):
+        """Starts a new worksheet, closing the current one if any.
+
+        :param header: row written first, and again at the top of the
+            worksheets following this one when it overflows
+
+        :raises: ValueError
+        """
+        if header is not None and self.max_rows < 2:
+            raise ValueError("max_rows must leave room for rows after the header.")
+        self._title = title
+        self._header = header
+        self._part = 1
+        self._start_sheet(title)
+
+    def _start_sheet(self, title):
+        if self._entry is not None:
+            self.close_sheet()
+        title = sheet_title(title)
+        if title in self._sheets:
+            raise ValueError(f"Duplicate sheet title {title!r}")
+        self._sheets.append(title)
+        path = f"xl/worksheets/sheet{len(self._sheets)}.xml"
+        self._entry = self._zip.open(path, "w", force_zip64=self._zip64)
+        self._write(SHEET_HEADER_XML)
+        self._row_count = 0
+        if self._header is not None:
+            self._write(row_xml(self._header))
+            self._row_count = 1
+
+    def _rollover(self):
+        self._part += 1
+        self._start_sheet(overflow_title(self._title, self._part))
+
+    def write_row(self, row, cells=None):
+        """Appends ``row`` to the current worksheet.
+
+        :param cells: cell functions for each column, see :func:`field_cell`.
+            If omitted, the type of every value is inferred.
+        """
+        if self._row_count >= self.max_rows:
+            self._rollover()
+        self._write(row_xml(row, cells))
+        self._row_count += 1
+
+    def write_rows(self, rows, cells=None):
+        """Appends every row of ``rows`` to the current worksheet."""
+        for row in rows:
+            self.write_row(row, cells)
+
+    def write_xml(self, xml):
+        """Appends rows already serialized by :func:`rows_xml`."""
+        count = xml.count("<row>")
+        while self._row_count + count > self.max_rows:
+            room = self.max_rows - self._row_count
+            # split before the first row which does not fit
+            index = 0
+            for _ in range(room):
+                index = xml.find("<row>", index + 1)
+            self._write(xml[:index])
+            xml = xml[index:]
+            count -= room
+            self._rollover()
+        self._write(xml)
+        self._row_count += count
+
+    def close_sheet(self):
+        self._write(SHEET_FOOTER_XML)
+        self._flush()
+        self._entry.close()
+        self._entry = None
+
+    def close(self):
+        """Writes the workbook parts and the zip central directory."""
+        if self._entry is not None:
+            self.close_sheet()
+        if not self._sheets:
+            self.open_sheet("Sheet")
+            self.close_sheet()
+        self._zip.writestr("[Content_Types].xml", self._content_types_xml())
+        self._zip.writestr("_rels/.rels", ROOT_RELS_XML)
+        self._zip.writestr("xl/workbook.xml", self._workbook_xml())
+        self._zip.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels_xml())
+        self._zip.writestr("xl/styles.xml", STYLES_XML)
+        self._zip.close()
+
+    def read(self):
+        """Returns the bytes written since the last call."""
+        return self._buffer.read()
+
+    def _write(self, text):
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._entry.write("".join(self._pending).encode("utf-8"))
+            self._pending.clear()
+            self._pending_size = 0
+
+    def _content_types_xml(self):
+        sheets = "".join(SHEET_CONTENT_TYPE_XML.format(index=index) for index in range(1, len(self._sheets) + 1))
+        return CONTENT_TYPES_XML.format(sheets=sheets)
+
+    def _workbook_xml(self):
+        sheets = "".join(
+            f'<sheet name={quoteattr(title)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, title in enumerate(self._sheets, start=1)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{SPREADSHEET_NS}" xmlns:r="{DOCUMENT_RELATIONSHIPS_NS}">'
+            f"<sheets>{sheets}</sheets></workbook>"
+        )
+
+    def _workbook_rels_xml(self):
+        relationships = [
+            f'<Relationship Id="rId{index}" Type="{DOCUMENT_RELATIONSHIPS_NS}/worksheet" '
+            f'Target="worksheets/sheet{index}.xml"/>'
+            for index in range(1, len(self._sheets) + 1)
+        ]
+        relationships.append(
+            f'<Relationship Id="rId{len(self._sheets) + 1}" Type="{DOCUMENT_RELATIONSHIPS_NS}/styles" '
+            'Target="styles.xml"/>'
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{RELATIONSHIPS_NS}">{"".join(relationships)}</Relationships>'
+        )
+
+
+def stream_xlsx(sheets, **kwargs):
+    """Yields the bytes of a workbook as soon as they are produced.
+
+    :param sheets: iterable of ``(title, header, rows, cells)`` tuples, one for
+        each sheet. ``header`` is written first, unless it is ``None``, and
+        repeated on overflow sheets; ``cells`` are passed to :func:`XlsxStreamWriter.write_row`. ``rows``
+        may be :class:`RenderedRows`.
+    :param kwargs: kwargs passed to :class:`XlsxStreamWriter`
+    """
+    writer = XlsxStreamWriter(**kwargs)
+    for title, header, rows, cells in sheets:
+        writer.open_sheet(title, header)
+        data = writer.read()
+        if data:
+            yield data
+        if isinstance(rows, RenderedRows):
+            for fragment in rows.fragments:
+                writer.write_xml(fragment)
+                data = writer.read()
+                if data:
+                    yield data
+            continue
+        for row in rows:
+            writer.write_row(row, cells)
+            data = writer.read()
+            if data:
+                yield data
+    writer.close()
+    yield writer.read()
+
+
+async def astream_xlsx(sheets, **kwargs):
+    """Asynchronous version of :func:`stream_xlsx`.
+
+    :param sheets: iterable of ``(title, header, chunks, cells)`` tuples, where
+        ``chunks`` is an asynchronous iterable over lists of rows, or over
+        sheet XML already rendered by :func:`rows_xml`
+    :param kwargs: kwargs passed to :class:`XlsxStreamWriter`
+    """
+    writer = XlsxStreamWriter(**kwargs)
+    for title, header, chunks, cells in sheets:
+        writer.open_sheet(title, header)
+        data = writer.read()
+        if data:
+            yield data
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                writer.write_xml(chunk)
+            else:
+                writer.write_rows(chunk, cells)
+            data = writer.read()
+            if data:
+                yield data
+    writer.close()
+    yield writer.read()
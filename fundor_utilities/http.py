@@ -0,0 +1,37 @@
+def get_encoding_quality(request, coding):
+    """Returns the quality the ``Accept-Encoding`` header of ``request``
+    gives to the content ``coding``, from 0 (not acceptable) to 1.
+
+    An explicit entry for ``coding`` wins over ``*``; a missing header
+    accepts nothing but the identity coding.
+
+    :returns: float
+    """
+    coding = coding.lower()
+    explicit = wildcard = None
+    for entry in request.headers.get("Accept-Encoding", "").split(","):
+        name, *params = (part.strip() for part in entry.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _sep, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        name = name.lower()
+        if name == coding or (coding == "gzip" and name == "x-gzip"):
+            explicit = quality if explicit is None else max(explicit, quality)
+        elif name == "*":
+            wildcard = quality
+    if explicit is not None:
+        return explicit
+    return wildcard or 0.0
+
+
+def accepts_gzip(request):
+    """Returns whether the client of ``request`` accepts gzipped content.
+
+    :returns: bool
+    """
+    return get_encoding_quality(request, "gzip") > 0
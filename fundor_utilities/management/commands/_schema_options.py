@@ -0,0 +1,53 @@
+from django.utils.module_loading import import_string
+
+from fundor_utilities.views.swagger.swagger_openapi import ServerSwagger
+
+
+def add_generator_arguments(parser):
+    """Adds the arguments of :func:`get_generator` to ``parser``."""
+    parser.add_argument(
+        "--generator-class",
+        default="fundor_utilities.views.swagger.swagger_openapi.SortedPathSchemaGenerator",
+        help="dotted path of the schema generator",
+    )
+    parser.add_argument("--title", help="title of the API")
+    parser.add_argument("--description", help="description of the API")
+    parser.add_argument("--api-version", help="version of the API")
+    parser.add_argument("--url", help="base URL of the endpoints")
+    parser.add_argument("--urlconf", help="URLconf module of the endpoints, ROOT_URLCONF by default")
+    parser.add_argument("--parallel-workers", type=int, help="number of threads describing the operations")
+    parser.add_argument(
+        "--server",
+        nargs=2,
+        action="append",
+        metavar=("URL", "DESCRIPTION"),
+        help="server of the API, can be repeated",
+    )
+
+
+def get_generator(options):
+    """Returns the schema generator given by the command ``options``.
+
+    :returns: :class:`SortedPathSchemaGenerator`
+    """
+    generator_class = import_string(options["generator_class"])
+    generator = generator_class(
+        title=options["title"],
+        url=options["url"],
+        description=options["description"],
+        urlconf=options["urlconf"],
+        version=options["api_version"],
+    )
+    if options["parallel_workers"]:
+        generator.parallel_workers = options["parallel_workers"]
+    return generator
+
+
+def get_servers(options):
+    """Returns the servers given by the command ``options``, or ``None``.
+
+    :returns: list of :class:`ServerSwagger`
+    """
+    if not options["server"]:
+        return None
+    return [ServerSwagger(url, description) for url, description in options["server"]]
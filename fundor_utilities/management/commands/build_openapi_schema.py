@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from fundor_utilities.management.commands._schema_options import add_generator_arguments
+from fundor_utilities.management.commands._schema_options import get_generator
+from fundor_utilities.management.commands._schema_options import get_servers
+from fundor_utilities.views.swagger.prebuilt_schema import get_schema_path
+from fundor_utilities.views.swagger.prebuilt_schema import write_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the public OpenAPI schema and writes it as JSON and gzipped JSON, "
+        "to be served by PrebuiltSchemaView."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="path of the JSON file, FUNDOR_SCHEMA_PATH by default")
+        add_generator_arguments(parser)
+
+    def handle(self, *args, **options):
+        path = options["output"] or get_schema_path()
+        schema = get_generator(options).get_schema(public=True, servers=get_servers(options))
+        if schema is None:
+            raise CommandError("No endpoint found to build the schema from.")
+        size, compressed_size = write_schema(schema, path)
+        self.stdout.write(f"Wrote {path} ({size} bytes) and {path}.gz ({compressed_size} bytes).")
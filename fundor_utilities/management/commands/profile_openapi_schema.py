@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from fundor_utilities.management.commands._schema_options import add_generator_arguments
+from fundor_utilities.management.commands._schema_options import get_generator
+from fundor_utilities.management.commands._schema_options import get_servers
+from fundor_utilities.views.swagger.profiler import PHASES
+from fundor_utilities.views.swagger.profiler import SchemaProfiler
+
+
+class Command(BaseCommand):
+    help = "Generates the OpenAPI schema and reports the time spent on each endpoint, by phase, as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="username of the user the schema is built for, public schema by default")
+        parser.add_argument("--sort", default="total", choices=("total",) + PHASES, help="sort key of the endpoints")
+        parser.add_argument("--limit", type=int, help="number of endpoints reported, all of them by default")
+        parser.add_argument("--output", help="file written with the report, instead of the standard output")
+        add_generator_arguments(parser)
+
+    def get_request(self, username):
+        """Returns a request of the user named ``username``.
+
+        :raises: CommandError
+
+        :returns: :class:`Request`
+        """
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            raise CommandError(f"No user named {username!r}.") from None
+        request = Request(RequestFactory().get("/"))
+        request.user = user
+        return request
+
+    def handle(self, *args, **options):
+        generator = get_generator(options)
+        generator.profiler = SchemaProfiler()
+        request = self.get_request(options["user"]) if options["user"] else None
+        generator.get_schema(request, public=request is None, servers=get_servers(options))
+        report = generator.profiler.report(sort=options["sort"], limit=options["limit"])
+        data = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fileobj:
+                fileobj.write(data)
+        else:
+            self.stdout.write(data)
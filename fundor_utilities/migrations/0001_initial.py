@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    """Creates the table of MarkdownContent, which predates the migrations of
+    the app: on databases where it already exists, apply it with
+    ``migrate fundor_utilities 0001 --fake``."""
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="MarkdownContent",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("title", models.CharField(max_length=100)),
+                ("content", models.TextField()),
+                ("slug", models.SlugField(blank=True)),
+            ],
+            options={
+                "verbose_name_plural": "Markdown content",
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fundor_utilities", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportTombstone",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("model_label", models.CharField(max_length=255)),
+                ("object_pk", models.CharField(max_length=255)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["model_label", "deleted_at"], name="fundor_util_model_l_dda374_idx")],
+            },
+        ),
+    ]
@@ -12,3 +12,18 @@ class MarkdownContent(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class ExportTombstone(models.Model):
+    """Primary key of a deleted instance, listed by delta exports."""
+
+    id = models.BigAutoField(primary_key=True)
+    model_label = models.CharField(max_length=255)
+    object_pk = models.CharField(max_length=255)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["model_label", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_pk}"
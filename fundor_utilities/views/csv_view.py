@@ -0,0 +1,265 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import force_str
+from django.utils.translation import gettext_lazy as _
+from django.views.generic import View
+
+from fundor_utilities.exception import NoModelFoundException
+from fundor_utilities.export import iteration
+from fundor_utilities.export import plans
+from fundor_utilities.export.delimited import DelimitedEncoder
+from fundor_utilities.export.delimited import stream_delimited
+from fundor_utilities.export.metrics import CONVERT
+from fundor_utilities.export.metrics import ExportMetrics
+from fundor_utilities.http import accepts_gzip
+from fundor_utilities.views.export_job_view import BackgroundExportMixin
+
+GZIP_ENCODING = "encoding"
+GZIP_ATTACHMENT = "attachment"
+
+
+class CsvExporterView(BackgroundExportMixin, View):
+    """Generic View class which streams a queryset as a CSV file.
+
+    Rows are read from the database in chunks, like
+    :class:`fundor_utilities.views.xlsx_view.XlsxExporterView` does, and
+    written through :func:`csv.writer` while they are sent, so memory usage
+    does not grow with the number of rows. Values are read with
+    :func:`QuerySet.values_list`; ``clean_<field>`` methods are applied to
+    them.
+    """
+
+    http_method_names = ["options", "head", "get"]
+    model = None
+    """
+    Name of a model. If provided, all objects of the model will for the
+    queryset. If omitted, :func:`get_queryset_for_csv` method must be
+    overridden.
+    """
+
+    field_names = None
+    """
+    List of ``model`` field names written to the file, in order. If omitted,
+    all the fields of the model which are not auto created.
+    """
+
+    filename = None
+    """
+    Name used for the file generated. If omitted, ``<model>_list.csv``.
+    """
+
+    add_col_names = False
+    """
+    Set this to ``True`` to add column names (header) to the file. Default
+    value is ``False``.
+    """
+
+    col_names = None
+    """
+    Column names to be used for writing the header row. If omitted, the
+    verbose names of the fields are used.
+    """
+
+    csv_dialect = "excel"
+    """
+    ``dialect`` argument of :func:`csv.writer`.
+    """
+
+    encoding = "utf-8"
+    """
+    Encoding of the file.
+    """
+
+    gzip = None
+    """
+    Compress the file on the fly with gzip. ``"encoding"`` sends it with a
+    ``Content-Encoding: gzip`` header to the clients accepting it, which
+    decompress it transparently. ``"attachment"`` sends a ``.gz`` file. If
+    omitted, the file is not compressed.
+    """
+
+    compresslevel = 6
+    """
+    gzip compression level, from 1 (fastest) to 9 (smallest).
+    """
+
+    chunk_size = iteration.DEFAULT_CHUNK_SIZE
+    """
+    Number of rows fetched from the database and written at a time.
+    """
+
+    queryset_iteration = iteration.CURSOR
+    """
+    How rows are read from the database, ``"cursor"`` or ``"keyset"``, see
+    :attr:`XlsxExporterView.queryset_iteration`.
+    """
+
+    extension = "csv"
+    """
+    Extension of the default filename.
+    """
+
+    file_content_type = "text/csv"
+    """
+    Content type of the uncompressed file.
+    """
+
+    @property
+    def _content_type(self):
+        if self.gzip == GZIP_ATTACHMENT:
+            return "application/gzip"
+        return f"{self.file_content_type}; charset={self.encoding}"
+
+    def get_queryset_for_csv(self):
+        """Returns the queryset to export.
+
+        By default, it returns all instances of ``model``.
+
+        :raises: NoModelFoundException
+
+        :returns: :class:`QuerySet`
+        """
+        if self.model is None:
+            exception_msg = "No model to get queryset from. Either provide a model or override get_queryset_for_csv."
+            raise NoModelFoundException(_(exception_msg))
+        return self.model.objects.all()
+
+    def get_field_names(self):
+        """Returns the fields names to be included in the file.
+
+        :raises: NoModelFoundException
+
+        :returns: list
+        """
+        if self.field_names:
+            return self.field_names
+        if self.model is None:
+            exception_msg = "No model to get field names from. Either provide a model or override get_field_names."
+            raise NoModelFoundException(_(exception_msg))
+        return list(plans.default_field_names(self.model))
+
+    def get_col_names(self):
+        """Returns the column names of the header row.
+
+        :raises: TypeError
+
+        :returns: list
+        """
+        if self.col_names:
+            if not isinstance(self.col_names, list):
+                raise TypeError(_("col_names must be a list."))
+            return self.col_names
+        return [force_str(header) for header in plans.get_plan(self.model, self.get_field_names()).headers]
+
+    def get_filename(self):
+        """Returns the name of the file, ending in ``.gz`` when it is sent as
+        a gzip attachment.
+
+        :raises: NoModelFoundException
+
+        :returns: str
+        """
+        filename = self.filename
+        if filename is None:
+            if self.model is None:
+                exception_msg = (
+                    "No model to generate filename. Either provide model or filename or override get_filename."
+                )
+                raise NoModelFoundException(_(exception_msg))
+            filename = f"{self.model.__name__.lower()}_list.{self.extension}"
+        if self.gzip == GZIP_ATTACHMENT and not filename.endswith(".gz"):
+            filename += ".gz"
+        return filename
+
+    def get_csv_writer_kwargs(self, **kwargs):
+        """Returns the kwargs to be passed to :func:`csv.writer`.
+
+        :returns: dict
+        """
+        return kwargs
+
+    def _get_chunks(self):
+        """Yields the rows to export, in lists."""
+        queryset = self.get_queryset_for_csv()
+        if queryset is None:
+            return
+        fields = self.get_field_names()
+        cleaners = [getattr(self, f"clean_{field}", None) for field in fields]
+        chunks = iteration.iter_chunks(queryset, fields, chunk_size=self.chunk_size, iteration=self.queryset_iteration)
+        for chunk in chunks:
+            if any(cleaners):
+                chunk = [
+                    [clean(value) if clean else value for clean, value in zip(cleaners, row, strict=True)]
+                    for row in chunk
+                ]
+            yield chunk
+
+    def get_export_metrics(self):
+        """Returns the :class:`fundor_utilities.export.metrics.ExportMetrics`
+        of an export, sending the export signals with this view class as
+        sender.
+
+        :returns: :class:`ExportMetrics`
+        """
+        return ExportMetrics(type(self), view=self)
+
+    def _format_chunks(self, formatter, metrics):
+        for chunk in metrics.iter_chunks(self._get_chunks()):
+            with metrics.timed(CONVERT):
+                lines = formatter.format(chunk)
+            yield lines
+
+    def _stream(self, compress):
+        metrics = self.get_export_metrics()
+        header = self.get_col_names() if self.add_col_names else None
+        kwargs = self.get_csv_writer_kwargs()
+        formatter = DelimitedEncoder(dialect=self.csv_dialect, **kwargs)
+        data = stream_delimited(
+            header,
+            self._format_chunks(formatter, metrics),
+            dialect=self.csv_dialect,
+            encoding=self.encoding,
+            compress=compress,
+            compresslevel=self.compresslevel,
+            **kwargs,
+        )
+        return metrics.iter_output(data)
+
+    def write_export(self, fileobj):
+        """Writes the file to ``fileobj``, gzipped if sent as a gzip
+        attachment."""
+        for data in self._stream(self.gzip == GZIP_ATTACHMENT):
+            fileobj.write(data)
+
+    def _check_gzip(self):
+        if self.gzip not in (None, GZIP_ENCODING, GZIP_ATTACHMENT):
+            raise ImproperlyConfigured(f"Unknown gzip mode {self.gzip!r}.")
+
+    def _compresses(self):
+        """Returns whether the response is gzipped."""
+        return self.gzip == GZIP_ATTACHMENT or (self.gzip == GZIP_ENCODING and accepts_gzip(self.request))
+
+    def _streaming_response(self, data, compress):
+        response = StreamingHttpResponse(data, content_type=self._content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename()}"'  # noqa:B907
+        if self.gzip == GZIP_ENCODING:
+            patch_vary_headers(response, ["Accept-Encoding"])
+            if compress:
+                response["Content-Encoding"] = "gzip"
+        return response
+
+    def get(self, request, *args, **kwargs):
+        self._check_gzip()
+        if self.background:
+            return self.enqueue_export()
+        compress = self._compresses()
+        return self._streaming_response(self._stream(compress), compress)
+
+
+class TsvExporterView(CsvExporterView):
+    """Streams a queryset as a TSV file, see :class:`CsvExporterView`."""
+
+    csv_dialect = "excel-tab"
+    extension = "tsv"
+    file_content_type = "text/tab-separated-values"
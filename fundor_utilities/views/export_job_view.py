@@ -0,0 +1,120 @@
+import os
+import re
+from abc import ABC
+from abc import abstractmethod
+
+from django.http import FileResponse
+from django.http import Http404
+from django.http import HttpResponse
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.views.generic import View
+
+from fundor_utilities.export.jobs import get_job_manager
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+BLOCK_SIZE = 64 * 1024
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as fileobj:
+        fileobj.seek(start)
+        while length > 0:
+            data = fileobj.read(min(BLOCK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+def ranged_file_response(request, path, filename, content_type):
+    """Returns a response serving the file at ``path``.
+
+    A single ``Range`` of bytes is honoured with a ``206 Partial Content``
+    response; requests with several ranges get the whole file.
+
+    :returns: :class:`HttpResponse`
+    """
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get("Range", "").strip())
+    if match is None or match.groups() == ("", ""):
+        response = FileResponse(open(path, "rb"), as_attachment=True, filename=filename, content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    start, end = match.groups()
+    if start:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    else:
+        # suffix range, the last ``end`` bytes
+        start, end = max(size - int(end), 0), size - 1
+    if start > end:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'  # noqa:B907
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+class BackgroundExportMixin(ABC):
+    """Mixin running the export of a view in background.
+
+    When ``background`` is ``True`` the export is spooled to disk by the
+    process-wide :class:`ExportJobManager`, and the view answers with the
+    token of the job, which :class:`ExportJobView` uses to report progress
+    and serve the file.
+
+    Views using it must implement :func:`write_export`, which the job runs.
+    """
+
+    background = False
+    """
+    Set this to ``True`` to run the export in background. Default value is
+    ``False``.
+    """
+
+    job_url_name = None
+    """
+    URL name of the :class:`ExportJobView`, taking a ``token`` argument. If
+    provided, the URL of the job is added to the response.
+    """
+
+    @abstractmethod
+    def write_export(self, fileobj):
+        """Writes the whole export to ``fileobj``, a binary file object."""
+
+    def enqueue_export(self):
+        """Enqueues the export and returns the job as JSON.
+
+        :returns: :class:`JsonResponse`
+        """
+        job = get_job_manager().submit(self.write_export, self.get_filename(), self._content_type)
+        data = job.as_dict()
+        if self.job_url_name is not None:
+            data["url"] = reverse(self.job_url_name, kwargs={"token": job.token})
+        return JsonResponse(data, status=202)
+
+
+class ExportJobView(View):
+    """Reports the progress of an export job and serves its file.
+
+    The job is identified by the ``token`` URL argument. The file is returned,
+    with ``Range`` support, when the job is done and the ``download`` query
+    parameter is given; otherwise the job state is returned as JSON.
+    """
+
+    http_method_names = ["options", "head", "get"]
+
+    def get(self, request, token):
+        job = get_job_manager().get(token)
+        if job is None:
+            raise Http404("No export job found.")
+        if job.is_done and "download" in request.GET:
+            return ranged_file_response(request, job.path, job.filename, job.content_type)
+        return JsonResponse(job.as_dict())
@@ -0,0 +1,146 @@
+import hashlib
+import json
+
+COMPONENT_REF = "#/components/schemas/{name}"
+COMPONENT_PREFIX = COMPONENT_REF.format(name="")
+
+
+def schema_digest(schema):
+    """Returns a digest of ``schema``, the same for equal schemas.
+
+    :returns: str
+    """
+    data = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ComponentRegistry:
+    """The schemas of ``components/schemas``, filled while the operations are
+    generated, so that each serializer is written once and referenced with
+    ``$ref`` by the operations using it.
+
+    ``references`` memoizes the references of the serializers already
+    mapped, see :func:`CustomAutoSchema.get_serializer_cache_key`.
+    """
+
+    def __init__(self):
+        self.schemas = {}
+        self.references = {}
+        self._collisions = set()
+
+    def register(self, name, schema):
+        """Stores ``schema`` as ``name`` and returns its reference.
+
+        Equal schemas share the same component. If another schema already
+        holds ``name``, ``schema`` is stored as ``<name>_<digest>``; the
+        schema holding ``name`` is renamed the same way by
+        :func:`get_renamed`, so names do not depend on the order the schemas
+        are registered in.
+
+        :returns: dict
+        """
+        existing = self.schemas.get(name)
+        if existing is not None and existing != schema:
+            self._collisions.add(name)
+            name = digest_name(name, schema)
+        self.schemas.setdefault(name, schema)
+        return {"$ref": COMPONENT_REF.format(name=name)}
+
+    def get_renamed(self):
+        """Returns the new names of the schemas holding a name other schemas
+        were registered under, see :func:`rename_references`.
+
+        :returns: dict
+        """
+        return {name: digest_name(name, self.schemas[name]) for name in self._collisions}
+
+    def merge(self, registry):
+        """Registers the schemas of another registry, the ones they refer to
+        first.
+
+        :returns: dict of the new names of the schemas which were renamed
+        """
+        renamed = {}
+        pending = dict(registry.schemas)
+        while pending:
+            for name, schema in list(pending.items()):
+                if referenced_names(schema) & (pending.keys() - {name}):
+                    continue
+                reference = self.register(name, rename_references(schema, renamed))
+                new_name = component_name(reference["$ref"])
+                if new_name != name:
+                    renamed[name] = new_name
+                del pending[name]
+        self._collisions |= registry._collisions
+        return renamed
+
+    def get_schemas(self):
+        """Returns the components, sorted by their names given by
+        :func:`get_renamed`.
+
+        :returns: dict
+        """
+        renamed = self.get_renamed()
+        return dict(
+            sorted(
+                (renamed.get(name, name), rename_references(schema, renamed)) for name, schema in self.schemas.items()
+            )
+        )
+
+
+def digest_name(name, schema):
+    """Returns ``name`` suffixed with the digest of ``schema``.
+
+    :returns: str
+    """
+    return f"{name}_{schema_digest(schema)[:8]}"
+
+
+def component_name(reference):
+    """Returns the name of the component of ``reference``, or ``None``.
+
+    :returns: str
+    """
+    if isinstance(reference, str) and reference.startswith(COMPONENT_PREFIX):
+        return reference.removeprefix(COMPONENT_PREFIX)
+    return None
+
+
+def referenced_names(schema):
+    """Returns the names of the components ``schema`` refers to.
+
+    :returns: set
+    """
+    if isinstance(schema, dict):
+        names = set()
+        for key, value in schema.items():
+            if key == "$ref" and component_name(value) is not None:
+                names.add(component_name(value))
+            else:
+                names |= referenced_names(value)
+        return names
+    if isinstance(schema, list):
+        return set().union(*map(referenced_names, schema))
+    return set()
+
+
+def rename_references(schema, renamed):
+    """Returns a copy of ``schema`` with its references to the components
+    of ``renamed`` replaced by references to their new names.
+
+    :returns: dict
+    """
+    if not renamed:
+        return schema
+    if isinstance(schema, dict):
+        result = {}
+        for key, value in schema.items():
+            if key == "$ref" and component_name(value) in renamed:
+                value = COMPONENT_REF.format(name=renamed[component_name(value)])
+            else:
+                value = rename_references(value, renamed)
+            result[key] = value
+        return result
+    if isinstance(schema, list):
+        return [rename_references(value, renamed) for value in schema]
+    return schema
@@ -0,0 +1,75 @@
+import threading
+
+_endpoint_indexes = {}
+_lock = threading.Lock()
+
+
+class Endpoint:
+    """An endpoint of an :class:`EndpointIndex`.
+
+    :param path: path of the endpoint, with ``{pk}`` coerced
+    :param method: HTTP method
+    :param callback: view function of the URL pattern
+    """
+
+    __slots__ = ("path", "method", "callback")
+
+    def __init__(self, path, method, callback):
+        self.path = path
+        self.method = method
+        self.callback = callback
+
+    def __repr__(self):
+        return f"<Endpoint {self.method} {self.path}>"
+
+
+class EndpointIndex:
+    """The endpoints of an API, found once by walking its URL patterns.
+
+    Only what does not depend on the request is indexed: the model and the
+    permissions of a view may, so they are resolved once its request is set.
+
+    Indexes are built by :func:`get_endpoint_index` and shared by every
+    request, so they must not be modified.
+
+    :param endpoints: iterable of :class:`Endpoint`
+    :param shared: whether users with the same permission fingerprint see
+        the same endpoints and fields, see
+        :func:`fundor_utilities.views.swagger.schema_cache.permission_fingerprint`
+    """
+
+    def __init__(self, endpoints, shared=False):
+        self.endpoints = tuple(endpoints)
+        self.shared = shared
+
+    def __iter__(self):
+        return iter(self.endpoints)
+
+    def __len__(self):
+        return len(self.endpoints)
+
+
+def get_endpoint_index(generator):
+    """Returns the :class:`EndpointIndex` of the URL patterns of
+    ``generator``, built once per process by its ``build_endpoint_index``.
+
+    :returns: :class:`EndpointIndex`
+    """
+    key = generator.get_endpoint_index_key()
+    # keys hold the id of the patterns, which may be reused once they are
+    # garbage collected
+    patterns, index = _endpoint_indexes.get(key, (None, None))
+    if index is None or patterns is not generator.patterns:
+        with _lock:
+            patterns, index = _endpoint_indexes.get(key, (None, None))
+            if index is None or patterns is not generator.patterns:
+                index = generator.build_endpoint_index()
+                _endpoint_indexes[key] = generator.patterns, index
+    return index
+
+
+def clear_endpoint_indexes():
+    """Empties the indexes of :func:`get_endpoint_index`, e.g. after changing
+    the URLconf."""
+    with _lock:
+        _endpoint_indexes.clear()
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import gettext_lazy as _
+from django.views.generic import View
+from rest_framework.utils.encoders import JSONEncoder
+
+from fundor_utilities.http import accepts_gzip
+
+SCHEMA_CONTENT_TYPE = "application/vnd.oai.openapi+json"
+GZIP_SUFFIX = ".gz"
+
+_loaded = {}
+
+
+def get_schema_path():
+    """Returns the path of the prebuilt schema, the ``FUNDOR_SCHEMA_PATH``
+    setting.
+
+    :raises: ImproperlyConfigured
+
+    :returns: str
+    """
+    path = getattr(settings, "FUNDOR_SCHEMA_PATH", None)
+    if path is None:
+        raise ImproperlyConfigured("Set FUNDOR_SCHEMA_PATH to the path of the prebuilt OpenAPI schema.")
+    return path
+
+
+def _write_atomic(path, data):
+    # readers never see a partially written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".schema-")
+    try:
+        with os.fdopen(fd, "wb") as fileobj:
+            fileobj.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        # left behind if the file could not be written or replaced
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def write_schema(schema, path, compresslevel=9):
+    """Writes ``schema`` as JSON to ``path``, and gzipped to ``path.gz``.
+
+    The gzipped file has no timestamp, so the same schema always gives the
+    same files.
+
+    :returns: the size of the JSON and of the gzipped JSON
+    """
+    data = json.dumps(schema, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    compressed = gzip.compress(data, compresslevel=compresslevel, mtime=0)
+    _write_atomic(path + GZIP_SUFFIX, compressed)
+    _write_atomic(path, data)
+    return len(data), len(compressed)
+
+
+class PrebuiltSchema:
+    """A schema written by :func:`write_schema`, read in memory."""
+
+    def __init__(self, data, compressed):
+        self.data = data
+        self.compressed = compressed
+        digest = hashlib.sha256(data).hexdigest()
+        self.etag = f'"{digest}"'
+        # strong ETags differ between encodings of the same data
+        self.compressed_etag = f'"{digest}-gzip"'
+
+
+def load_schema(path):
+    """Returns the :class:`PrebuiltSchema` written to ``path``.
+
+    Files are read once, and again when they are rewritten.
+
+    :raises: FileNotFoundError
+
+    :returns: :class:`PrebuiltSchema`
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    loaded = _loaded.get(path)
+    if loaded is None or loaded[0] != version:
+        with open(path, "rb") as fileobj:
+            data = fileobj.read()
+        try:
+            with open(path + GZIP_SUFFIX, "rb") as fileobj:
+                compressed = fileobj.read()
+        except FileNotFoundError:
+            compressed = None
+        loaded = version, PrebuiltSchema(data, compressed)
+        _loaded[path] = loaded
+    return loaded[1]
+
+
+class PrebuiltSchemaView(View):
+    """Generic View class which serves the schema written by the
+    ``build_openapi_schema`` management command.
+
+    Responses carry a strong ETag, so clients revalidating their copy with
+    ``If-None-Match`` get an empty 304 response. The gzipped file is sent to
+    the clients accepting it.
+    """
+
+    http_method_names = ["options", "head", "get"]
+    schema_path = None
+    """
+    Path of the schema. If omitted, the ``FUNDOR_SCHEMA_PATH`` setting.
+    """
+
+    def get_schema_path(self):
+        """Returns the path of the schema.
+
+        :raises: ImproperlyConfigured
+
+        :returns: str
+        """
+        if self.schema_path is not None:
+            return self.schema_path
+        return get_schema_path()
+
+    def get(self, request, *args, **kwargs):
+        try:
+            schema = load_schema(self.get_schema_path())
+        except FileNotFoundError as exc:
+            raise Http404(_("The OpenAPI schema has not been built.")) from exc
+        response = HttpResponse(content_type=SCHEMA_CONTENT_TYPE)
+        if schema.compressed is not None and accepts_gzip(request):
+            response.content, etag = schema.compressed, schema.compressed_etag
+            response["Content-Encoding"] = "gzip"
+        else:
+            response.content, etag = schema.data, schema.etag
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept-Encoding"])
+        # clients check their copy on each use, which costs a 304
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager
+
+VIEW = "view"
+"""Time spent creating the view of an endpoint."""
+
+PERMISSIONS = "permissions"
+"""Time spent checking the permissions of the user on an endpoint."""
+
+PATH_PARAMETERS = "path_parameters"
+"""Time spent describing the parameters of the path."""
+
+QUERY_PARAMETERS = "query_parameters"
+"""Time spent describing the filter and pagination parameters."""
+
+REQUEST_BODY = "request_body"
+"""Time spent describing the request body."""
+
+RESPONSES = "responses"
+"""Time spent describing the responses."""
+
+PHASES = (VIEW, PERMISSIONS, PATH_PARAMETERS, QUERY_PARAMETERS, REQUEST_BODY, RESPONSES)
+
+
+class SchemaProfiler:
+    """Records the time spent generating the schema of each endpoint, by
+    phase.
+
+    Set it as the ``profiler`` of
+    :class:`fundor_utilities.views.swagger.swagger_openapi.SortedPathSchemaGenerator`
+    and generate a schema; :func:`report` then tells which endpoints are
+    slow, and why.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @contextmanager
+    def timed(self, path, method, phase):
+        """Adds the time spent in the block to ``phase`` of the endpoint."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(path, method, phase, time.perf_counter() - start)
+
+    def record(self, path, method, phase, seconds):
+        """Adds ``seconds`` to ``phase`` of the endpoint."""
+        with self._lock:
+            timing = self.timings.setdefault((path, method), {}).setdefault(phase, [0.0, 0])
+            timing[0] += seconds
+            timing[1] += 1
+
+    def report(self, sort="total", limit=None):
+        """Returns the timings of the endpoints, slowest first.
+
+        :param sort: ``"total"`` or a phase, e.g. :data:`REQUEST_BODY`
+        :param limit: number of endpoints returned, all of them if omitted
+
+        :raises: ValueError
+
+        :returns: dict
+        """
+        if sort != "total" and sort not in PHASES:
+            raise ValueError(f"Unknown sort key {sort!r}, expected 'total' or one of {', '.join(PHASES)}.")
+        endpoints = []
+        for (path, method), phases in self.timings.items():
+            endpoints.append(
+                {
+                    "path": path,
+                    "method": method,
+                    "total": sum(seconds for seconds, calls in phases.values()),
+                    "phases": {
+                        phase: {"seconds": phases[phase][0], "calls": phases[phase][1]}
+                        for phase in PHASES
+                        if phase in phases
+                    },
+                }
+            )
+        if sort == "total":
+            endpoints.sort(key=lambda endpoint: endpoint["total"], reverse=True)
+        else:
+            endpoints.sort(key=lambda endpoint: endpoint["phases"].get(sort, {"seconds": 0.0})["seconds"], reverse=True)
+        totals = dict.fromkeys(PHASES, 0.0)
+        for phases in self.timings.values():
+            for phase, (seconds, _calls) in phases.items():
+                totals[phase] += seconds
+        return {
+            "elapsed": self.elapsed,
+            "endpoints_count": len(endpoints),
+            "phases": totals,
+            "endpoints": endpoints[:limit],
+        }
@@ -0,0 +1,94 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from weakref import WeakSet
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+from fundor_utilities.views.swagger.endpoints import clear_endpoint_indexes
+
+DEFAULT_SCHEMA_CACHE_SIZE = 64
+
+_schema_caches = WeakSet()
+
+
+def permission_fingerprint(user):
+    """Returns a digest of what decides which endpoints ``user`` sees.
+
+    Users with the same flags and the same effective permissions, their own
+    and the ones of their groups, get the same fingerprint and share one
+    schema. ``None`` gives the fingerprint of the public schema.
+
+    :returns: str
+    """
+    if user is None:
+        parts = None
+    elif user.is_superuser:
+        # superusers see every endpoint, whatever their permissions
+        parts = (user.is_authenticated, user.is_staff, True)
+    else:
+        parts = (user.is_authenticated, user.is_staff, False, tuple(sorted(user.get_all_permissions())))
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class SchemaCache:
+    """Least recently used cache of the schemas built by
+    :class:`fundor_utilities.views.swagger.swagger_openapi.SortedPathSchemaGenerator`.
+
+    Schemas live in the memory of the process and are shared by every
+    request, so they must not be modified.
+
+    :param maxsize: number of schemas kept; if omitted, the
+        ``FUNDOR_SCHEMA_CACHE_SIZE`` setting, 64 by default
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._schemas = OrderedDict()
+        self._lock = threading.Lock()
+        _schema_caches.add(self)
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            return getattr(settings, "FUNDOR_SCHEMA_CACHE_SIZE", DEFAULT_SCHEMA_CACHE_SIZE)
+        return self._maxsize
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._schemas.move_to_end(key)
+            except KeyError:
+                return default
+            return self._schemas[key]
+
+    def set(self, key, schema):
+        with self._lock:
+            self._schemas[key] = schema
+            self._schemas.move_to_end(key)
+            while len(self._schemas) > self.maxsize:
+                self._schemas.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+
+    def __len__(self):
+        return len(self._schemas)
+
+
+def invalidate_schemas():
+    """Empties every :class:`SchemaCache` and the endpoint indexes, e.g.
+    after changing the URLconf."""
+    clear_endpoint_indexes()
+    for cache in list(_schema_caches):
+        cache.clear()
+
+
+def _invalidate_on_urlconf_change(setting, **kwargs):
+    if setting == "ROOT_URLCONF":
+        invalidate_schemas()
+
+
+setting_changed.connect(_invalidate_on_urlconf_change, dispatch_uid="fundor_utilities.invalidate_schemas")
@@ -0,0 +1,69 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework import renderers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from fundor_utilities.views.swagger.swagger_openapi import SortedPathSchemaGenerator
+
+
+class SchemaView(APIView):
+    """API view serving the OpenAPI schema of the endpoints the user may call.
+
+    With the ``index`` query parameter, it serves the tag index of
+    :func:`SortedPathSchemaGenerator.get_tag_index`, and with ``tag=<name>``
+    the schema of the operations of a single tag, so that Swagger UI only
+    loads the operations it shows.
+    """
+
+    schema = None
+    renderer_classes = [renderers.JSONRenderer]
+    generator_class = SortedPathSchemaGenerator
+    """
+    Class of the schema generator, set its ``schema_cache`` to cache the
+    schemas.
+    """
+
+    title = None
+    description = None
+    version = None
+    url = None
+    urlconf = None
+    servers = None
+    """
+    List of :class:`fundor_utilities.views.swagger.swagger_openapi.ServerSwagger`
+    of the schema.
+    """
+
+    public = False
+    """
+    Set this to ``True`` to list every endpoint, whatever the permissions of
+    the user.
+    """
+
+    index_param = "index"
+    tag_param = "tag"
+
+    def get_generator(self):
+        """Returns the schema generator.
+
+        :returns: :class:`SortedPathSchemaGenerator`
+        """
+        return self.generator_class(
+            title=self.title,
+            url=self.url,
+            description=self.description,
+            urlconf=self.urlconf,
+            version=self.version,
+        )
+
+    def get(self, request, *args, **kwargs):
+        generator = self.get_generator()
+        if self.index_param in request.query_params:
+            data = generator.get_tag_index(request, public=self.public)
+        else:
+            tag = request.query_params.get(self.tag_param)
+            data = generator.get_schema(request, public=self.public, servers=self.servers, tag=tag)
+        if data is None:
+            raise exceptions.NotFound(_("No endpoint found."))
+        return Response(data)
@@ -1,7 +1,14 @@
+import copy
 import re
+import time
 import warnings
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 from operator import attrgetter
+from queue import Empty
+from queue import SimpleQueue
 from urllib.parse import urljoin
 from weakref import WeakKeyDictionary
 
@@ -14,16 +21,20 @@ from django.core.validators import MinLengthValidator
 from django.core.validators import MinValueValidator
 from django.core.validators import RegexValidator
 from django.core.validators import URLValidator
+from django.db import connections
 from django.db import models
 from django.http import Http404
+from django.utils import translation
 from django.utils.encoding import force_str
 from django.utils.encoding import smart_str
 from rest_framework import exceptions
+from rest_framework import permissions
 from rest_framework import renderers
 from rest_framework import serializers
 from rest_framework.compat import uritemplate
 from rest_framework.fields import empty
 from rest_framework.fields import Field
+from rest_framework.generics import GenericAPIView
 from rest_framework.request import clone_request
 from rest_framework.schemas.generators import EndpointEnumerator
 from rest_framework.schemas.generators import get_pk_name
@@ -33,6 +44,24 @@ from rest_framework.settings import api_settings
 from rest_framework.utils import formatting
 from rest_framework.views import APIView
 
+from fundor_utilities.views.swagger.components import ComponentRegistry
+from fundor_utilities.views.swagger.components import rename_references
+from fundor_utilities.views.swagger.endpoints import Endpoint
+from fundor_utilities.views.swagger.endpoints import EndpointIndex
+from fundor_utilities.views.swagger.endpoints import get_endpoint_index
+from fundor_utilities.views.swagger.profiler import PATH_PARAMETERS
+from fundor_utilities.views.swagger.profiler import PERMISSIONS
+from fundor_utilities.views.swagger.profiler import QUERY_PARAMETERS
+from fundor_utilities.views.swagger.profiler import REQUEST_BODY
+from fundor_utilities.views.swagger.profiler import RESPONSES
+from fundor_utilities.views.swagger.profiler import VIEW
+from fundor_utilities.views.swagger.schema_cache import permission_fingerprint
+
+_MISSING = object()
+
+UNTAGGED = "default"
+"""Tag of the operations without tags, like Swagger UI shows them."""
+
 
 class ServerSwagger:  # noqa: B903
     def __init__(self, url, description):
@@ -53,6 +82,54 @@ class _UnvalidatedField(Field):
         return value
 
 
+_required_permissions = WeakKeyDictionary()
+
+
+def get_view_model(view):
+    """
+    Return the model of the serializer of `view`, or of its queryset.
+    """
+    model = None
+    if hasattr(view, "get_serializer_class"):
+        model = getattr(getattr(view.get_serializer_class(), "Meta", None), "model", None)
+    if model is None:
+        model = getattr(getattr(view, "queryset", None), "model", None)
+    return model
+
+
+def get_required_permissions(view, method):
+    """
+    Return the model permissions a user needs to call `method` of `view`,
+    given by its permission classes having `get_required_permissions`, like
+    `DjangoModelPermissions`.
+    """
+    model = get_view_model(view)
+    required = set()
+    for permission in view.get_permissions():
+        if model is not None and hasattr(permission, "get_required_permissions"):
+            required.update(perm for perm in permission.get_required_permissions(method, model) if perm)
+    return frozenset(required)
+
+
+def _describe_operations(tasks, operations, language):
+    """
+    Describe the operations of `tasks` until it is empty, into `operations`,
+    in `language`, the active language of the thread building the schema.
+    """
+    try:
+        with translation.override(language):
+            while True:
+                try:
+                    index, (path, method, view) = tasks.get_nowait()
+                except Empty:
+                    return
+                operations[index] = view.schema.get_operation(path, method)
+    finally:
+        # connections opened by the thread would stay open, close them once
+        # it is done rather than after each operation
+        connections.close_all()
+
+
 class SortedPathSchemaGenerator:
     endpoint_inspector_cls = EndpointEnumerator
 
@@ -61,6 +138,34 @@ class SortedPathSchemaGenerator:
     # Set by 'SCHEMA_COERCE_PATH_PK'.
     coerce_path_pk = None
 
+    # :class:`fundor_utilities.views.swagger.schema_cache.SchemaCache` of the
+    # generated schemas, shared by the users with the same permissions.
+    # If None, schemas are generated on every call.
+    schema_cache = None
+
+    # Number of threads describing the operations at the same time. If None,
+    # they are described one after the other. The schema is the same either
+    # way.
+    parallel_workers = None
+
+    # :class:`fundor_utilities.views.swagger.profiler.SchemaProfiler`
+    # recording the time spent on each endpoint, by phase. If None, schemas
+    # are not profiled.
+    profiler = None
+
+    # Permission classes only looking at the user flags and model
+    # permissions. Users with the same permission fingerprint share their
+    # cached schema only when every view uses these, without overriding
+    # `get_permissions` or `get_serializer_class`; see
+    # `get_permission_fingerprint`.
+    shared_permission_classes = (
+        permissions.AllowAny,
+        permissions.IsAuthenticated,
+        permissions.IsAuthenticatedOrReadOnly,
+        permissions.IsAdminUser,
+        permissions.DjangoModelPermissions,
+    )
+
     def __init__(
         self,
         title=None,
@@ -82,38 +187,111 @@ class SortedPathSchemaGenerator:
         self.version = version
         self.url = url
         self.endpoints = None
+        self.components = None
+        self._user_permissions = None
+
+    def get_endpoint_index_key(self):
+        """
+        Return the key of the endpoint index of the generator, shared by the
+        generators of the same URL patterns.
+        """
+        return (
+            type(self).__module__,
+            type(self).__qualname__,
+            self.endpoint_inspector_cls,
+            id(self.patterns) if self.patterns is not None else None,
+            self.urlconf,
+            self.coerce_path_pk,
+        )
+
+    def build_endpoint_index(self):
+        """
+        Walk the URL patterns and return the index of their endpoints.
+        """
+        inspector = self.endpoint_inspector_cls(self.patterns, self.urlconf)
+        endpoints = []
+        shared = True
+        for path, method, callback in inspector.get_api_endpoints():
+            # views have no request yet: only read attributes that do not
+            # depend on it
+            view = self._instantiate_view(callback, method)
+            endpoints.append(Endpoint(self.coerce_path(path, method, view), method, callback))
+            shared = shared and self._shares_schemas(view)
+        return EndpointIndex(endpoints, shared)
+
+    def _shares_schemas(self, view):
+        """
+        Return whether the schema of `view` only depends on the permission
+        fingerprint of the user.
+        """
+        view_class = type(view)
+        if view_class.get_permissions is not APIView.get_permissions:
+            return False
+        if getattr(view_class, "get_serializer_class", None) not in (None, GenericAPIView.get_serializer_class):
+            return False
+        return all(
+            isinstance(permission, type) and issubclass(permission, self.shared_permission_classes)
+            for permission in view.permission_classes
+        )
+
+    def get_endpoint_index(self):
+        """
+        Return the index of the endpoints, built once per process.
+        """
+        return get_endpoint_index(self)
 
     def _initialise_endpoints(self):
         if self.endpoints is None:
-            inspector = self.endpoint_inspector_cls(self.patterns, self.urlconf)
-            self.endpoints = inspector.get_api_endpoints()
+            self.endpoints = [
+                (endpoint.path, endpoint.method, endpoint.callback) for endpoint in self.get_endpoint_index()
+            ]
 
     def _get_paths_and_endpoints(self, request):
         """
-        Generate (path, method, view) given (path, method, callback) for paths.
+        Generate (path, method, view) for the endpoints the user may call.
         """
         paths = []
         view_endpoints = []
-        for path, method, callback in self.endpoints:
-            view = self.create_view(callback, method, request)
-            path = self.coerce_path(path, method, view)
+        for endpoint in self.get_endpoint_index():
+            start = time.perf_counter()
+            view = self.create_view(endpoint.callback, endpoint.method, request)
             if view:
-                paths.append(path)
-                view_endpoints.append((path, method, view))
+                # endpoints the user cannot call are left out of the profile
+                if self.profiler is not None:
+                    self.profiler.record(endpoint.path, endpoint.method, VIEW, time.perf_counter() - start)
+                paths.append(endpoint.path)
+                view_endpoints.append((endpoint.path, endpoint.method, view))
         return paths, view_endpoints
 
-    def _user_has_perm(self, user, endpoint_view, method):
-        view_perms = endpoint_view.get_permissions()
-        is_allowed = []
-        for view_perm in view_perms:
-            perms = view_perm.get_required_permissions(method, endpoint_view.get_serializer().Meta.model)
-            is_allowed.append(all(user.has_perm(perm) if perm else True for perm in perms))
-        return all(is_allowed)
+    def _get_required_permissions(self, callback, method, view):
+        """
+        Return the permissions required by an endpoint, computed once per
+        process, from a view with its request set.
+        """
+        permissions = _required_permissions.setdefault(callback, {})
+        if method not in permissions:
+            permissions[method] = get_required_permissions(view, method)
+        return permissions[method]
+
+    def _get_user_permissions(self, user):
+        """
+        Return the permissions of a user, resolved once per schema.
+        """
+        if self._user_permissions is None or self._user_permissions[0] is not user:
+            self._user_permissions = user, frozenset(user.get_all_permissions())
+        return self._user_permissions[1]
 
-    def create_view(self, callback, method, request=None):
+    def _get_request_permissions(self, request):
         """
-        Given a callback, return an actual view instance.
+        Return the permissions of the user of the request, or None if every
+        endpoint is allowed.
         """
+        # public schemas, without request, list every endpoint
+        if request is None or request.user.is_superuser:
+            return None
+        return self._get_user_permissions(request.user)
+
+    def _instantiate_view(self, callback, method):
         view = callback.cls(**getattr(callback, "initkwargs", {}))
         view.args = ()
         view.kwargs = {}
@@ -127,13 +305,25 @@ class SortedPathSchemaGenerator:
                 view.action = "metadata"
             else:
                 view.action = actions.get(method.lower())
+        return view
 
+    def create_view(self, callback, method, request=None):
+        """
+        Given a callback, return an actual view instance, or None if the user
+        lacks the permissions it requires.
+        """
+        permissions = self._get_request_permissions(request)
+        required = _required_permissions.get(callback, {}).get(method)
+        if permissions is not None and required is not None and not required <= permissions:
+            return None
+
+        view = self._instantiate_view(callback, method)
         if request is not None:
             view.request = clone_request(request, method)
-        is_allowed = True
-        if not request.user.is_superuser:
-            is_allowed = self._user_has_perm(request.user, view, method)
-        if is_allowed:
+        # the serializer class, hence the model, may depend on the request
+        if permissions is None or self._get_required_permissions(callback, method, view) <= permissions:
+            view.schema_components = self.components
+            view.schema_profiler = self.profiler
             return view
 
     def coerce_path(self, path, method, view):
@@ -151,6 +341,15 @@ class SortedPathSchemaGenerator:
             field_name = "id"
         return path.replace("{pk}", "{%s}" % field_name)
 
+    def _timed(self, path, method, phase):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.timed(path, method, phase)
+
+    def _has_view_permissions(self, path, method, view):
+        with self._timed(path, method, PERMISSIONS):
+            return self.has_view_permissions(path, method, view)
+
     def has_view_permissions(self, path, method, view):
         """
         Return `True` if the incoming request has the correct view permissions.
@@ -173,10 +372,35 @@ class SortedPathSchemaGenerator:
 
         return info
 
-    def get_paths(self, request=None):
+    def _get_mounted_path(self, path):
+        # Normalise path for any provided mount url.
+        if path.startswith("/"):
+            path = path[1:]
+        return urljoin(self.url or "/", path)
+
+    def get_endpoint_tags(self, path, method, view):
+        """
+        Return the tags of an endpoint, or `UNTAGGED`.
+        """
+        get_tags = getattr(view.schema, "get_tags", None)
+        tags = get_tags(path, method) if get_tags is not None else None
+        return list(tags or [UNTAGGED])
+
+    def get_paths(self, request=None, tag=None):
+        if self.profiler is None:
+            return self._get_paths(request, tag)
+        self.profiler.start()
+        try:
+            return self._get_paths(request, tag)
+        finally:
+            self.profiler.finish()
+
+    def _get_paths(self, request=None, tag=None):
         result = {}
 
         self._initialise_endpoints()
+        self.components = ComponentRegistry()
+        self._user_permissions = None
 
         paths, view_endpoints = self._get_paths_and_endpoints(request)
 
@@ -184,25 +408,156 @@ class SortedPathSchemaGenerator:
         if not paths:
             return None
 
-        for path, method, view in view_endpoints:
-            if not self.has_view_permissions(path, method, view):
-                continue
-            operation = view.schema.get_operation(path, method)
-            # Normalise path for any provided mount url.
-            if path.startswith("/"):
-                path = path[1:]
-            path = urljoin(self.url or "/", path)
+        view_endpoints = [
+            (path, method, view)
+            for path, method, view in view_endpoints
+            if (tag is None or tag in self.get_endpoint_tags(path, method, view))
+            and self._has_view_permissions(path, method, view)
+        ]
+        if self.parallel_workers:
+            operations = self._get_parallel_operations(view_endpoints)
+        else:
+            operations = [view.schema.get_operation(path, method) for path, method, view in view_endpoints]
+
+        for (path, method, _view), operation in zip(view_endpoints, operations, strict=True):
+            path = self._get_mounted_path(path)
 
             result.setdefault(path, {})
             result[path][method.lower()] = operation
-        return result
+        # every schema of a name registered more than once gets a digest
+        return rename_references(result, self.components.get_renamed())
+
+    def _get_parallel_operations(self, view_endpoints):
+        """
+        Describe the operations in `parallel_workers` threads, each taking
+        the next operation from a queue shared by them until it is empty.
 
-    def get_schema(self, request=None, public=False, servers: [ServerSwagger] = None):
+        Each operation registers its components on its own; they are merged
+        in the order of the endpoints afterwards, so component names do not
+        depend on which thread finishes first.
+        """
+        for _path, _method, view in view_endpoints:
+            view.schema_components = ComponentRegistry()
+        tasks = SimpleQueue()
+        for task in enumerate(view_endpoints):
+            tasks.put(task)
+        operations = [None] * len(view_endpoints)
+        # threads do not inherit the active language, lazy texts would be
+        # translated in the default one
+        language = translation.get_language()
+        with ThreadPoolExecutor(max_workers=self.parallel_workers) as executor:
+            workers = [
+                executor.submit(_describe_operations, tasks, operations, language) for _ in range(self.parallel_workers)
+            ]
+        for worker in workers:
+            worker.result()
+        for index, (_path, _method, view) in enumerate(view_endpoints):
+            renamed = self.components.merge(view.schema_components)
+            if renamed:
+                operations[index] = rename_references(operations[index], renamed)
+        return operations
+
+    def get_tag_index(self, request=None, public=False):
+        """
+        Return the tags of the endpoints the user may call, with the path and
+        method of their operations, or return it from `schema_cache`. The
+        operations of a tag are described by `get_schema(tag=...)`.
+        """
+        key = None if self.schema_cache is None else self.get_schema_cache_key(request, public)
+        if key is None:
+            return self.build_tag_index(request, public)
+        return self._get_cached(("index", key), self.build_tag_index, request, public)
+
+    def build_tag_index(self, request=None, public=False):
+        """
+        Generate the tag index, without describing the operations.
+        """
+        self._user_permissions = None
+        paths, view_endpoints = self._get_paths_and_endpoints(None if public else request)
+        tags = {}
+        for path, method, view in view_endpoints:
+            if not self._has_view_permissions(path, method, view):
+                continue
+            operation = {"path": self._get_mounted_path(path), "method": method.lower()}
+            for tag in self.get_endpoint_tags(path, method, view):
+                tags.setdefault(tag, []).append(operation)
+        if not tags:
+            return None
+        return {
+            "openapi": "3.0.2",
+            "info": self.get_info(),
+            "tags": [{"name": tag, "operations": operations} for tag, operations in sorted(tags.items())],
+        }
+
+    def get_schema_cache_key(self, request=None, public=False, servers: [ServerSwagger] = None, tag=None):
+        """
+        Return the key of the schema in `schema_cache`: the schema depends on
+        the generator, on the permissions of the user, on the servers and on
+        the tag of its operations. Return None if the schema is not cached.
+        """
+        user = None if public or request is None else request.user
+        fingerprint = self.get_permission_fingerprint(user)
+        if fingerprint is None:
+            return None
+        if servers is not None:
+            servers = tuple((server.url, server.description) for server in servers)
+        return (
+            type(self).__module__,
+            type(self).__qualname__,
+            self.title,
+            self.url,
+            self.description,
+            self.version,
+            self.urlconf,
+            id(self.patterns) if self.patterns is not None else None,
+            fingerprint,
+            servers,
+            tag,
+        )
+
+    def get_permission_fingerprint(self, user):
+        """
+        Return the fingerprint of what decides the schema of `user`, or None
+        if the schema cannot be cached. `user` is None for the public schema.
+
+        Users with the same fingerprint share one cached schema, so by
+        default only the public schema is cached when a view uses other
+        permission classes than `shared_permission_classes`: their result
+        may depend on anything in the request. Override it to cache those
+        schemas too, e.g. adding the groups or the key of the user to
+        `permission_fingerprint(user)`.
+        """
+        if user is None or self.get_endpoint_index().shared:
+            return permission_fingerprint(user)
+        return None
+
+    def _get_cached(self, key, build, *args):
+        # keys hold the id of the patterns, which may be reused once they are
+        # garbage collected: entries keep the patterns they were built from
+        patterns, schema = self.schema_cache.get(key, (None, _MISSING))
+        if schema is _MISSING or patterns is not self.patterns:
+            schema = build(*args)
+            self.schema_cache.set(key, (self.patterns, schema))
+        return schema
+
+    def get_schema(self, request=None, public=False, servers: [ServerSwagger] = None, tag=None):
+        """
+        Generate a OpenAPI schema, or return it from `schema_cache`.
+
+        With a `tag`, the schema only has the operations of the tag, see
+        `get_tag_index`.
+        """
+        key = None if self.schema_cache is None else self.get_schema_cache_key(request, public, servers, tag)
+        if key is None:
+            return self.build_schema(request, public, servers, tag)
+        return self._get_cached(key, self.build_schema, request, public, servers, tag)
+
+    def build_schema(self, request=None, public=False, servers: [ServerSwagger] = None, tag=None):
         """
         Generate a OpenAPI schema.
         """
 
-        paths = self.get_paths(None if public else request)
+        paths = self.get_paths(None if public else request, tag)
         if not paths:
             return None
 
@@ -221,6 +576,8 @@ class SortedPathSchemaGenerator:
             },
             "paths": dict(OrderedDict(sorted(paths.items(), key=lambda t: t[0]))),
         }
+        if self.components.schemas:
+            schema["components"]["schemas"] = self.components.get_schemas()
         if servers is not None:
             servers_list = []
             for e in servers:
@@ -231,6 +588,172 @@ class SortedPathSchemaGenerator:
         return schema
 
 
+def _map_list_serializer(inspector, field):
+    # Nested Serializers, `many` or not.
+    if inspector._get_component_registry() is not None:
+        return {"type": "array", "items": inspector._get_serializer_reference(field.child)}
+    return {
+        "type": "array",
+        "items": inspector._map_serializer(field.child),
+    }
+
+
+def _map_nested_serializer(inspector, field):
+    if inspector._get_component_registry() is not None:
+        return inspector._get_serializer_reference(field)
+    data = inspector._map_serializer(field)
+    data["type"] = "object"
+    return data
+
+
+def _map_many_related_field(inspector, field):
+    return {
+        "type": "array",
+        "items": inspector._map_field(field.child_relation),
+    }
+
+
+def _map_primary_key_related_field(inspector, field):
+    model = getattr(field.queryset, "model", None)
+    if model is not None:
+        model_field = model._meta.pk
+        if isinstance(model_field, models.AutoField):
+            return {"type": "integer"}
+    return {"type": "string"}
+
+
+# ChoiceFields (single and multiple).
+# Q:
+# - Is 'type' required?
+# - can we determine the TYPE of a choicefield?
+def _map_multiple_choice_field(inspector, field):
+    return {
+        "type": "array",
+        "items": {"enum": list(field.choices)},
+    }
+
+
+def _map_choice_field(inspector, field):
+    return {
+        "enum": list(field.choices),
+    }
+
+
+def _map_list_field(inspector, field):
+    mapping = {
+        "type": "array",
+        "items": {},
+    }
+    if not isinstance(field.child, _UnvalidatedField):
+        map_field = inspector._map_field(field.child)
+        items = {"type": map_field.get("type")}
+        if "format" in map_field:
+            items["format"] = map_field.get("format")
+        mapping["items"] = items
+    return mapping
+
+
+def _map_ip_address_field(inspector, field):
+    content = {
+        "type": "string",
+    }
+    if field.protocol != "both":
+        content["format"] = field.protocol
+    return content
+
+
+# DecimalField has multipleOf based on decimal_places
+def _map_decimal_field(inspector, field):
+    content = {"type": "number"}
+    if field.decimal_places:
+        content["multipleOf"] = float("." + (field.decimal_places - 1) * "0" + "1")
+    if field.max_whole_digits:
+        content["maximum"] = int(field.max_whole_digits * "9") + 1
+        content["minimum"] = -content["maximum"]
+    inspector._map_min_max(field, content)
+    return content
+
+
+def _map_float_field(inspector, field):
+    content = {"type": "number"}
+    inspector._map_min_max(field, content)
+    return content
+
+
+def _map_integer_field(inspector, field):
+    content = {"type": "integer"}
+    inspector._map_min_max(field, content)
+    # 2147483647 is max for int32_size, so we use int64 for format
+    if int(content.get("maximum", 0)) > 2147483647 or int(content.get("minimum", 0)) > 2147483647:
+        content["format"] = "int64"
+    return content
+
+
+def _constant(content):
+    def mapper(inspector, field):
+        return dict(content)
+
+    return mapper
+
+
+FIELD_MAPPERS = {
+    serializers.ListSerializer: _map_list_serializer,
+    serializers.Serializer: _map_nested_serializer,
+    serializers.ManyRelatedField: _map_many_related_field,
+    serializers.PrimaryKeyRelatedField: _map_primary_key_related_field,
+    serializers.MultipleChoiceField: _map_multiple_choice_field,
+    serializers.ChoiceField: _map_choice_field,
+    serializers.ListField: _map_list_field,
+    # DateField and DateTimeField type is string
+    serializers.DateField: _constant({"type": "string", "format": "date"}),
+    serializers.DateTimeField: _constant({"type": "string", "format": "date-time"}),
+    # "Formats such as "email", "uuid", and so on, MAY be used even though undefined by this specification." # noqa:B950
+    # see: https://github.com/OAI/OpenAPI-Specification/blob/master/versions/3.0.2.md#data-types # noqa:B950
+    # see also: https://swagger.io/docs/specification/data-models/data-types/#string # noqa:B950
+    serializers.EmailField: _constant({"type": "string", "format": "email"}),
+    serializers.URLField: _constant({"type": "string", "format": "uri"}),
+    serializers.UUIDField: _constant({"type": "string", "format": "uuid"}),
+    serializers.IPAddressField: _map_ip_address_field,
+    serializers.DecimalField: _map_decimal_field,
+    serializers.FloatField: _map_float_field,
+    serializers.IntegerField: _map_integer_field,
+    serializers.FileField: _constant({"type": "string", "format": "binary"}),
+    serializers.BooleanField: _constant({"type": "boolean"}),
+    serializers.JSONField: _constant({"type": "object"}),
+    serializers.DictField: _constant({"type": "object"}),
+    serializers.HStoreField: _constant({"type": "object"}),
+}
+"""Functions returning the schema of a serializer field, taking the
+:class:`CustomAutoSchema` and the field, by field class. Fields of other
+classes are strings."""
+
+
+def register_field_mapper(field_class, mapper=None):
+    """Maps the fields of ``field_class``, and of its subclasses, with
+    ``mapper``. Used without ``mapper``, it is a decorator::
+
+        @register_field_mapper(MoneyField)
+        def map_money_field(inspector, field):
+            return {"type": "string", "format": "decimal"}
+    """
+    if mapper is None:
+        return lambda mapper: register_field_mapper(field_class, mapper)
+    FIELD_MAPPERS[field_class] = mapper
+    get_field_mapper.cache_clear()
+    return mapper
+
+
+@lru_cache(maxsize=None)
+def get_field_mapper(field_class):
+    """Returns the function of :data:`FIELD_MAPPERS` mapping the fields of
+    ``field_class``, the one of its closest base class, or ``None``."""
+    for cls in field_class.__mro__:
+        mapper = FIELD_MAPPERS.get(cls)
+        if mapper is not None:
+            return mapper
+    return None
+
+
 class CustomAutoSchema:
     request_media_types = []
     response_media_types = []
@@ -247,6 +770,7 @@ class CustomAutoSchema:
 
     def __init__(self):
         self.instance_schemas = WeakKeyDictionary()
+        self._view = None
 
     def __get__(self, instance, owner):
         """
@@ -266,9 +790,15 @@ class CustomAutoSchema:
         """
         if instance in self.instance_schemas:
             return self.instance_schemas[instance]
+        if instance is None:
+            return self
 
-        self.view = instance
-        return self
+        # The descriptor is shared by every instance of the view class: each
+        # instance gets its own copy, so that the views described at the same
+        # time, e.g. by parallel schema generation, do not share state.
+        inspector = copy.copy(self)
+        inspector.view = instance
+        return inspector
 
     def __set__(self, instance, other):
         self.instance_schemas[instance] = other
@@ -352,19 +882,29 @@ class CustomAutoSchema:
             operation["deprecated"] = True
 
         parameters = []
-        parameters += self._get_path_parameters(path)
-        parameters += self._get_pagination_parameters(path, method)
-        parameters += self._get_filter_parameters(path, method)
+        with self._timed(path, method, PATH_PARAMETERS):
+            parameters += self._get_path_parameters(path)
+        with self._timed(path, method, QUERY_PARAMETERS):
+            parameters += self._get_pagination_parameters(path, method)
+            parameters += self._get_filter_parameters(path, method)
 
         operation["parameters"] = parameters
 
-        request_body = self._get_request_body(path, method)
+        with self._timed(path, method, REQUEST_BODY):
+            request_body = self._get_request_body(path, method)
         if request_body:
             operation["requestBody"] = request_body
-        operation["responses"] = self._get_responses(path, method)
+        with self._timed(path, method, RESPONSES):
+            operation["responses"] = self._get_responses(path, method)
 
         return operation
 
+    def _timed(self, path, method, phase):
+        schema_profiler = getattr(self.view, "schema_profiler", None)
+        if schema_profiler is None:
+            return nullcontext()
+        return schema_profiler.timed(path, method, phase)
+
     def _get_operation_id(self, path, method):
         """
         Compute an operation ID from the model, serializer or view name.
@@ -500,128 +1040,10 @@ class CustomAutoSchema:
         return paginator.get_schema_operation_parameters(view)
 
     def _map_field(self, field):
-
-        # Nested Serializers, `many` or not.
-        if isinstance(field, serializers.ListSerializer):
-            return {
-                "type": "array",
-                "items": self._map_serializer(field.child),
-            }
-        if isinstance(field, serializers.Serializer):
-            data = self._map_serializer(field)
-            data["type"] = "object"
-            return data
-
-        # Related fields.
-        if isinstance(field, serializers.ManyRelatedField):
-            return {
-                "type": "array",
-                "items": self._map_field(field.child_relation),
-            }
-        if isinstance(field, serializers.PrimaryKeyRelatedField):
-            model = getattr(field.queryset, "model", None)
-            if model is not None:
-                model_field = model._meta.pk
-                if isinstance(model_field, models.AutoField):
-                    return {"type": "integer"}
-
-        # ChoiceFields (single and multiple).
-        # Q:
-        # - Is 'type' required?
-        # - can we determine the TYPE of a choicefield?
-        if isinstance(field, serializers.MultipleChoiceField):
-            return {
-                "type": "array",
-                "items": {"enum": list(field.choices)},
-            }
-
-        if isinstance(field, serializers.ChoiceField):
-            return {
-                "enum": list(field.choices),
-            }
-
-        # ListField.
-        if isinstance(field, serializers.ListField):
-            mapping = {
-                "type": "array",
-                "items": {},
-            }
-            if not isinstance(field.child, _UnvalidatedField):
-                map_field = self._map_field(field.child)
-                items = {"type": map_field.get("type")}
-                if "format" in map_field:
-                    items["format"] = map_field.get("format")
-                mapping["items"] = items
-            return mapping
-
-        # DateField and DateTimeField type is string
-        if isinstance(field, serializers.DateField):
-            return {
-                "type": "string",
-                "format": "date",
-            }
-
-        if isinstance(field, serializers.DateTimeField):
-            return {
-                "type": "string",
-                "format": "date-time",
-            }
-
-        # "Formats such as "email", "uuid", and so on, MAY be used even though undefined by this specification." # noqa:B950
-        # see: https://github.com/OAI/OpenAPI-Specification/blob/master/versions/3.0.2.md#data-types # noqa:B950
-        # see also: https://swagger.io/docs/specification/data-models/data-types/#string # noqa:B950
-        if isinstance(field, serializers.EmailField):
-            return {"type": "string", "format": "email"}
-
-        if isinstance(field, serializers.URLField):
-            return {"type": "string", "format": "uri"}
-
-        if isinstance(field, serializers.UUIDField):
-            return {"type": "string", "format": "uuid"}
-
-        if isinstance(field, serializers.IPAddressField):
-            content = {
-                "type": "string",
-            }
-            if field.protocol != "both":
-                content["format"] = field.protocol
-            return content  # noqa:B950
-
-        # DecimalField has multipleOf based on decimal_places
-        if isinstance(field, serializers.DecimalField):
-            content = {"type": "number"}
-            if field.decimal_places:
-                content["multipleOf"] = float("." + (field.decimal_places - 1) * "0" + "1")
-            if field.max_whole_digits:
-                content["maximum"] = int(field.max_whole_digits * "9") + 1
-                content["minimum"] = -content["maximum"]
-            self._map_min_max(field, content)
-            return content
-
-        if isinstance(field, serializers.FloatField):
-            content = {"type": "number"}
-            self._map_min_max(field, content)
-            return content
-
-        if isinstance(field, serializers.IntegerField):
-            content = {"type": "integer"}
-            self._map_min_max(field, content)
-            # 2147483647 is max for int32_size, so we use int64 for format
-            if int(content.get("maximum", 0)) > 2147483647 or int(content.get("minimum", 0)) > 2147483647:
-                content["format"] = "int64"
-            return content
-
-        if isinstance(field, serializers.FileField):
-            return {"type": "string", "format": "binary"}
-
-        # Simplest cases, default to 'string' type:
-        FIELD_CLASS_SCHEMA_TYPE = {
-            serializers.BooleanField: "boolean",
-            serializers.JSONField: "object",
-            serializers.DictField: "object",
-            serializers.HStoreField: "object",
-        }
-        return {"type": FIELD_CLASS_SCHEMA_TYPE.get(field.__class__, "string")}
+        mapper = get_field_mapper(type(field))
+        if mapper is None:
+            return {"type": "string"}
+        return mapper(self, field)
 
     def _map_min_max(self, field, content):
         if field.max_value:
@@ -657,6 +1079,9 @@ class CustomAutoSchema:
             if field.help_text:
                 schema["description"] = str(field.help_text)
             self._map_field_validators(field, schema)
+            if "$ref" in schema and len(schema) > 1:
+                # the siblings of a $ref are ignored
+                schema = {"allOf": [{"$ref": schema.pop("$ref")}], **schema}
 
             properties[field.field_name] = schema
 
@@ -704,6 +1129,57 @@ class CustomAutoSchema:
                     schema["maximum"] = int(digits * "9") + 1
                     schema["minimum"] = -schema["maximum"]
 
+    def _get_component_registry(self):
+        """
+        Return the registry of the components of the schema being generated,
+        or None when serializers are written inline.
+        """
+        return getattr(self.view, "schema_components", None)
+
+    def get_component_name(self, serializer):
+        """
+        Compute the component name of a serializer from its class name.
+        """
+        name = serializer.__class__.__name__
+        if name.endswith("Serializer") and name != "Serializer":
+            name = name[:-10]
+        return name
+
+    def _get_serializer_reference(self, serializer, partial=False):
+        """
+        Return a reference to the component of a serializer.
+
+        Components keep the read only and write only fields, which OpenAPI
+        leaves out of requests and of responses respectively. Partial
+        updates get a `Patched` component without required fields.
+        """
+        registry = self._get_component_registry()
+        key = self.get_serializer_cache_key(serializer, partial)
+        reference = registry.references.get(key) if key is not None else None
+        if reference is None:
+            content = {"type": "object"}
+            content.update(self._map_serializer(serializer))
+            name = self.get_component_name(serializer)
+            if partial:
+                content.pop("required", None)
+                name = "Patched" + name
+            reference = registry.register(name, content)
+            if key is not None:
+                registry.references[key] = reference
+        # callers add keys to the reference
+        return dict(reference)
+
+    def get_serializer_cache_key(self, serializer, partial=False):
+        """
+        Return the key under which the reference to the component of a
+        serializer is memoized while a schema is generated, or None to map
+        the serializer each time it is used.
+
+        Serializers of the same class with the same fields share it; return
+        None for serializers whose fields change their schema otherwise.
+        """
+        return type(serializer), tuple(serializer.fields), partial
+
     def _get_paginator(self):
         pagination_class = getattr(self.view, "pagination_class", None)
         if pagination_class:
@@ -749,6 +1225,10 @@ class CustomAutoSchema:
         if not isinstance(serializer, serializers.Serializer):
             return {}
 
+        if self._get_component_registry() is not None:
+            content = self._get_serializer_reference(serializer, partial=method == "PATCH")
+            return {"content": {ct: {"schema": content} for ct in self.request_media_types}}
+
         content = self._map_serializer(serializer)
         # No required fields for PATCH
         if method == "PATCH":
@@ -770,7 +1250,9 @@ class CustomAutoSchema:
         item_schema = {}
         serializer = self._get_serializer(path, method)
 
-        if isinstance(serializer, serializers.Serializer):
+        if isinstance(serializer, serializers.Serializer) and self._get_component_registry() is not None:
+            item_schema = self._get_serializer_reference(serializer)
+        elif isinstance(serializer, serializers.Serializer):
             item_schema = self._map_serializer(serializer)
             # No write_only fields for response.
             for name, schema in item_schema["properties"].copy().items():
@@ -5,9 +5,16 @@ from rest_framework.authtoken.models import Token
 
 class SwaggerTemplateView(LoginRequiredMixin, TemplateView):
     template_name = "swagger-ui.html"
+    lazy_tags = False
+    """
+    Set this to ``True`` to load the tag index of the schema first, then the
+    operations of each tag when it is shown. ``schema_url`` must name a
+    :class:`fundor_utilities.views.swagger.schema_view.SchemaView`.
+    """
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["lazy_tags"] = self.lazy_tags
         try:
             context["token"] = Token.objects.get(user=self.request.user)
         except Token.DoesNotExist:
@@ -1,5 +1,82 @@
-from export_csv.views import ExportCSV
+from asgiref.sync import sync_to_async
 
+from fundor_utilities.export import iteration
+from fundor_utilities.export.delimited import astream_delimited
+from fundor_utilities.export.delimited import DelimitedEncoder
+from fundor_utilities.export.metrics import CONVERT
+from fundor_utilities.views.csv_view import TsvExporterView
 
-class ExportTSV(ExportCSV):
-    _csv_writer_dialect = "excel_tab"
+
+class ExportTSV(TsvExporterView):
+    """TSV export view keeping the ``get_queryset`` hook of
+    django-csv-export's ``ExportCSV``, which it used to extend.
+
+    Rows are streamed by :class:`TsvExporterView`; values are read with
+    :func:`QuerySet.values_list`, so ``clean_<field>`` methods are applied
+    but ``get_field_<field>`` methods are not.
+    """
+
+    def get_queryset(self):
+        """Returns the queryset to export, see
+        :func:`TsvExporterView.get_queryset_for_csv`.
+
+        :returns: :class:`QuerySet`
+        """
+        return super().get_queryset_for_csv()
+
+    def get_queryset_for_csv(self):
+        return self.get_queryset()
+
+
+class AsyncExportTSV(ExportTSV):
+    """Asynchronous version of :class:`ExportTSV`.
+
+    Rows are read with the async ORM and streamed as they come, so under
+    ASGI an export does not hold a thread for its whole duration. Background
+    exports are still run by the synchronous code.
+    """
+
+    async def _aget_chunks(self):
+        """Yields the rows to export, in lists."""
+        queryset = self.get_queryset_for_csv()
+        if queryset is None:
+            return
+        fields = self.get_field_names()
+        cleaners = [getattr(self, f"clean_{field}", None) for field in fields]
+        chunks = iteration.aiter_chunks(queryset, fields, chunk_size=self.chunk_size, iteration=self.queryset_iteration)
+        async for chunk in chunks:
+            if any(cleaners):
+                chunk = [
+                    [clean(value) if clean else value for clean, value in zip(cleaners, row, strict=True)]
+                    for row in chunk
+                ]
+            yield chunk
+
+    async def _aformat_chunks(self, formatter, metrics):
+        async for chunk in metrics.aiter_chunks(self._aget_chunks()):
+            with metrics.timed(CONVERT):
+                lines = formatter.format(chunk)
+            yield lines
+
+    def _astream(self, compress):
+        metrics = self.get_export_metrics()
+        header = self.get_col_names() if self.add_col_names else None
+        kwargs = self.get_csv_writer_kwargs()
+        formatter = DelimitedEncoder(dialect=self.csv_dialect, **kwargs)
+        data = astream_delimited(
+            header,
+            self._aformat_chunks(formatter, metrics),
+            dialect=self.csv_dialect,
+            encoding=self.encoding,
+            compress=compress,
+            compresslevel=self.compresslevel,
+            **kwargs,
+        )
+        return metrics.aiter_output(data)
+
+    async def get(self, request, *args, **kwargs):
+        self._check_gzip()
+        if self.background:
+            return await sync_to_async(self.enqueue_export)()
+        compress = self._compresses()
+        return self._streaming_response(self._astream(compress), compress)
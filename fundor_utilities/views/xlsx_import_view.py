@@ -0,0 +1,91 @@
+from zipfile import BadZipFile
+
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.generic import View
+from openpyxl.utils.exceptions import InvalidFileException
+
+from fundor_utilities.exception import NoModelFoundException
+from fundor_utilities.export.loader import DEFAULT_BATCH_SIZE
+from fundor_utilities.export.loader import XlsxLoader
+
+
+class XlsxImporterView(View):
+    """Generic View class which loads an uploaded XLSX file into ``model``.
+
+    It reads the columns in the order
+    :class:`fundor_utilities.views.xlsx_view.XlsxExporterView` writes them,
+    so a view can import the files exported with the same ``model``,
+    ``field_names`` and ``add_col_names``. The response is a JSON summary with
+    the number of created and updated instances and the errors of each row.
+    """
+
+    http_method_names = ["options", "post"]
+    model = None
+    """
+    Model of the imported instances.
+    """
+
+    field_names = None
+    """
+    List of ``model`` field names read from the columns of the XLSX, in order.
+    If omitted, all the fields of the model which are not auto created.
+    """
+
+    add_col_names = False
+    """
+    Set this to ``True`` if the first row of the XLSX is a header, which is
+    skipped. Default value is ``False``.
+    """
+
+    import_key = None
+    """
+    Field of ``model`` identifying existing instances. If provided,
+    rows whose key exists update the instance instead of creating a new one.
+    It must be one of ``field_names``.
+    """
+
+    batch_size = DEFAULT_BATCH_SIZE
+    """
+    Number of rows saved to the database at a time.
+    """
+
+    abort_on_error = False
+    """
+    Set this to ``True`` to save nothing if a row has an error. Otherwise the
+    valid rows are saved and the others reported. Default value is ``False``.
+    """
+
+    file_field = "file"
+    """
+    Name of the uploaded file in the request.
+    """
+
+    def get_loader(self):
+        """Returns the loader reading the XLSX.
+
+        :raises: NoModelFoundException
+
+        :returns: :class:`fundor_utilities.export.loader.XlsxLoader`
+        """
+        if self.model is None:
+            raise NoModelFoundException(_("No model to import to. Either provide a model or override get_loader."))
+        return XlsxLoader(
+            self.model,
+            field_names=self.field_names,
+            header=self.add_col_names,
+            key_field=self.import_key,
+            batch_size=self.batch_size,
+            abort_on_error=self.abort_on_error,
+        )
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get(self.file_field)
+        if upload is None:
+            return JsonResponse({"error": str(_("No file uploaded."))}, status=400)
+        try:
+            result = self.get_loader().load(upload)
+        except (BadZipFile, InvalidFileException):
+            return JsonResponse({"error": str(_("The file is not a valid XLSX workbook."))}, status=400)
+        status = 400 if result.errors and self.abort_on_error else 200
+        return JsonResponse(result.as_dict(), status=status)
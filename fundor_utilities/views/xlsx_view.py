@@ -1,13 +1,44 @@
+from io import BytesIO
+from itertools import chain
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.encoding import force_str
+from django.utils.translation import gettext_lazy as _
 from django.views.generic import View
 from openpyxl import Workbook
-from setuptools._entry_points import _
 
 from fundor_utilities.exception import NoModelFoundException
-
-
-class XlsxExporterView(View):
+from fundor_utilities.export import cache
+from fundor_utilities.export import delta
+from fundor_utilities.export import iteration
+from fundor_utilities.export import parallel
+from fundor_utilities.export import plans
+from fundor_utilities.export.columns import resolve_field
+from fundor_utilities.export.metrics import CONVERT
+from fundor_utilities.export.metrics import ExportMetrics
+from fundor_utilities.export.metrics import WRITE
+from fundor_utilities.export.sheets import ExportSheet
+from fundor_utilities.export.xlsx_writer import astream_xlsx
+from fundor_utilities.export.xlsx_writer import MAX_ROWS
+from fundor_utilities.export.xlsx_writer import overflow_title
+from fundor_utilities.export.xlsx_writer import RenderedRows
+from fundor_utilities.export.xlsx_writer import rows_xml
+from fundor_utilities.export.xlsx_writer import stream_xlsx
+from fundor_utilities.views.export_job_view import BackgroundExportMixin
+
+OPENPYXL_ENGINE = "openpyxl"
+DIRECT_ENGINE = "direct"
+
+
+def _count_rows(xml):
+    return xml.count("<row>")
+
+
+class XlsxExporterView(BackgroundExportMixin, View):
     """Generic View class which handles exporting queryset to XLSX file and
     rendering the response.
     """
@@ -54,6 +85,110 @@ class XlsxExporterView(View):
     values returned by :func:``get_col_names`` are used.
     """
 
+    sheets = None
+    """
+    List of :class:`fundor_utilities.export.sheets.ExportSheet` written after
+    the sheet of the view queryset, in the same workbook and the same pass.
+    """
+
+    summary_sheets = None
+    """
+    List of :class:`fundor_utilities.export.sheets.SummarySheet` aggregating
+    the exported rows in the database, written after the sheet of the view
+    queryset and ``sheets``.
+    """
+
+    max_sheet_rows = MAX_ROWS
+    """
+    Maximum number of rows of a sheet, header included. Rows past it continue
+    in ``<sheet_title>_2``, ``<sheet_title>_3``... Default value is the Excel
+    limit of 1048576 rows.
+    """
+
+    xlsx_engine = OPENPYXL_ENGINE
+    """
+    Library used to write the XLSX file. ``"openpyxl"`` builds the workbook
+    with openpyxl. ``"direct"`` writes the sheet XML straight into the zip file,
+    with the cell format of each column chosen once from the model fields,
+    which is several times faster on large exports.
+    """
+
+    streaming = False
+    """
+    Set this to ``True`` to return a :class:`StreamingHttpResponse`. The
+    workbook is written and sent in chunks while rows are read from the
+    queryset, so memory usage does not grow with the number of rows. Streaming
+    responses are always written by the ``"direct"`` engine. Default value is
+    ``False``.
+    """
+
+    chunk_size = iteration.DEFAULT_CHUNK_SIZE
+    """
+    Number of rows fetched from the database at a time. The queryset is never
+    evaluated as a whole, so the rows held in memory are bounded by this value.
+    """
+
+    queryset_iteration = iteration.CURSOR
+    """
+    How rows are read from the database. ``"cursor"`` uses
+    :func:`QuerySet.iterator`, with a server-side cursor on databases
+    supporting it. ``"keyset"`` runs one query for each chunk, ordered by
+    primary key, for databases without server-side cursors.
+    """
+
+    parallel_workers = None
+    """
+    Number of processes writing the rows. If provided, the queryset is split in
+    primary key ranges whose sheet XML is written by a pool of processes, each
+    with its own database connection, and joined in key order. Rows are then
+    exported in primary key order and the ``"direct"`` engine is used.
+    """
+
+    export_cache = None
+    """
+    Backend storing the generated files, e.g.
+    :class:`fundor_utilities.export.cache.DjangoCacheBackend` or
+    :class:`fundor_utilities.export.cache.FileCacheBackend`. Files are looked
+    up by a fingerprint of the SQL query, fields, header, sheet title and
+    ``cache_freshness``. Cached exports are not streamed. If omitted, exports
+    are not cached.
+    """
+
+    cache_freshness = None
+    """
+    Value telling whether a cached export is still valid. It can be an
+    aggregate expression evaluated on the queryset, e.g. ``Max("updated_at")``,
+    or :data:`fundor_utilities.export.cache.MODEL_VERSION` to use a version
+    bumped on every save and delete of ``model``, which must then be listed in
+    the ``FUNDOR_EXPORT_VERSIONED_MODELS`` setting.
+    """
+
+    watermark_field = None
+    """
+    Field of ``model`` increasing each time a row is created or changed, e.g.
+    ``"updated_at"`` or ``"pk"``. If provided, requests with a ``since``
+    parameter only export the rows whose field is greater than it, and every
+    response carries the value to send next time in the
+    ``X-Export-Watermark`` header.
+    """
+
+    watermark_param = "since"
+    """
+    Name of the query string parameter holding the watermark.
+    """
+
+    export_tombstones = False
+    """
+    Set this to ``True`` to add a sheet listing the primary keys of the
+    instances deleted since the watermark, which must be a timestamp. Deletions
+    are recorded by :func:`fundor_utilities.export.delta.track_deletions`.
+    """
+
+    tombstone_sheet_title = "deleted"
+    """
+    Title of the sheet listing the deleted primary keys.
+    """
+
     _content_type = "application/ms-excel"
     """
      The content_type header of the response returned by :func:`get`` method.
@@ -92,13 +227,7 @@ class XlsxExporterView(View):
         if self.field_names:
             return self.field_names
         if self.model is not None:
-            self.field_names = []
-            for f in self.model._meta.fields:
-                if f.auto_created:
-                    continue
-                else:
-                    self.field_names.append(f.name)
-            return self.field_names
+            return list(plans.default_field_names(self.model))
         else:
             exception_msg = "No model to get field names from. Either " "provide a model or override get_fields method."
             raise NoModelFoundException(_(exception_msg))
@@ -108,14 +237,23 @@ class XlsxExporterView(View):
 
         :returns: list
         """
-        field_names = self.get_field_names()
         if self.model is not None:  # noqa:B950
-            verbose_names = [f.verbose_name for f in self.model._meta.fields if f.name in field_names]
-            return verbose_names
+            return [force_str(header) for header in self.get_export_plan().headers]
         else:
             exception_msg = "No model to get verbose field names from."
             raise NoModelFoundException(_(exception_msg))
 
+    def get_export_plan(self):
+        """Returns the :class:`fundor_utilities.export.plans.ExportPlan` of
+        ``model`` and :func:`get_field_names`.
+
+        Plans resolve the columns, headers and cell formats once and are
+        cached for the life of the process.
+
+        :returns: :class:`ExportPlan`
+        """
+        return plans.get_plan(self.model, self.get_field_names())
+
     def get_col_names(self) -> list:
         """Returns column names to be used for writing header row of the XLSX.
 
@@ -145,13 +283,12 @@ class XlsxExporterView(View):
             return self.sheet_title
         if self.model is not None:
             model_name = str(self.model.__name__).lower()
-            self.sheet_title = force_str(model_name + "_list.xlsx")
+            return force_str(model_name + "_list.xlsx")
         else:
             exception_msg = (
                 "No model to generate filename. Either provide " "model or filename or override get_filename " "method."
             )
             raise NoModelFoundException(_(exception_msg))
-        return self.sheet_title
 
     def get_filename(self):
         """Returns filename.
@@ -168,13 +305,12 @@ class XlsxExporterView(View):
             return self.filename
         if self.model is not None:
             model_name = str(self.model.__name__).lower()
-            self.filename = force_str(model_name + "_list.xlsx")
+            return force_str(model_name + "_list.xlsx")
         else:
             exception_msg = (
                 "No model to generate filename. Either provide " "model or filename or override get_filename " "method."
             )
             raise NoModelFoundException(_(exception_msg))
-        return self.filename
 
     def get_xlsx_writer_dialect(self):
         """Returns the dialect to be used with :func:`xlsx.writer`.
@@ -192,39 +328,409 @@ class XlsxExporterView(View):
         """
         return kwargs
 
+    def _get_source_queryset(self):
+        """Returns the queryset of the view, or ``None``.
+
+        Date based and list views provide their own queryset, otherwise
+        :func:`get_queryset_for_xlsx` is used.
+
+        :returns: :class:`QuerySet`
+        """
+        try:
+            _, queryset, _ = self.get_dated_items()
+        except Exception:  # noqa: B902
+            if hasattr(self, "get_queryset"):
+                queryset = self.get_queryset()
+            else:
+                queryset = self.get_queryset_for_xlsx()
+        return queryset
+
+    def _get_export_queryset(self):
+        """Returns the queryset to export, or ``None``.
+
+        It is the queryset of the view, restricted to the rows changed since
+        the watermark if ``watermark_field`` is provided.
+
+        :returns: :class:`QuerySet`
+        """
+        queryset = self._get_source_queryset()
+        if self.watermark_field is not None and queryset is not None:
+            since, until, _now = self._get_watermarks()
+            queryset = delta.delta_queryset(queryset, self.watermark_field, since, until)
+        return queryset
+
+    def _get_watermarks(self):
+        """Returns the watermark sent by the client, and the one of the rows
+        exported now.
+
+        The new watermark is read before the rows, so rows changed during the
+        export are exported again next time rather than missed.
+
+        The time of the export is returned too, to bound the deletions listed.
+
+        :raises: BadRequest
+
+        :returns: tuple
+        """
+        if not hasattr(self, "_watermarks"):
+            value = self.request.GET.get(self.watermark_param)
+            since = None if not value else delta.parse_watermark(self.model, self.watermark_field, value)
+            queryset = self._get_source_queryset()
+            until = delta.get_watermark(queryset, self.watermark_field) if queryset is not None else None
+            self._watermarks = (since, until, timezone.now())
+        return self._watermarks
+
+    def _get_tombstone_sheet(self):
+        """Returns the sheet listing the primary keys deleted since the
+        watermark, or ``None``.
+
+        :raises: ImproperlyConfigured
+
+        :returns: :class:`ExportSheet`
+        """
+        if not self.export_tombstones or self.watermark_field is None:
+            return None
+        from fundor_utilities.models import ExportTombstone
+
+        field = resolve_field(self.model, self.watermark_field)
+        if field is None or field.get_internal_type() != "DateTimeField":
+            raise ImproperlyConfigured("export_tombstones requires a DateTimeField as watermark_field.")
+        since, _until, now = self._get_watermarks()
+        # a full export has no deletions to report
+        queryset = delta.tombstones(self.model, since, now) if since is not None else None
+        return ExportSheet(self.tombstone_sheet_title, queryset, ["object_pk"], ["pk"], model=ExportTombstone)
+
+    def _get_extra_sheets(self):
+        """Returns the sheets written after the one of the view queryset.
+
+        :returns: list of :class:`ExportSheet`
+        """
+        extra_sheets = list(self.sheets or [])
+        if self.summary_sheets:
+            queryset = self._get_export_queryset()
+            if queryset is not None:
+                extra_sheets.extend(
+                    summary.get_sheet(queryset, add_col_names=self.add_col_names) for summary in self.summary_sheets
+                )
+        tombstone_sheet = self._get_tombstone_sheet()
+        if tombstone_sheet is not None:
+            extra_sheets.append(tombstone_sheet)
+        return extra_sheets
+
+    def _set_watermark_header(self, response):
+        """Sets the watermark of the exported rows in ``response``.
+
+        :returns: ``response``
+        """
+        if self.watermark_field is not None:
+            since, until, _now = self._get_watermarks()
+            watermark = until if until is not None else since
+            if watermark is not None:
+                response[delta.WATERMARK_HEADER] = delta.format_watermark(watermark)
+        return response
+
+    def get_export_sheets(self):
+        """Returns the sheets of the workbook.
+
+        The first sheet holds the rows of the view queryset and is followed by
+        ``sheets``.
+
+        :returns: list of :class:`ExportSheet`
+        """
+        main_sheet = ExportSheet(
+            self.get_sheet_title(),
+            self._get_export_queryset(),
+            col_names=self._get_header(),
+            model=self.model,
+            plan=self.get_export_plan(),
+        )
+        return [main_sheet] + self._get_extra_sheets()
+
+    def get_export_metrics(self):
+        """Returns the :class:`fundor_utilities.export.metrics.ExportMetrics`
+        of an export, sending the export signals with this view class as
+        sender.
+
+        :returns: :class:`ExportMetrics`
+        """
+        return ExportMetrics(type(self), view=self)
+
+    def _get_export_chunks(self, sheet, metrics=None):
+        """Returns an iterable over the rows of ``sheet``, in lists.
+
+        :returns: iterable
+        """
+        queryset = sheet.get_queryset()
+        if queryset is None:
+            return []
+        chunks = iteration.iter_chunks(
+            queryset,
+            sheet.field_names,
+            chunk_size=self.chunk_size,
+            iteration=sheet.iteration or self.queryset_iteration,
+        )
+        if metrics is not None:
+            chunks = metrics.iter_chunks(chunks)
+        return chunks
+
+    def _get_export_rows(self, sheet):
+        """Returns an iterable over the rows of ``sheet``.
+
+        :returns: iterable
+        """
+        return chain.from_iterable(self._get_export_chunks(sheet))
+
+    def _get_header(self):
+        """Returns the header row, or ``None`` if it must not be written.
+
+        :returns: list
+        """
+        # add header column only if self.add_col_names is True
+        if self.add_col_names:
+            return self.get_col_names()
+        return None
+
+    def _get_cells(self, sheet):
+        """Returns the cell function of each column of ``sheet``.
+
+        Functions are chosen from the type of the model fields, see
+        :func:`field_cell`.
+
+        :returns: list
+        """
+        return list(sheet.plan.cells)
+
+    def _render_chunks(self, sheet, metrics):
+        """Yields the sheet XML of the rows of ``sheet``, a chunk at a time."""
+        cells = self._get_cells(sheet)
+        for chunk in self._get_export_chunks(sheet, metrics):
+            with metrics.timed(CONVERT):
+                xml = rows_xml(chunk, cells)
+            yield xml
+
+    def _get_xlsx_sheets(self, metrics):
+        """Returns the sheets written by :func:`stream_xlsx`.
+
+        :returns: list
+        """
+        xlsx_sheets = []
+        for sheet in self.get_export_sheets():
+            if self.parallel_workers and sheet.partitioned and sheet.queryset is not None:
+                # rows are read and converted by the workers, waiting for
+                # them is accounted as query time
+                rows = RenderedRows(metrics.iter_chunks(self._iter_parallel_xml(sheet), count=_count_rows))
+            else:
+                rows = RenderedRows(self._render_chunks(sheet, metrics))
+            xlsx_sheets.append((sheet.title, sheet.col_names, rows, self._get_cells(sheet)))
+        return xlsx_sheets
+
+    def get_parallel_executor(self):
+        """Returns the executor used when ``parallel_workers`` is provided.
+
+        :returns: :class:`concurrent.futures.Executor`
+        """
+        return parallel.get_process_executor(self.parallel_workers)
+
+    def _iter_parallel_xml(self, sheet):
+        """Yields the sheet XML of ``sheet`` written in parallel."""
+        with self.get_parallel_executor() as executor:
+            yield from parallel.iter_partitions(
+                sheet.get_queryset(), sheet.field_names, executor, self.parallel_workers, chunk_size=self.chunk_size
+            )
+
+    def _create_streaming_xlsx(self):
+        """Create XLSX while sending it to the client.
+
+        :returns: :class:`StreamingHttpResponse`
+        """
+        metrics = self.get_export_metrics()
+        data = stream_xlsx(self._get_xlsx_sheets(metrics), max_rows=self.max_sheet_rows)
+        response = StreamingHttpResponse(metrics.iter_output(data), content_type=self._content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename()}"'  # noqa:B907
+        return response
+
+    def _write_direct_xlsx(self, fileobj):
+        """Write XLSX to ``fileobj`` with :class:`XlsxStreamWriter`."""
+        metrics = self.get_export_metrics()
+        for data in metrics.iter_output(stream_xlsx(self._get_xlsx_sheets(metrics), max_rows=self.max_sheet_rows)):
+            fileobj.write(data)
+
+    def _write_openpyxl_xlsx(self, fileobj):
+        """Write XLSX to ``fileobj`` with an openpyxl write-only workbook."""
+        sheets = self.get_export_sheets()
+        metrics = self.get_export_metrics()
+        metrics.start()
+        try:
+            self._write_openpyxl_sheets(fileobj, sheets, metrics)
+        except BaseException as error:  # noqa: B902
+            # any failure is reported, then re-raised
+            metrics.finish(error)
+            raise
+        metrics.finish()
+
+    def _write_openpyxl_sheets(self, fileobj, sheets, metrics):
+        # TypeError is raised mostly because of unicode and byte string issues
+        wb = Workbook(write_only=True)
+        for sheet in sheets:
+            part = 1
+            ws = wb.create_sheet(title=sheet.title)
+            if sheet.col_names is not None:
+                ws.append(sheet.col_names)
+            row_count = 0 if sheet.col_names is None else 1
+            convert_row = sheet.plan.convert_row
+            for chunk in self._get_export_chunks(sheet, metrics):
+                with metrics.timed(CONVERT):
+                    for row in chunk:
+                        if row_count >= self.max_sheet_rows:
+                            part += 1
+                            ws = wb.create_sheet(title=overflow_title(sheet.title, part))
+                            if sheet.col_names is not None:
+                                ws.append(sheet.col_names)
+                            row_count = 0 if sheet.col_names is None else 1
+                        ws.append(convert_row(row))
+                        row_count += 1
+        with metrics.timed(WRITE):
+            wb.save(fileobj)
+        try:
+            metrics.bytes = fileobj.tell()
+        except (AttributeError, OSError):
+            pass
+
+    def write_export(self, fileobj):
+        """Writes the XLSX file to ``fileobj`` with ``xlsx_engine``.
+
+        :raises: ImproperlyConfigured
+        """
+        if self.xlsx_engine not in (DIRECT_ENGINE, OPENPYXL_ENGINE):
+            raise ImproperlyConfigured(f"Unknown xlsx_engine {self.xlsx_engine!r}.")
+        if self.xlsx_engine == DIRECT_ENGINE or self.parallel_workers:
+            self._write_direct_xlsx(fileobj)
+        else:
+            self._write_openpyxl_xlsx(fileobj)
+
+    def get_cache_freshness(self, queryset):
+        """Returns the freshness of the data exported from ``queryset``.
+
+        :returns: value of ``cache_freshness``
+        """
+        if self.cache_freshness is None or queryset is None:
+            return None
+        if self.cache_freshness == cache.MODEL_VERSION:
+            return cache.get_model_version(queryset.model)
+        return queryset.aggregate(freshness=self.cache_freshness)["freshness"]
+
+    def get_cache_key(self):
+        """Returns the key of the export in ``export_cache``.
+
+        :returns: str
+        """
+        queryset = self._get_export_queryset()
+        return cache.fingerprint(
+            queryset,
+            type(self).__qualname__,
+            self.xlsx_engine,
+            tuple(self.get_field_names()),
+            self._get_header(),
+            self.get_sheet_title(),
+            self.max_sheet_rows,
+            tuple(
+                cache.fingerprint(sheet.get_queryset(), sheet.title, tuple(sheet.field_names), sheet.col_names)
+                for sheet in self._get_extra_sheets()
+            ),
+            self.get_cache_freshness(queryset),
+        )
+
+    def _create_cached_xlsx(self):
+        """Render the XLSX from ``export_cache``, storing it when missing.
+
+        :returns: :class:`HttpResponse`
+        """
+        key = self.get_cache_key()
+        data = self.export_cache.get(key)
+        if data is None:
+            buffer = BytesIO()
+            self.write_export(buffer)
+            data = buffer.getvalue()
+            self.export_cache.set(key, data)
+        response = HttpResponse(data, content_type=self._content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename()}"'  # noqa:B907
+        return response
+
     def _create_xlsx(self):
         """Create XLSX and render the response.
 
-        :raises: TypeError
+        :raises: TypeError, ImproperlyConfigured
 
         :returns: :class:`HttpResponse`
         """
+        if self.background:
+            return self.enqueue_export()
+        if self.export_cache is not None:
+            return self._create_cached_xlsx()
+        if self.streaming:
+            return self._create_streaming_xlsx()
+
         response = HttpResponse(content_type=self._content_type)  # noqa:B907
         filename = self.get_filename()
         response["Content-Disposition"] = f'attachment; filename="{filename}"'  # noqa:B907
+        self.write_export(response)
+        return response
 
-        # TypeError is raised mostly because of unicode and byte string issues
-        wb = Workbook(write_only=True)
-        ws = wb.create_sheet(title=self.get_sheet_title())
+    def render_to_response(self, context, **response_kwargs):
+        return self._set_watermark_header(self._create_xlsx())
 
-        # add header column only if self.add_col_names is True
-        if self.add_col_names:
-            self.col_names = self.get_col_names()
-            ws.append(self.col_names)
 
-        try:
-            _, queryset, _ = self.get_dated_items()
-        except Exception:  # noqa: B902
-            queryset = self.get_queryset()
-        fields = self.get_field_names()
-        if queryset is not None:
-            for row in queryset.prefetch_related().values_list(*fields):
-                ws.append(row)
-        wb.save(response)
-        return response
+class AsyncXlsxExporterView(XlsxExporterView):
+    """Asynchronous version of :class:`XlsxExporterView`.
 
-    def render_to_response(self, context, **response_kwargs):
-        return self._create_xlsx()
+    Rows are read with the async ORM and the workbook is always streamed, so
+    under ASGI an export does not hold a thread for its whole duration.
+    Background and cached exports are still run by the synchronous code.
+    """
+
+    def _get_async_xlsx_sheets(self):
+        """Returns the metrics of the export and the sheets written by
+        :func:`astream_xlsx`.
+
+        :returns: tuple of :class:`ExportMetrics` and list
+        """
+        metrics = self.get_export_metrics()
+        return metrics, [
+            (sheet.title, sheet.col_names, self._arender_chunks(sheet, metrics), None)
+            for sheet in self.get_export_sheets()
+        ]
+
+    async def _aget_export_chunks(self, sheet):
+        """Yields the rows of ``sheet``, in lists."""
+        queryset = sheet.get_queryset()
+        if queryset is None:
+            return
+        async for chunk in iteration.aiter_chunks(
+            queryset,
+            sheet.field_names,
+            chunk_size=self.chunk_size,
+            iteration=sheet.iteration or self.queryset_iteration,
+        ):
+            yield chunk
+
+    async def _arender_chunks(self, sheet, metrics):
+        """Yields the sheet XML of the rows of ``sheet``, a chunk at a time."""
+        cells = self._get_cells(sheet)
+        async for chunk in metrics.aiter_chunks(self._aget_export_chunks(sheet)):
+            with metrics.timed(CONVERT):
+                xml = rows_xml(chunk, cells)
+            yield xml
+
+    async def get(self, request, *args, **kwargs):
+        if self.background or self.export_cache is not None:
+            return await sync_to_async(self.render_to_response)({})
+        if self.watermark_field is not None:
+            await sync_to_async(self._get_watermarks)()
+        metrics, sheets = self._get_async_xlsx_sheets()
+        data = astream_xlsx(sheets, max_rows=self.max_sheet_rows)
+        response = StreamingHttpResponse(metrics.aiter_output(data), content_type=self._content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename()}"'  # noqa:B907
+        return self._set_watermark_header(response)
 
 
 class XlsxExporter(XlsxExporterView):
@@ -8,3 +8,11 @@ class Book(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class Note(models.Model):
+    title = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,2 @@
+from tests.model import Book  # noqa: F401
+from tests.model import Note  # noqa: F401
@@ -1,7 +1,13 @@
+import os
+import tempfile
+
+# The test database is a file, so that the spawned workers of parallel
+# exports can read it: they get its name in FUNDOR_TESTS_DATABASE.
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": ":memory:",
+        "NAME": os.environ.get("FUNDOR_TESTS_DATABASE", ":memory:"),
+        "TEST": {"NAME": os.path.join(tempfile.gettempdir(), f"fundor_tests_{os.getpid()}.sqlite3")},
     },
 }
 
@@ -34,6 +40,16 @@ TEMPLATES = [
 
 STATIC_URL = "/static/"
 
+# Export versions must live in a cache shared by every process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "fundor_tests_cache"),
+    },
+}
+
+FUNDOR_EXPORT_VERSIONED_MODELS = ["tests.Book"]
+
 
 # XMLTestRunner output
 TEST_OUTPUT_DIR = ".xmlcoverage"
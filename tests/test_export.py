@@ -0,0 +1,113 @@
+import datetime
+import struct
+import zipfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from openpyxl import load_workbook
+
+from fundor_utilities.export.columns import resolve_field
+from fundor_utilities.export.plans import get_plan
+from fundor_utilities.export.xlsx_writer import cell
+from fundor_utilities.export.xlsx_writer import field_cell
+from fundor_utilities.export.xlsx_writer import integer_cell
+from fundor_utilities.export.xlsx_writer import RenderedRows
+from fundor_utilities.export.xlsx_writer import rows_xml
+from fundor_utilities.export.xlsx_writer import stream_xlsx
+from tests.model import Book
+
+
+class TestXlsxWriter(SimpleTestCase):
+
+    def test_values(self):
+        row = [
+            1,
+            Decimal("2.50"),
+            0.25,
+            True,
+            None,
+            datetime.date(2024, 2, 29),
+            datetime.datetime(2024, 2, 29, 12, 30, 15),
+            datetime.time(6, 0),
+            " <b>&</b> ",
+        ]
+        content = b"".join(stream_xlsx([("values", None, [row], None)]))
+        ws = load_workbook(BytesIO(content)).worksheets[0]
+        self.assertEqual(ws.title, "values")
+        self.assertEqual(
+            [c.value for c in ws[1]],
+            [
+                1,
+                2.5,
+                0.25,
+                True,
+                None,
+                datetime.datetime(2024, 2, 29),
+                datetime.datetime(2024, 2, 29, 12, 30, 15),
+                datetime.time(6, 0),
+                " <b>&</b> ",
+            ],
+        )
+
+    def test_non_finite_numbers(self):
+        row = [float("nan"), float("inf"), Decimal("NaN"), Decimal("-Infinity"), Decimal("sNaN")]
+        content = b"".join(stream_xlsx([("values", None, [row], None)]))
+        ws = load_workbook(BytesIO(content)).worksheets[0]
+        self.assertEqual([c.value for c in ws[1]], ["nan", "inf", "NaN", "-Infinity", "sNaN"])
+        cells = [field_cell(resolve_field(Book, "price"))]
+        content = b"".join(stream_xlsx([("books", None, [(Decimal("Infinity"),)], cells)]))
+        self.assertEqual(load_workbook(BytesIO(content)).worksheets[0]["A1"].value, "Infinity")
+
+    def test_field_cells(self):
+        self.assertEqual(field_cell(resolve_field(Book, "pk"))(1), integer_cell(1))
+        self.assertEqual(field_cell(resolve_field(Book, "pk"))(None), "<c/>")
+        self.assertIs(field_cell(resolve_field(Book, "title__lower")), cell)
+        cells = [field_cell(resolve_field(Book, name)) for name in ("title", "price", "average_rating")]
+        content = b"".join(stream_xlsx([("books", ["title", "price", "rating"], [("Dune", None, 4.5)], cells)]))
+        ws = load_workbook(BytesIO(content)).worksheets[0]
+        self.assertEqual(
+            [[c.value for c in row] for row in ws.rows], [["title", "price", "rating"], ["Dune", None, 4.5]]
+        )
+
+    def test_sheet_overflow(self):
+        rows = [[index] for index in range(5)]
+        sheets = [("numbers", ["n"], rows, None), ("xml", None, RenderedRows([rows_xml(rows)]), None)]
+        wb = load_workbook(BytesIO(b"".join(stream_xlsx(sheets, max_rows=3))))
+        self.assertEqual(wb.sheetnames, ["numbers", "numbers_2", "numbers_3", "xml", "xml_2"])
+        self.assertEqual(
+            [[[c.value for c in row] for row in ws.rows] for ws in wb.worksheets],
+            [
+                [["n"], [0], [1]],
+                [["n"], [2], [3]],
+                [["n"], [4]],
+                [[0], [1], [2]],
+                [[3], [4]],
+            ],
+        )
+
+    def test_zip64(self):
+        def version_needed(content):
+            # "version needed to extract" of the local header of the sheet
+            offset = zipfile.ZipFile(BytesIO(content)).getinfo("xl/worksheets/sheet1.xml").header_offset
+            return struct.unpack("<H", content[offset + 4 : offset + 6])[0]
+
+        sheets = [("numbers", None, [[1]], None)]
+        self.assertEqual(version_needed(b"".join(stream_xlsx(sheets))), zipfile.ZIP64_VERSION)
+        self.assertLess(version_needed(b"".join(stream_xlsx(sheets, zip64=False))), zipfile.ZIP64_VERSION)
+
+
+class TestExportPlan(SimpleTestCase):
+
+    def test_plan(self):
+        plan = get_plan(Book)
+        self.assertIs(get_plan(Book, ["title", "price", "average_rating"]), plan)
+        self.assertEqual(plan.headers, ("title", "price", "average rating"))
+        self.assertEqual(plan.cells[1](Decimal("2.50")), field_cell(resolve_field(Book, "price"))(Decimal("2.50")))
+        self.assertEqual(
+            get_plan(Book, ["pk", "title__lower"]).describe()["columns"],
+            [
+                {"name": "pk", "field": "tests.Book.id", "header": "ID", "cell": "nullable_cell", "convert": None},
+                {"name": "title__lower", "field": None, "header": "title__lower", "cell": "cell", "convert": None},
+            ],
+        )
@@ -0,0 +1,476 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from django.http import Http404
+from django.test import override_settings
+from django.test import RequestFactory
+from django.test import TestCase
+from django.urls import path
+from django.utils import translation
+from django.utils.translation import gettext_lazy
+from rest_framework import generics
+from rest_framework import serializers
+from rest_framework.permissions import BasePermission
+from rest_framework.request import Request
+from rest_framework.schemas.generators import EndpointEnumerator
+from rest_framework.test import force_authenticate
+
+from fundor_utilities.permissions import CheckSafeMethodsDjangoModelPermissions
+from fundor_utilities.views.swagger.prebuilt_schema import PrebuiltSchemaView
+from fundor_utilities.views.swagger.prebuilt_schema import write_schema
+from fundor_utilities.views.swagger.profiler import PHASES
+from fundor_utilities.views.swagger.profiler import SchemaProfiler
+from fundor_utilities.views.swagger.schema_cache import invalidate_schemas
+from fundor_utilities.views.swagger.schema_cache import permission_fingerprint
+from fundor_utilities.views.swagger.schema_cache import SchemaCache
+from fundor_utilities.views.swagger.schema_view import SchemaView
+from fundor_utilities.views.swagger.swagger_openapi import CustomAutoSchema
+from fundor_utilities.views.swagger.swagger_openapi import FIELD_MAPPERS
+from fundor_utilities.views.swagger.swagger_openapi import get_field_mapper
+from fundor_utilities.views.swagger.swagger_openapi import get_required_permissions
+from fundor_utilities.views.swagger.swagger_openapi import register_field_mapper
+from fundor_utilities.views.swagger.swagger_openapi import ServerSwagger
+from fundor_utilities.views.swagger.swagger_openapi import SortedPathSchemaGenerator
+from tests.model import Book
+
+
+class BookSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Book
+        fields = ["id", "title", "price", "average_rating"]
+
+
+class BookListView(generics.ListCreateAPIView):
+    """
+    Lists the books.
+
+    Sorted by primary key.
+    """
+
+    tags = ["books"]
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    permission_classes = [CheckSafeMethodsDjangoModelPermissions]
+    schema = CustomAutoSchema()
+
+
+class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
+    tags = ["detail"]
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    permission_classes = [CheckSafeMethodsDjangoModelPermissions]
+    schema = CustomAutoSchema()
+
+
+class ShelfSerializer(serializers.Serializer):
+    featured = BookSerializer(help_text="Book of the week")
+    books = BookSerializer(many=True, read_only=True)
+
+
+class ShelfView(generics.RetrieveAPIView):
+    serializer_class = ShelfSerializer
+    schema = CustomAutoSchema()
+
+
+def get_title_view():
+    class BookSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Book
+            fields = ["title"]
+
+    class BookTitleView(generics.RetrieveAPIView):
+        queryset = Book.objects.all()
+        serializer_class = BookSerializer
+        schema = CustomAutoSchema()
+
+    return BookTitleView
+
+
+urlpatterns = [
+    path("books/", BookListView.as_view()),
+    path("books/<int:pk>/", BookDetailView.as_view()),
+]
+
+
+class CachedSchemaGenerator(SortedPathSchemaGenerator):
+    schema_cache = SchemaCache(maxsize=2)
+
+
+def get_request(user):
+    request = Request(RequestFactory().get("/"))
+    request.user = user
+    return request
+
+
+class TestSchemaCache(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader")
+        cls.reader.user_permissions.add(Permission.objects.get(codename="view_book"))
+        cls.other_reader = User.objects.create_user("other_reader")
+        cls.other_reader.user_permissions.add(Permission.objects.get(codename="view_book"))
+        cls.admin = User.objects.create_superuser("admin")
+
+    def setUp(self):
+        invalidate_schemas()
+
+    def get_generator(self, generator_class=CachedSchemaGenerator):
+        return generator_class(title="Books", patterns=urlpatterns)
+
+    def test_permissions(self):
+        schema = self.get_generator(SortedPathSchemaGenerator).get_schema(get_request(self.reader))
+        self.assertEqual(list(schema["paths"]), ["/books/", "/books/{id}/"])
+        self.assertEqual(list(schema["paths"]["/books/"]), ["get"])
+        schema = self.get_generator(SortedPathSchemaGenerator).get_schema(get_request(self.admin))
+        self.assertEqual(list(schema["paths"]["/books/"]), ["get", "post"])
+
+    def test_shared_schema(self):
+        schema = self.get_generator().get_schema(get_request(self.reader))
+        with self.assertNumQueries(2):
+            # the permissions of the user and of their groups
+            self.assertIs(self.get_generator().get_schema(get_request(self.other_reader)), schema)
+        self.assertIsNot(self.get_generator().get_schema(get_request(self.admin)), schema)
+        servers = [ServerSwagger("https://api.example.com", "production")]
+        self.assertEqual(
+            self.get_generator().get_schema(get_request(self.reader), servers=servers)["servers"][0]["url"],
+            "https://api.example.com",
+        )
+
+    def test_permission_change(self):
+        generator = self.get_generator()
+        self.assertEqual(list(generator.get_schema(get_request(self.reader))["paths"]["/books/"]), ["get"])
+        reader = User.objects.get(pk=self.reader.pk)
+        reader.user_permissions.add(Permission.objects.get(codename="add_book"))
+        self.assertEqual(list(generator.get_schema(get_request(reader))["paths"]["/books/"]), ["get", "post"])
+
+    def test_permissions_resolved_once(self):
+        generator = self.get_generator(SortedPathSchemaGenerator)
+        generator.get_schema(get_request(self.other_reader))
+        reader = User.objects.get(pk=self.reader.pk)
+        with (
+            mock.patch.object(
+                User, "get_all_permissions", autospec=True, side_effect=User.get_all_permissions
+            ) as perms,
+            mock.patch(f"{SortedPathSchemaGenerator.__module__}.get_required_permissions") as required,
+        ):
+            schema = generator.get_schema(get_request(reader))
+        perms.assert_called_once_with(reader)
+        # required permissions are computed once per process
+        required.assert_not_called()
+        self.assertEqual(list(schema["paths"]["/books/{id}/"]), ["get"])
+        self.assertEqual(
+            get_required_permissions(generator.create_view(BookListView.as_view(), "POST"), "POST"),
+            frozenset(["tests.add_book"]),
+        )
+
+    def test_endpoint_index(self):
+        index = self.get_generator().get_endpoint_index()
+        self.assertEqual(
+            [(endpoint.path, endpoint.method) for endpoint in index],
+            [
+                ("/books/", "GET"),
+                ("/books/{id}/", "GET"),
+                ("/books/", "POST"),
+                ("/books/{id}/", "PUT"),
+                ("/books/{id}/", "PATCH"),
+                ("/books/{id}/", "DELETE"),
+            ],
+        )
+        # the URLconf is walked once per process
+        with mock.patch.object(EndpointEnumerator, "get_api_endpoints") as get_api_endpoints:
+            self.assertIs(self.get_generator().get_endpoint_index(), index)
+            self.get_generator().get_schema(get_request(self.reader))
+        get_api_endpoints.assert_not_called()
+        invalidate_schemas()
+        self.assertIsNot(self.get_generator().get_endpoint_index(), index)
+
+    def test_request_serializer_class(self):
+        class UserBookListView(BookListView):
+            def get_serializer_class(self):
+                # only called once the request is set
+                return BookSerializer if self.request.user.is_authenticated else ShelfSerializer
+
+        patterns = [path("user-books/", UserBookListView.as_view())]
+        generator = SortedPathSchemaGenerator(title="Books", patterns=patterns)
+        self.assertEqual(list(generator.get_schema(get_request(self.reader))["paths"]), ["/user-books/"])
+        self.assertEqual(list(generator.get_schema(get_request(self.admin))["paths"]["/user-books/"]), ["get", "post"])
+        nobody = User.objects.create_user("nobody")
+        self.assertIsNone(generator.get_schema(get_request(nobody)))
+
+    def test_tags(self):
+        view = SchemaView.as_view(urlconf=__name__, generator_class=CachedSchemaGenerator)
+
+        def get(path):
+            request = RequestFactory().get(path)
+            force_authenticate(request, self.reader)
+            return view(request)
+
+        self.assertEqual(
+            get("/?index").data["tags"],
+            [
+                {"name": "books", "operations": [{"path": "/books/", "method": "get"}]},
+                {"name": "detail", "operations": [{"path": "/books/{id}/", "method": "get"}]},
+            ],
+        )
+        schema = get("/?tag=detail").data
+        self.assertEqual(list(schema["paths"]), ["/books/{id}/"])
+        # each tag is cached on its own
+        self.assertIs(get("/?tag=detail").data, schema)
+        self.assertEqual(list(get("/").data["paths"]), ["/books/", "/books/{id}/"])
+        self.assertEqual(get("/?tag=unknown").status_code, 404)
+
+    def test_patterns_identity(self):
+        generator = self.get_generator()
+        key = generator.get_schema_cache_key(public=True)
+        schema = generator.get_schema(public=True)
+        other = CachedSchemaGenerator(title="Books", patterns=[path("books/", BookListView.as_view())])
+        # a new list of patterns may get the id of a collected one
+        with mock.patch.object(CachedSchemaGenerator, "get_schema_cache_key", return_value=key):
+            other_schema = other.get_schema(public=True)
+        self.assertEqual(list(schema["paths"]), ["/books/", "/books/{id}/"])
+        self.assertEqual(list(other_schema["paths"]), ["/books/"])
+
+    def test_custom_permissions(self):
+        class IsReader(BasePermission):
+            def has_permission(self, request, view):
+                return request.user.username == "reader"
+
+        class ReaderBookListView(BookListView):
+            permission_classes = [CheckSafeMethodsDjangoModelPermissions, IsReader]
+
+        class ReaderSchemaGenerator(CachedSchemaGenerator):
+            schema_cache = SchemaCache(maxsize=2)
+
+        def get_generator():
+            return ReaderSchemaGenerator(title="Books", patterns=[path("books/", ReaderBookListView.as_view())])
+
+        # both readers have the same permissions, but only one may call it
+        self.assertEqual(list(get_generator().get_schema(get_request(self.reader))["paths"]), ["/books/"])
+        self.assertIsNone(get_generator().get_schema(get_request(self.other_reader)))
+        self.assertEqual(len(ReaderSchemaGenerator.schema_cache), 0)
+        self.assertEqual(list(get_generator().get_schema(public=True)["paths"]), ["/books/"])
+        self.assertEqual(len(ReaderSchemaGenerator.schema_cache), 1)
+
+        class UserSchemaGenerator(ReaderSchemaGenerator):
+            def get_permission_fingerprint(self, user):
+                return permission_fingerprint(user) + str(user.pk if user is not None else None)
+
+        generator = UserSchemaGenerator(title="Books", patterns=[path("books/", ReaderBookListView.as_view())])
+        schema = generator.get_schema(get_request(self.reader))
+        self.assertIs(generator.get_schema(get_request(self.reader)), schema)
+        self.assertIsNone(generator.get_schema(get_request(self.other_reader)))
+
+    def test_eviction(self):
+        generator = self.get_generator()
+        schema = generator.get_schema(get_request(self.reader))
+        generator.get_schema(get_request(self.admin))
+        generator.get_schema(get_request(AnonymousUser()))
+        self.assertEqual(len(generator.schema_cache), 2)
+        self.assertIsNot(generator.get_schema(get_request(self.reader)), schema)
+        invalidate_schemas()
+        self.assertEqual(len(generator.schema_cache), 0)
+
+
+class TestComponents(TestCase):
+
+    def setUp(self):
+        self.patterns = [
+            path("books/", BookListView.as_view()),
+            path("books/<int:pk>/", BookDetailView.as_view()),
+            path("shelf/", ShelfView.as_view()),
+            path("titles/<int:pk>/", get_title_view().as_view()),
+        ]
+
+    def test_references(self):
+        schema = SortedPathSchemaGenerator(patterns=self.patterns).get_schema(public=True)
+        components = schema["components"]["schemas"]
+        # both serializers are named Book, so neither keeps the bare name
+        book_component, title_component = sorted(
+            (name for name in components if name.startswith("Book_")),
+            key=lambda name: len(components[name]["properties"]),
+            reverse=True,
+        )
+        self.assertEqual(sorted(components), sorted([book_component, title_component, "PatchedBook", "Shelf"]))
+        self.assertEqual(list(components[title_component]["properties"]), ["title"])
+        self.assertNotIn("required", components["PatchedBook"])
+        self.assertEqual(
+            components["Shelf"]["properties"],
+            {
+                "featured": {
+                    "allOf": [{"$ref": f"#/components/schemas/{book_component}"}],
+                    "description": "Book of the week",
+                },
+                "books": {
+                    "type": "array",
+                    "items": {"$ref": f"#/components/schemas/{book_component}"},
+                    "readOnly": True,
+                },
+            },
+        )
+        ref = {"$ref": f"#/components/schemas/{book_component}"}
+        books = schema["paths"]["/books/"]
+        self.assertEqual(books["get"]["responses"]["200"]["content"]["application/json"]["schema"]["items"], ref)
+        self.assertEqual(books["post"]["requestBody"]["content"]["application/json"]["schema"], ref)
+        patch = schema["paths"]["/books/{id}/"]["patch"]["requestBody"]["content"]["application/json"]["schema"]
+        self.assertEqual(patch, {"$ref": "#/components/schemas/PatchedBook"})
+        self.assertEqual(
+            schema["paths"]["/titles/{id}/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"],
+            {"$ref": f"#/components/schemas/{title_component}"},
+        )
+        # names do not depend on the order of the endpoints
+        reversed_schema = SortedPathSchemaGenerator(patterns=self.patterns[::-1]).get_schema(public=True)
+        self.assertEqual(json.dumps(reversed_schema), json.dumps(schema))
+        title_schema = SortedPathSchemaGenerator(patterns=self.patterns[2:]).get_schema(public=True)
+        self.assertEqual(
+            sorted(title_schema["components"]["schemas"]), sorted([book_component, title_component, "Shelf"])
+        )
+
+    def test_parallel_operations(self):
+        schema = SortedPathSchemaGenerator(patterns=self.patterns).get_schema(public=True)
+        generator = SortedPathSchemaGenerator(patterns=self.patterns)
+        generator.parallel_workers = 4
+        for _ in range(5):
+            self.assertEqual(json.dumps(generator.get_schema(public=True)), json.dumps(schema))
+        generator.parallel_workers = 2
+        with mock.patch.object(connections, "close_all") as close_all:
+            self.assertEqual(json.dumps(generator.get_schema(public=True)), json.dumps(schema))
+        # once per thread, not once per operation
+        self.assertEqual(close_all.call_count, 2)
+
+    def test_parallel_translations(self):
+        class RatedBookSerializer(BookSerializer):
+            average_rating = serializers.FloatField(help_text=gettext_lazy("This field is required."))
+
+        class RatedBookView(BookDetailView):
+            serializer_class = RatedBookSerializer
+
+        patterns = [path("books/<int:pk>/", RatedBookView.as_view())]
+        generator = SortedPathSchemaGenerator(patterns=patterns)
+        generator.parallel_workers = 2
+        with translation.override("fr"):
+            schema = generator.get_schema(public=True)
+            self.assertEqual(
+                json.dumps(schema), json.dumps(SortedPathSchemaGenerator(patterns=patterns).get_schema(public=True))
+            )
+        rating = schema["components"]["schemas"]["RatedBook"]["properties"]["average_rating"]
+        self.assertEqual(rating["description"], "Ce champ est obligatoire.")
+
+    def test_memoized_serializers(self):
+        generator = SortedPathSchemaGenerator(patterns=urlpatterns)
+        with mock.patch.object(CustomAutoSchema, "_map_serializer", autospec=True, return_value={}) as map_serializer:
+            generator.get_schema(public=True)
+        # once for the responses and requests, once for the partial updates
+        self.assertEqual(map_serializer.call_count, 2)
+
+    def test_field_mappers(self):
+        class RatingField(serializers.FloatField):
+            pass
+
+        class StarsField(RatingField):
+            pass
+
+        class RatingSerializer(serializers.Serializer):
+            stars = StarsField()
+
+        self.addCleanup(get_field_mapper.cache_clear)
+        self.addCleanup(FIELD_MAPPERS.pop, RatingField)
+        register_field_mapper(RatingField, lambda inspector, field: {"type": "integer", "maximum": 5})
+        self.assertEqual(
+            CustomAutoSchema()._map_serializer(RatingSerializer()),
+            {"properties": {"stars": {"type": "integer", "maximum": 5}}, "required": ["stars"]},
+        )
+
+
+class TestPrebuiltSchema(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "schema.json")
+
+    def test_build_and_serve(self):
+        call_command("build_openapi_schema", output=self.path, urlconf=__name__, title="Books", stdout=StringIO())
+        with open(self.path, "rb") as fileobj:
+            data = fileobj.read()
+        schema = json.loads(data)
+        self.assertEqual(schema["info"]["title"], "Books")
+        # public schemas list every endpoint
+        self.assertEqual(list(schema["paths"]["/books/"]), ["get", "post"])
+        with open(self.path + ".gz", "rb") as fileobj:
+            self.assertEqual(gzip.decompress(fileobj.read()), data)
+
+        view = PrebuiltSchemaView.as_view(schema_path=self.path)
+        response = view(RequestFactory().get("/"))
+        self.assertEqual(response.content, data)
+        etag = response["ETag"]
+        response = view(RequestFactory().get("/", headers={"If-None-Match": etag}))
+        self.assertEqual((response.status_code, response.content), (304, b""))
+        response = view(RequestFactory().get("/", headers={"Accept-Encoding": "gzip"}))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), data)
+        self.assertNotEqual(response["ETag"], etag)
+        response = view(RequestFactory().get("/", headers={"Accept-Encoding": "gzip;q=0, br"}))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, data)
+
+    @override_settings(FUNDOR_SCHEMA_PATH="/nonexistent/schema.json")
+    def test_not_built(self):
+        with self.assertRaises(Http404) as context:
+            PrebuiltSchemaView.as_view()(RequestFactory().get("/"))
+        self.assertIsInstance(context.exception.__cause__, FileNotFoundError)
+
+    def test_write_failure(self):
+        # a directory cannot be replaced by the schema
+        os.mkdir(self.path + ".gz")
+        with self.assertRaises(OSError):
+            write_schema({}, self.path)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["schema.json.gz"])
+
+
+class TestProfiler(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader")
+        cls.reader.user_permissions.add(Permission.objects.get(codename="view_book"))
+
+    def setUp(self):
+        invalidate_schemas()
+
+    def test_report(self):
+        generator = SortedPathSchemaGenerator(title="Books", patterns=urlpatterns)
+        generator.profiler = SchemaProfiler()
+        generator.get_schema(get_request(self.reader))
+        report = generator.profiler.report()
+        self.assertEqual(report["endpoints_count"], 2)
+        self.assertEqual(
+            {(endpoint["path"], endpoint["method"]) for endpoint in report["endpoints"]},
+            {("/books/", "GET"), ("/books/{id}/", "GET")},
+        )
+        self.assertEqual(set(report["endpoints"][0]["phases"]), set(PHASES))
+        self.assertEqual(report["endpoints"][0]["phases"]["view"]["calls"], 1)
+        totals = [endpoint["total"] for endpoint in report["endpoints"]]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        self.assertEqual(len(generator.profiler.report(sort="responses", limit=1)["endpoints"]), 1)
+        with self.assertRaises(ValueError):
+            generator.profiler.report(sort="unknown")
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command("profile_openapi_schema", urlconf=__name__, user="reader", sort="request_body", stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report["endpoints_count"], 2)
+        stdout = StringIO()
+        call_command("profile_openapi_schema", urlconf=__name__, stdout=stdout)
+        # public schemas list every endpoint
+        self.assertEqual(json.loads(stdout.getvalue())["endpoints_count"], 6)
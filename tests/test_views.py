@@ -1,16 +1,651 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import partial
+from io import BytesIO
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.core.exceptions import BadRequest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.db import connection
+from django.db.models import Count
+from django.db.models import Sum
+from django.db.models.signals import post_delete
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from django.test import RequestFactory
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.utils import timezone
+from django.views.generic import View
+from openpyxl import load_workbook
+from openpyxl import Workbook
 
+from fundor_utilities.export import parallel
+from fundor_utilities.export.cache import DjangoCacheBackend
+from fundor_utilities.export.cache import FileCacheBackend
+from fundor_utilities.export.cache import MODEL_VERSION
+from fundor_utilities.export.delta import tombstones
+from fundor_utilities.export.delta import track_deletions
+from fundor_utilities.export.jobs import ExportJobManager
+from fundor_utilities.export.metrics import export_finished
+from fundor_utilities.export.metrics import export_progress
+from fundor_utilities.export.metrics import export_started
+from fundor_utilities.export.sheets import ExportSheet
+from fundor_utilities.export.sheets import SummarySheet
+from fundor_utilities.views.csv_view import TsvExporterView
+from fundor_utilities.views.export_job_view import BackgroundExportMixin
+from fundor_utilities.views.export_job_view import ExportJobView
+from fundor_utilities.views.tcs_view import AsyncExportTSV
+from fundor_utilities.views.tcs_view import ExportTSV
+from fundor_utilities.views.xlsx_import_view import XlsxImporterView
+from fundor_utilities.views.xlsx_view import AsyncXlsxExporterView
 from fundor_utilities.views.xlsx_view import XlsxExporterView
 from tests.model import Book
+from tests.model import Note
 
 
 class MokXLSView(XlsxExporterView):
     model = Book
 
 
+class MokStreamingXLSView(XlsxExporterView):
+    model = Book
+    add_col_names = True
+    streaming = True
+
+
+def read_rows(content):
+    wb = load_workbook(BytesIO(content), read_only=True)
+    return [list(row) for row in wb.worksheets[0].iter_rows(values_only=True)]
+
+
 class TestXlsxExporter(TestCase):
 
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        Book.objects.create(title="Emma", price=Decimal("5.00"), average_rating=3.75)
+
+    def get_view(self, view_class):
+        view = view_class()
+        view.setup(RequestFactory().get("/"))
+        return view
+
     def test(self):
         moka = MokXLSView()
         self.assertEqual(moka.model, Book)
         self.assertEqual(moka.get_col_names(), ["title", "price", "average rating"])
+
+    def test_create_xlsx(self):
+        response = self.get_view(MokXLSView).render_to_response({})
+        self.assertEqual(read_rows(response.content), [["Dune", 9.9, 4.5], ["Emma", 5, 3.75]])
+
+    def test_streaming(self):
+        response = self.get_view(MokStreamingXLSView).render_to_response({})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="book_list.xlsx"')
+        self.assertEqual(
+            read_rows(b"".join(response.streaming_content)),
+            [["title", "price", "average rating"], ["Dune", 9.9, 4.5], ["Emma", 5, 3.75]],
+        )
+
+    def test_keyset_iteration(self):
+        Book.objects.bulk_create(
+            [Book(title=f"Book {index}", price=Decimal(index), average_rating=1) for index in range(5)]
+        )
+        view = self.get_view(MokXLSView)
+        view.chunk_size = 2
+        view.queryset_iteration = "keyset"
+        with self.assertNumQueries(4):
+            rows = list(view._get_export_rows(ExportSheet("books", Book.objects.all())))
+        self.assertEqual([row[0] for row in rows], list(Book.objects.order_by("pk").values_list("title", flat=True)))
+
+    def test_unknown_iteration(self):
+        view = self.get_view(MokXLSView)
+        view.queryset_iteration = "offset"
+        with self.assertRaises(ImproperlyConfigured):
+            view._get_export_rows(ExportSheet("books", Book.objects.all()))
+
+    def test_direct_engine(self):
+        view = self.get_view(MokXLSView)
+        view.xlsx_engine = "direct"
+        response = view.render_to_response({})
+        self.assertEqual(read_rows(response.content), [["Dune", 9.9, 4.5], ["Emma", 5, 3.75]])
+
+    def test_multiple_sheets(self):
+        class MokMultiSheetXLSView(XlsxExporterView):
+            model = Book
+            add_col_names = True
+            max_sheet_rows = 2
+            sheet_title = "books"
+            sheets = [ExportSheet("cheap", Book.objects.filter(price__lt=6), ["title"], ["title"])]
+
+        for engine in ("openpyxl", "direct"):
+            with self.subTest(engine=engine):
+                view = self.get_view(MokMultiSheetXLSView)
+                view.xlsx_engine = engine
+                wb = load_workbook(BytesIO(view.render_to_response({}).content), read_only=True)
+                self.assertEqual(wb.sheetnames, ["books", "books_2", "cheap"])
+                self.assertEqual(
+                    [[list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets],
+                    [
+                        [["title", "price", "average rating"], ["Dune", 9.9, 4.5]],
+                        [["title", "price", "average rating"], ["Emma", 5, 3.75]],
+                        [["title"], ["Emma"]],
+                    ],
+                )
+
+    def test_summary_sheets(self):
+        Book.objects.create(title="Dune", price=Decimal("12.10"), average_rating=4)
+
+        class MokSummaryXLSView(XlsxExporterView):
+            model = Book
+            add_col_names = True
+            sheet_title = "books"
+            summary_sheets = [
+                SummarySheet("by title", ["title"], {"books": Count("pk"), "total": Sum("price")}),
+                SummarySheet("totals", aggregates={"books": Count("pk")}, col_names=["books"]),
+            ]
+
+            def get_queryset_for_xlsx(self):
+                return Book.objects.filter(price__gt=6)
+
+        for engine in ("openpyxl", "direct"):
+            with self.subTest(engine=engine):
+                view = self.get_view(MokSummaryXLSView)
+                view.xlsx_engine = engine
+                with self.assertNumQueries(3):
+                    content = view.render_to_response({}).content
+                wb = load_workbook(BytesIO(content), read_only=True)
+                self.assertEqual(wb.sheetnames, ["books", "by title", "totals"])
+                self.assertEqual(
+                    [list(row) for row in wb["by title"].iter_rows(values_only=True)],
+                    [["title", "books", "total"], ["Dune", 2, 22]],
+                )
+                self.assertEqual([list(row) for row in wb["totals"].iter_rows(values_only=True)], [["books"], [2]])
+
+    def test_metrics(self):
+        events = []
+
+        def receiver(signal, sender, **kwargs):
+            events.append((signal, kwargs))
+
+        for signal in (export_started, export_progress, export_finished):
+            signal.connect(receiver, sender=MokXLSView)
+            self.addCleanup(signal.disconnect, receiver, sender=MokXLSView)
+
+        for engine in ("openpyxl", "direct"):
+            with self.subTest(engine=engine):
+                events.clear()
+                view = self.get_view(MokXLSView)
+                view.xlsx_engine = engine
+                view.chunk_size = 1
+                response = view.render_to_response({})
+                self.assertEqual(
+                    [signal for signal, _ in events],
+                    [export_started, export_progress, export_progress, export_finished],
+                )
+                self.assertIs(events[0][1]["view"], view)
+                self.assertEqual([kwargs["rows"] for _, kwargs in events[1:]], [1, 2, 2])
+                finished = events[-1][1]
+                self.assertEqual(finished["bytes"], len(response.content))
+                self.assertIsNone(finished["error"])
+                self.assertEqual(sorted(finished["timings"]), ["convert", "query", "write"])
+                self.assertLessEqual(sum(finished["timings"].values()), finished["elapsed"])
+
+    def test_metrics_aborted(self):
+        events = []
+
+        def receiver(sender, **kwargs):
+            events.append(kwargs)
+
+        export_finished.connect(receiver, sender=MokStreamingXLSView)
+        self.addCleanup(export_finished.disconnect, receiver, sender=MokStreamingXLSView)
+        view = self.get_view(MokStreamingXLSView)
+        view.chunk_size = 1
+        response = view.render_to_response({})
+        next(iter(response.streaming_content))
+        # the server closes the response when the client disconnects; like
+        # the test client, keep the database connection of the test open
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        with self.assertLogs("fundor_utilities.export.metrics", "INFO") as logs:
+            response.close()
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0]["aborted"])
+        self.assertIsNone(events[0]["error"])
+        self.assertEqual([record.levelname for record in logs.records], ["INFO"])
+        self.assertIn("aborted", logs.output[0])
+
+    async def test_async_view(self):
+        class MokAsyncXLSView(AsyncXlsxExporterView):
+            model = Book
+            chunk_size = 1
+
+        self.assertTrue(MokAsyncXLSView.view_is_async)
+        response = await MokAsyncXLSView.as_view()(RequestFactory().get("/"))
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(read_rows(content), [["Dune", 9.9, 4.5], ["Emma", 5, 3.75]])
+
+
+class TestExportJobs(TransactionTestCase):
+
+    def setUp(self):
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = ExportJobManager(self.directory.name, ttl=60)
+        patcher = mock.patch("fundor_utilities.views.export_job_view.get_job_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    def test_background_export(self):
+        view = MokXLSView()
+        view.setup(RequestFactory().get("/"))
+        view.background = True
+        response = view.render_to_response({})
+        self.assertEqual(response.status_code, 202)
+        token = json.loads(response.content)["token"]
+        self.manager.get(token).future.result(timeout=10)
+
+        status = ExportJobView.as_view()(RequestFactory().get("/"), token=token)
+        self.assertEqual(json.loads(status.content)["status"], "done")
+
+        download = ExportJobView.as_view()(RequestFactory().get("/?download"), token=token)
+        content = b"".join(download.streaming_content)
+        self.assertEqual(read_rows(content), [["Dune", 9.9, 4.5]])
+
+        partial = ExportJobView.as_view()(RequestFactory().get("/?download", HTTP_RANGE="bytes=10-19"), token=token)
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial["Content-Range"], f"bytes 10-19/{len(content)}")
+        self.assertEqual(b"".join(partial.streaming_content), content[10:20])
+
+        invalid = ExportJobView.as_view()(RequestFactory().get("/?download", HTTP_RANGE="bytes=999999-"), token=token)
+        self.assertEqual(invalid.status_code, 416)
+
+    def test_background_tsv_export(self):
+        class MokExportTSV(ExportTSV):
+            model = Book
+
+            def get_queryset(self):
+                return super().get_queryset().filter(title="Dune")
+
+        response = MokExportTSV.as_view(background=True)(RequestFactory().get("/"))
+        self.assertEqual(response.status_code, 202)
+        token = json.loads(response.content)["token"]
+        self.manager.get(token).future.result(timeout=10)
+        download = ExportJobView.as_view()(RequestFactory().get("/?download"), token=token)
+        self.assertEqual(download["Content-Disposition"], 'attachment; filename="book_list.tsv"')
+        self.assertEqual(b"".join(download.streaming_content), b"Dune\t9.90\t4.5\r\n")
+
+    def test_write_export_required(self):
+        class NoWriterView(BackgroundExportMixin, View):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoWriterView()
+
+    def test_purge_expired(self):
+        job = self.manager.submit(lambda fileobj: fileobj.write(b"data"), "data.txt", "text/plain")
+        job.future.result(timeout=10)
+        abandoned = os.path.join(self.directory.name, "abandoned")
+        with open(abandoned, "wb"):
+            pass
+        expired = time.time() - 120
+        os.utime(abandoned, (expired, expired))
+        os.utime(job.path, (expired, expired))
+        job.finished = expired
+        self.assertIsNone(self.manager.get(job.token))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+class MokParallelXLSView(XlsxExporterView):
+    model = Book
+    parallel_workers = 2
+    chunk_size = 3
+
+    def get_parallel_executor(self):
+        return ThreadPoolExecutor(max_workers=self.parallel_workers)
+
+
+class TestParallelExport(TransactionTestCase):
+
+    def test_parallel_export(self):
+        Book.objects.bulk_create(
+            [Book(title=f"Book {index}", price=Decimal(index), average_rating=1) for index in range(50)]
+        )
+        Book.objects.filter(pk__in=Book.objects.order_by("pk").values_list("pk", flat=True)[10:20]).delete()
+        view = MokParallelXLSView()
+        view.setup(RequestFactory().get("/"))
+        expected = Book.objects.order_by("pk").values_list("title", "price", "average_rating")
+        self.assertEqual(read_rows(view.render_to_response({}).content), [list(row) for row in expected])
+
+    def test_partitions(self):
+        Book.objects.bulk_create([Book(title=f"Book {index}", price=1, average_rating=1) for index in range(10)])
+        keys = list(Book.objects.order_by("pk").values_list("pk", flat=True))
+        self.assertEqual(
+            list(parallel.pk_ranges(Book.objects.all(), 4)), [(keys[0], keys[4]), (keys[4], keys[8]), (keys[8], None)]
+        )
+        queryset = Book.objects.using("default").filter(title__startswith="Book")
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            mock.patch.object(parallel, "render_partition", wraps=parallel.render_partition) as render,
+        ):
+            fragments = list(parallel.iter_partitions(queryset, ["title"], executor, 2, chunk_size=4))
+        # each worker renders at most chunk_size rows, from the database of
+        # the queryset
+        self.assertEqual([fragment.count("<row>") for fragment in fragments], [4, 4, 2])
+        self.assertEqual({call.args[1] for call in render.call_args_list}, {"default"})
+
+    def test_process_pool(self):
+        Book.objects.bulk_create(
+            [Book(title=f"Book {index}", price=Decimal(index), average_rating=1) for index in range(20)]
+        )
+        view = MokParallelXLSView()
+        view.setup(RequestFactory().get("/"))
+        view.get_parallel_executor = partial(XlsxExporterView.get_parallel_executor, view)
+        expected = Book.objects.order_by("pk").values_list("title", "price", "average_rating")
+        # spawned workers set Django up from scratch and open their own
+        # connection to the test database
+        with mock.patch.dict(os.environ, {"FUNDOR_TESTS_DATABASE": connection.settings_dict["NAME"]}):
+            content = view.render_to_response({}).content
+        self.assertEqual(read_rows(content), [list(row) for row in expected])
+
+
+class MokCachedXLSView(XlsxExporterView):
+    model = Book
+    xlsx_engine = "direct"
+    export_cache = DjangoCacheBackend()
+    cache_freshness = MODEL_VERSION
+
+
+class TestExportCache(TestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+
+    def render(self, path="/"):
+        view = MokCachedXLSView()
+        view.setup(RequestFactory().get(path))
+        return view.render_to_response({})
+
+    def test_cache_hit(self):
+        first = self.render()
+        with self.assertNumQueries(0):
+            second = self.render()
+        self.assertEqual(first.content, second.content)
+
+    def test_model_version(self):
+        self.render()
+        Book.objects.create(title="Emma", price=Decimal("5.00"), average_rating=3.75)
+        self.assertEqual(read_rows(self.render().content), [["Dune", 9.9, 4.5], ["Emma", 5, 3.75]])
+
+    def test_version_cache(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.render()
+        with mock.patch("fundor_utilities.export.cache._tracked_models", set()):
+            with self.assertRaises(ImproperlyConfigured):
+                self.render()
+
+    def test_file_backend_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FileCacheBackend(directory, max_size=10)
+            backend.set("a", b"123456")
+            backend.set("b", b"123456")
+            self.assertIsNone(backend.get("a"))
+            self.assertEqual(backend.get("b"), b"123456")
+
+
+class MokImportView(XlsxImporterView):
+    model = Book
+    add_col_names = True
+    batch_size = 2
+
+
+def xlsx_upload(rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return SimpleUploadedFile("books.xlsx", buffer.getvalue())
+
+
+class TestXlsxImporter(TestCase):
+
+    def post(self, view_class, rows):
+        request = RequestFactory().post("/", {"file": xlsx_upload(rows)})
+        response = view_class.as_view()(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_roundtrip(self):
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        view = MokStreamingXLSView()
+        view.setup(RequestFactory().get("/"))
+        content = b"".join(view.render_to_response({}).streaming_content)
+        Book.objects.all().delete()
+        request = RequestFactory().post("/", {"file": SimpleUploadedFile("books.xlsx", content)})
+        response = MokImportView.as_view()(request)
+        self.assertEqual(json.loads(response.content), {"created": 1, "updated": 0, "errors": []})
+        self.assertEqual(
+            list(Book.objects.values_list("title", "price", "average_rating")), [("Dune", Decimal("9.90"), 4.5)]
+        )
+
+    def test_row_errors(self):
+        rows = [["title", "price", "rating"], ["Dune", 9.9, 4.5], ["Emma", "cheap", 3], [], ["Ulysses", 12, None]]
+        # the insert is in a savepoint of its own
+        with self.assertNumQueries(5):
+            status, result = self.post(MokImportView, rows)
+        self.assertEqual(status, 200)
+        self.assertEqual(result["created"], 1)
+        self.assertEqual([error["row"] for error in result["errors"]], [3, 5])
+        self.assertEqual(list(result["errors"][0]["errors"]), ["price"])
+        self.assertEqual(list(Book.objects.values_list("title", flat=True)), ["Dune"])
+
+        class MokAtomicImportView(MokImportView):
+            abort_on_error = True
+
+        status, result = self.post(MokAtomicImportView, rows)
+        self.assertEqual(status, 400)
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_import_key(self):
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+
+        class MokUpdateImportView(MokImportView):
+            import_key = "title"
+
+        status, result = self.post(MokUpdateImportView, [["title"], ["Dune", 8, 5], ["Emma", 5, 3.75]])
+        self.assertEqual(result, {"created": 1, "updated": 1, "errors": []})
+        self.assertEqual(
+            list(Book.objects.order_by("title").values_list("title", "price")),
+            [("Dune", Decimal("8.00")), ("Emma", Decimal("5.00"))],
+        )
+
+    def test_duplicate_keys(self):
+        class MokUpdateImportView(MokImportView):
+            import_key = "title"
+            batch_size = 3
+
+        rows = [["title"], ["Dune", 8, 5], ["Emma", 5, 3.75], ["Dune", 7, 4]]
+        status, result = self.post(MokUpdateImportView, rows)
+        self.assertEqual(result, {"created": 2, "updated": 1, "errors": []})
+        self.assertEqual(
+            list(Book.objects.order_by("title").values_list("title", "price")),
+            [("Dune", Decimal("7.00")), ("Emma", Decimal("5.00"))],
+        )
+
+    def test_integrity_errors(self):
+        book = Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+
+        class MokPkImportView(MokImportView):
+            field_names = ["id", "title", "price", "average_rating"]
+            batch_size = 3
+
+        rows = [["id"], [None, "Emma", 5, 3], [book.pk, "Ulysses", 12, 4], ["x", "Dune", 1, 1], [None, "Kim", 2, 2]]
+        status, result = self.post(MokPkImportView, rows)
+        self.assertEqual(status, 200)
+        self.assertEqual(result["created"], 2)
+        self.assertEqual(
+            [(error["row"], list(error["errors"])) for error in result["errors"]], [(3, ["__all__"]), (4, ["id"])]
+        )
+        self.assertEqual(list(Book.objects.order_by("pk").values_list("title", flat=True)), ["Dune", "Emma", "Kim"])
+
+
+class MokDeltaXLSView(XlsxExporterView):
+    model = Book
+    watermark_field = "pk"
+
+
+class TestDeltaExport(TestCase):
+
+    def render(self, view_class, path="/"):
+        view = view_class()
+        view.setup(RequestFactory().get(path))
+        return view.render_to_response({})
+
+    def test_watermark(self):
+        dune = Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        response = self.render(MokDeltaXLSView)
+        self.assertEqual(response["X-Export-Watermark"], str(dune.pk))
+        self.assertEqual(read_rows(response.content), [["Dune", 9.9, 4.5]])
+
+        emma = Book.objects.create(title="Emma", price=Decimal("5.00"), average_rating=3.75)
+        response = self.render(MokDeltaXLSView, f"/?since={dune.pk}")
+        self.assertEqual(response["X-Export-Watermark"], str(emma.pk))
+        self.assertEqual(read_rows(response.content), [["Emma", 5, 3.75]])
+
+        response = self.render(MokDeltaXLSView, f"/?since={emma.pk}")
+        self.assertEqual(response["X-Export-Watermark"], str(emma.pk))
+        self.assertEqual(read_rows(response.content), [])
+
+        with self.assertRaises(BadRequest):
+            self.render(MokDeltaXLSView, "/?since=yesterday")
+
+    def test_tombstones(self):
+        track_deletions(Book)
+        self.addCleanup(
+            post_delete.disconnect, sender=Book, dispatch_uid="fundor_utilities.export_tombstone.tests.book"
+        )
+        start = timezone.now()
+        dune = Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        dune_pk = dune.pk
+        dune.delete()
+        self.assertEqual(
+            list(tombstones(Book, start, timezone.now()).values_list("object_pk", flat=True)), [str(dune_pk)]
+        )
+        self.assertFalse(tombstones(Book, timezone.now(), None).exists())
+
+        class MokTombstoneXLSView(MokDeltaXLSView):
+            export_tombstones = True
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.render(MokTombstoneXLSView)
+
+    def test_tombstone_sheet(self):
+        track_deletions(Note)
+        self.addCleanup(
+            post_delete.disconnect, sender=Note, dispatch_uid="fundor_utilities.export_tombstone.tests.note"
+        )
+
+        class MokTombstoneXLSView(XlsxExporterView):
+            model = Note
+            field_names = ["title"]
+            watermark_field = "updated_at"
+            export_tombstones = True
+
+        Note.objects.create(title="Kept")
+        deleted = Note.objects.create(title="Deleted")
+        since = timezone.now()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        Note.objects.create(title="New")
+
+        response = self.render(MokTombstoneXLSView, "/?" + urlencode({"since": since.isoformat()}))
+        wb = load_workbook(BytesIO(response.content), read_only=True)
+        self.assertEqual(wb.sheetnames, ["note_list.xlsx", "deleted"])
+        self.assertEqual(read_rows(response.content), [["New"]])
+        self.assertEqual([list(row) for row in wb["deleted"].iter_rows(values_only=True)], [["pk"], [str(deleted_pk)]])
+
+        # a full export has no deletions to report
+        wb = load_workbook(BytesIO(self.render(MokTombstoneXLSView).content), read_only=True)
+        self.assertEqual([list(row) for row in wb["deleted"].iter_rows(values_only=True)], [["pk"]])
+
+
+class MokTSVView(TsvExporterView):
+    model = Book
+    add_col_names = True
+    chunk_size = 1
+
+    def clean_title(self, value):
+        return value.upper()
+
+
+class TestTsvExporter(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.create(title="Dune", price=Decimal("9.90"), average_rating=4.5)
+        Book.objects.create(title="Emma", price=Decimal("5.00"), average_rating=3.75)
+
+    expected = b"title\tprice\taverage rating\r\nDUNE\t9.90\t4.5\r\nEMMA\t5.00\t3.75\r\n"
+
+    def test_streaming(self):
+        response = MokTSVView.as_view()(RequestFactory().get("/"))
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="book_list.tsv"')
+        self.assertEqual(b"".join(response.streaming_content), self.expected)
+
+    def test_gzip_encoding(self):
+        view = MokTSVView.as_view(gzip="encoding")
+        response = view(RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.expected)
+
+        response = view(RequestFactory().get("/"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), self.expected)
+
+        for accept_encoding in ("gzip;q=0, deflate", "*;q=0.5, gzip; q=0", "identity"):
+            response = view(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+            self.assertFalse(response.has_header("Content-Encoding"), accept_encoding)
+        for accept_encoding in ("deflate, *", "GZIP;q=0.1", "x-gzip"):
+            response = view(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+            self.assertEqual(response["Content-Encoding"], "gzip", accept_encoding)
+
+    def test_gzip_attachment(self):
+        response = MokTSVView.as_view(gzip="attachment")(RequestFactory().get("/"))
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="book_list.tsv.gz"')
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.expected)
+
+    async def test_async_view(self):
+        class MokAsyncExportTSV(AsyncExportTSV):
+            model = Book
+            add_col_names = True
+            chunk_size = 1
+
+            def clean_title(self, value):
+                return value.upper()
+
+        self.assertTrue(MokAsyncExportTSV.view_is_async)
+        response = await MokAsyncExportTSV.as_view()(RequestFactory().get("/"))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="book_list.tsv"')
+        self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), self.expected)
+
+        response = await MokAsyncExportTSV.as_view(gzip="attachment")(RequestFactory().get("/"))
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(content), self.expected)